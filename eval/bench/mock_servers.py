@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+"""
+Offline stand-ins for the services the eval harness calls.
+
+  AOAI  POST /openai/deployments/<d>/chat/completions   (chat completions, JSON content)
+  MCP   GET  /mcp/health
+        POST /mcp/tools/call                            (create_portal_ui)
+        POST /mcp/tools/call-batch                      (many calls, NDJSON streamed as they finish)
+
+Both answer with shapes the real services produce, so the harness runs unmodified
+against them. Behaviour is configurable per service:
+
+  latency     fixed:MS | uniform:LO:HI | lognormal:MEDIAN_MS:SIGMA | exp:MEAN_MS
+  error rate  fraction of requests answered with HTTP 500
+  429 rate    fraction of requests answered with HTTP 429 + Retry-After (AOAI only)
+  size        components per MCP composition / lines per interpretation
+
+Batch calls draw latency and faults per call and run --mcp-batch-concurrency of them at a time.
+
+Usage:
+    python -m eval.bench.mock_servers --aoai-port 18081 --mcp-port 18082 \
+        --aoai-latency lognormal:800:0.5 --aoai-429-rate 0.02 --mcp-latency uniform:200:600
+"""
+from __future__ import annotations
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+COMPONENT_TYPES = ["KpiCard", "Table", "Chart", "Alert", "Card", "SearchBox", "Select", "KanbanColumn"]
+DIMENSIONS = ["correctness", "uiFidelity", "compositionality", "resilience", "clarity"]
+
+def parse_latency(spec: str) -> t.Callable[[random.Random], float]:
+    """Return a sampler of latencies in seconds for a distribution spec."""
+    kind, _, rest = spec.partition(":")
+    args = [float(x) for x in rest.split(":")] if rest else []
+    if kind == "fixed":
+        return lambda rng: args[0] / 1000.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000.0
+    if kind == "lognormal":
+        import math
+        mu = math.log(max(args[0], 1e-3))
+        return lambda rng: rng.lognormvariate(mu, args[1]) / 1000.0
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1.0 / args[0]) / 1000.0
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+@dataclass
+class MockBehaviour:
+    latency: str = "fixed:0"
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after_s: float = 1.0
+    size: int = 6
+    seed: int = 0
+    batch_concurrency: int = 4
+    counters: dict = field(default_factory=lambda: {"requests": 0, "errors": 0, "throttled": 0, "batches": 0})
+
+    def __post_init__(self):
+        self._sample = parse_latency(self.latency)
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> tuple[float, float]:
+        with self._lock:
+            self.counters["requests"] += 1
+            return self._sample(self._rng), self._rng.random()
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+def _composition(size: int, rng: random.Random) -> dict:
+    components = []
+    for i in range(size):
+        ctype = COMPONENT_TYPES[i % len(COMPONENT_TYPES)]
+        components.append({
+            "id": f"{ctype}-{i}",
+            "type": ctype,
+            "slot": "main" if ctype in ("Table", "Chart") else "cardsGrid",
+            "library": "shadcn",
+            "props": {"title": f"{ctype} {i}", "value": rng.randint(0, 1000), "columns": ["name", "owner", "status"]},
+        })
+    return {"template": "dashboard", "components": components, "styles": [], "scripts": []}
+
+def _interpretation(size: int) -> dict:
+    inferred = COMPONENT_TYPES[:max(1, min(size, len(COMPONENT_TYPES)))]
+    return {
+        "summary": {"inferredComponents": inferred, "lineCount": size},
+        "lines": [{"raw": f"line {i}", "keyPhrases": [inferred[i % len(inferred)]]} for i in range(size)],
+    }
+
+def _judge(rng: random.Random) -> dict:
+    return {"dimensionScores": {d: rng.randint(2, 5) for d in DIMENSIONS}, "rationale": "mock judge"}
+
+def _make_handler(service: str, behaviour: MockBehaviour):
+    rng = random.Random(behaviour.seed + 1)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):  # silence per-request logging
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict[str,str] | None = None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_body(self) -> dict:
+            n = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(n) if n else b""
+            try:
+                return json.loads(raw or b"{}")
+            except ValueError:
+                return {}
+
+        def _fault(self) -> tuple[int, dict, dict[str,str]] | None:
+            """Sleep for the sampled latency; return an injected fault (status, body, headers) if drawn."""
+            delay, roll = behaviour.draw()
+            time.sleep(delay)
+            if roll < behaviour.throttle_rate:
+                behaviour.count("throttled")
+                return 429, {"error": {"code": "429", "message": "mock throttle"}}, {"Retry-After": str(behaviour.retry_after_s), "x-ratelimit-remaining-requests": "0"}
+            if roll < behaviour.throttle_rate + behaviour.error_rate:
+                behaviour.count("errors")
+                return 500, {"error": {"code": "500", "message": "mock failure"}}, {}
+            return None
+
+        def _faults(self) -> bool:
+            """Sleep for the sampled latency; answer with an injected fault if drawn."""
+            fault = self._fault()
+            if fault is not None:
+                self._send(*fault)
+            return fault is not None
+
+        def _tool_result(self) -> dict:
+            with rng_lock:
+                composition = _composition(behaviour.size, rng)
+            return {"success": True, "userId": "default", "sessionId": "mock", "viewUrl": "http://localhost/ui/default", "composition": composition}
+
+        def _batch(self, body: dict):
+            calls = body.get("calls")
+            if not isinstance(calls, list) or not calls:
+                return self._send(400, {"error": "Expected { calls: [...] }"})
+            behaviour.count("batches")
+            width = max(1, min(int(body.get("concurrency") or behaviour.batch_concurrency), len(calls)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            write_lock = threading.Lock()
+            counts = {"succeeded": 0, "failed": 0}
+
+            def emit(line: dict):
+                data = (json.dumps(line) + "\n").encode("utf-8")
+                with write_lock:
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+
+            def run(index: int):
+                call = calls[index] if isinstance(calls[index], dict) else {}
+                t0 = time.perf_counter()
+                fault = self._fault()
+                line = {"index": index, "id": str(call.get("id", index))}
+                if fault is not None:
+                    line.update(status=fault[0], error=fault[1]["error"]["message"])
+                else:
+                    line.update(status=200, result=self._tool_result())
+                line["elapsedMs"] = int((time.perf_counter() - t0) * 1000)
+                with write_lock:
+                    counts["succeeded" if line["status"] == 200 else "failed"] += 1
+                emit(line)
+
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=width) as pool:
+                list(pool.map(run, range(len(calls))))
+            emit({"done": True, "count": len(calls), **counts, "cancelled": 0, "concurrency": width, "elapsedMs": int((time.perf_counter() - t0) * 1000)})
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_GET(self):
+            if service == "mcp" and self.path.startswith("/mcp/health"):
+                return self._send(200, {"status": "ok", "service": "mock-mcp", "version": "mock", "buildId": "mock"})
+            if self.path.startswith("/mock/stats"):
+                return self._send(200, behaviour.counters)
+            self._send(404, {"error": "Not Found"})
+
+        def do_POST(self):
+            body = self._read_body()
+            if service == "mcp" and self.path.startswith("/mcp/tools/call-batch"):
+                return self._batch(body)
+            if service == "mcp" and self.path.startswith("/mcp/tools/call"):
+                if self._faults():
+                    return
+                return self._send(200, self._tool_result())
+            if service == "aoai" and "/chat/completions" in self.path:
+                if self._faults():
+                    return
+                messages = body.get("messages") or [{}]
+                prompt = str(messages[-1].get("content", ""))
+                with rng_lock:
+                    if '"intended": {' in prompt:  # fused judge: both interpretations + scores
+                        content = {"intended": _interpretation(behaviour.size), "rendered": _interpretation(behaviour.size), **_judge(rng)}
+                    else:
+                        content = _judge(rng) if "dimensionScores" in prompt else _interpretation(behaviour.size)
+                prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+                completion = json.dumps(content)
+                return self._send(200, {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": completion}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(completion) // 4,
+                              "total_tokens": prompt_tokens + len(completion) // 4, "prompt_tokens_details": {"cached_tokens": 0}},
+                })
+            self._send(404, {"error": "Not Found"})
+
+    return Handler
+
+def start_server(service: str, port: int, behaviour: MockBehaviour, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Start a mock server on a daemon thread (port 0 picks a free port)."""
+    server = ThreadingHTTPServer((host, port), _make_handler(service, behaviour))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"mock-{service}", daemon=True).start()
+    return server
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Run mock AOAI and MCP servers for offline benchmarking.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--aoai-port", type=int, default=18081)
+    p.add_argument("--mcp-port", type=int, default=18082)
+    p.add_argument("--aoai-latency", default="lognormal:800:0.4", help="Latency distribution for chat completions.")
+    p.add_argument("--aoai-error-rate", type=float, default=0.0)
+    p.add_argument("--aoai-429-rate", type=float, default=0.0)
+    p.add_argument("--aoai-retry-after", type=float, default=1.0, help="Retry-After seconds on injected 429s.")
+    p.add_argument("--aoai-lines", type=int, default=6, help="Lines per interpretation response.")
+    p.add_argument("--mcp-latency", default="uniform:200:600", help="Latency distribution for MCP tool calls.")
+    p.add_argument("--mcp-error-rate", type=float, default=0.0)
+    p.add_argument("--mcp-components", type=int, default=8, help="Components per generated composition.")
+    p.add_argument("--mcp-batch-concurrency", type=int, default=4, help="Calls of one /mcp/tools/call-batch request run at a time.")
+    p.add_argument("--seed", type=int, default=0)
+    return p
+
+def main(argv: list[str] | None = None) -> int:  # pragma: no cover
+    args = build_parser().parse_args(argv)
+    aoai = MockBehaviour(latency=args.aoai_latency, error_rate=args.aoai_error_rate, throttle_rate=args.aoai_429_rate,
+                         retry_after_s=args.aoai_retry_after, size=args.aoai_lines, seed=args.seed)
+    mcp = MockBehaviour(latency=args.mcp_latency, error_rate=args.mcp_error_rate, size=args.mcp_components, seed=args.seed,
+                        batch_concurrency=args.mcp_batch_concurrency)
+    a = start_server("aoai", args.aoai_port, aoai, args.host)
+    m = start_server("mcp", args.mcp_port, mcp, args.host)
+    print(json.dumps({"aoai": f"http://{args.host}:{a.server_address[1]}", "mcp": f"http://{args.host}:{m.server_address[1]}"}), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        return 0
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
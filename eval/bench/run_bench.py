@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+"""
+End-to-end throughput benchmark for the eval harness (no quota, no network).
+
+For every requested dataset size the benchmark:
+  1. generates a synthetic UI Descriptions dataset of N records in a temp directory
+  2. starts eval/bench/mock_servers.py (mock AOAI + mock MCP) as a subprocess
+  3. runs the harness in a fresh child process pointed at the mocks, either through
+     run_dataset (--driver dataset) or process_single_record on a thread pool
+     (--driver record), so peak RSS is measured per scenario
+  4. collects wall time, records/sec, p50/p95/p99 of every step's durationMs
+     (from record_steps.json) and peak RSS
+
+Results are written as one JSON document (timestamp, git commit, config, scenarios)
+so runs can be compared over time:
+
+    python eval/bench/run_bench.py --records 10,100,1000 --workers 16 \
+        --aoai-latency lognormal:800:0.4 --mcp-latency uniform:200:600
+    python eval/bench/run_bench.py --records 100 --compare eval/bench/results/<previous>.json
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import datetime
+import tempfile
+import subprocess
+import typing as t
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+CURRENT_FILE = Path(__file__).resolve()
+REPO_ROOT = CURRENT_FILE.parent.parent.parent  # eval/bench/ -> eval/ -> repo root
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+DEFAULT_OUT_DIR = CURRENT_FILE.parent / "results"
+STEP_NAMES = ["mcp_output", "intended", "rendered", "judge"]
+
+SAMPLE_LINES = [
+    "A header with the portal title and a global search box.",
+    "A row of KPI cards showing open bugs, median age and SLA breaches.",
+    "A table of bugs with columns for title, owner, severity and status.",
+    "A bar chart of bugs per area for the last 30 days.",
+    "An alert banner when more than 10 bugs breach SLA.",
+    "A select to filter by team and a button to export the table.",
+]
+
+def _now_iso() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile (pct in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[k]
+
+def generate_dataset(root: Path, n: int, lines: int = 6) -> Path:
+    """Write N synthetic '<NNN>_<title>/ui-description.md' folders under root."""
+    root.mkdir(parents=True, exist_ok=True)
+    width = max(3, len(str(n)))
+    for i in range(1, n + 1):
+        folder = root / f"{i:0{width}d}_Synthetic portal {i}"
+        folder.mkdir(exist_ok=True)
+        body = [f"# Synthetic portal {i}", ""]
+        body += [f"- {SAMPLE_LINES[(i + j) % len(SAMPLE_LINES)]}" for j in range(lines)]
+        (folder / "ui-description.md").write_text("\n".join(body) + "\n", encoding="utf-8")
+    return root
+
+# ---------------------
+# Mock server process
+# ---------------------
+
+def start_mocks(args) -> tuple[subprocess.Popen, dict[str,str]]:
+    cmd = [
+        sys.executable, str(CURRENT_FILE.parent / "mock_servers.py"),
+        "--aoai-port", "0", "--mcp-port", "0",
+        "--aoai-latency", args.aoai_latency,
+        "--aoai-error-rate", str(args.aoai_error_rate),
+        "--aoai-429-rate", str(args.aoai_429_rate),
+        "--aoai-retry-after", str(args.aoai_retry_after),
+        "--aoai-lines", str(args.aoai_lines),
+        "--mcp-latency", args.mcp_latency,
+        "--mcp-error-rate", str(args.mcp_error_rate),
+        "--mcp-components", str(args.mcp_components),
+        "--seed", str(args.seed),
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline() if proc.stdout else ""
+    if not line:
+        proc.kill()
+        raise SystemExit("ERROR: mock servers failed to start")
+    return proc, json.loads(line)
+
+def stop_mocks(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:  # pragma: no cover
+        proc.kill()
+
+# ---------------------
+# Scenario (child process)
+# ---------------------
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+def _collect_step_latencies(run_dirs: list[Path]) -> dict[str, list[float]]:
+    from eval.pipeline.artifact_store import iter_artifacts  # type: ignore
+    durations: dict[str, list[float]] = {}
+    for run_dir in run_dirs:
+        for _, raw in iter_artifacts(run_dir, "record_steps.json"):
+            try:
+                steps = json.loads(raw).get("steps", [])
+            except Exception:
+                continue
+            for s in steps:
+                if "durationMs" in s:
+                    durations.setdefault(s["name"], []).append(float(s["durationMs"]))
+    return durations
+
+def run_scenario(cfg: dict[str,t.Any]) -> dict[str,t.Any]:
+    """Run one benchmark scenario in this process (environment must already point at the mocks)."""
+    from eval.dataset.load_dataset import load_dataset  # type: ignore
+    from eval.pipeline.run_judge_over_dataset import run_dataset, ensure_run_dir, sanitize_id, _write_record_stub  # type: ignore
+    from eval.pipeline.judge import process_single_record  # type: ignore
+    from eval.pipeline.tool_aoai import scheduler_stats, flush_log  # type: ignore
+
+    dataset_dir = Path(cfg["datasetDir"])
+    run_root = Path(cfg["runRoot"])
+    run_root.mkdir(parents=True, exist_ok=True)
+    workers = int(cfg["workers"])
+    errors = 0
+
+    t0 = time.perf_counter()
+    if cfg["driver"] == "dataset":
+        summary = run_dataset(run_root, mcp_endpoint=cfg["mcpEndpoint"], limit=None, filter_sub=None,
+                              model="bench-model", id_prefix=None, skip_existing=False, workers=workers,
+                              dataset_dir=dataset_dir)
+        run_dir = Path(summary["runDir"])
+        processed, errors = summary["recordsProcessed"], len(summary["errors"])
+    else:
+        data = load_dataset(dataset_dir)
+        run_dir = ensure_run_dir(run_root)
+
+        def one(title: str) -> bool:
+            rid = sanitize_id(title)
+            out_dir = run_dir / rid
+            record_path = _write_record_stub(out_dir, rid, data[title])
+            try:
+                process_single_record(record_path, out_dir, ui_key="ui_description", mcp_endpoint=cfg["mcpEndpoint"], model="bench-model")
+                return True
+            except (Exception, SystemExit) as e:
+                print(f"[bench] {rid} failed: {e}", file=sys.stderr)
+                return False
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="record") as pool:
+            ok = list(pool.map(one, list(data)))
+        processed, errors = sum(ok), len(ok) - sum(ok)
+    elapsed = time.perf_counter() - t0
+    flush_log()
+
+    durations = _collect_step_latencies([run_dir])
+    steps = {
+        name: {"count": len(v), "p50": percentile(v, 50), "p95": percentile(v, 95), "p99": percentile(v, 99), "max": max(v)}
+        for name, v in sorted(durations.items(), key=lambda kv: STEP_NAMES.index(kv[0]) if kv[0] in STEP_NAMES else 99)
+    }
+    return {
+        "records": cfg["records"],
+        "driver": cfg["driver"],
+        "workers": workers,
+        "processed": processed,
+        "errors": errors,
+        "wallSec": round(elapsed, 3),
+        "recordsPerSec": round(processed / elapsed, 3) if elapsed > 0 else None,
+        "stepLatencyMs": steps,
+        "peakRssMb": _peak_rss_mb(),
+        "aoaiRate": scheduler_stats(),
+    }
+
+def _scenario_main(config_path: str, result_path: str) -> int:
+    cfg = json.loads(Path(config_path).read_text(encoding="utf-8"))
+    result = run_scenario(cfg)
+    Path(result_path).write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return 0
+
+def spawn_scenario(cfg: dict[str,t.Any], urls: dict[str,str], work: Path, quiet: bool) -> dict[str,t.Any]:
+    """Run one scenario in a fresh interpreter so module state and peak RSS are isolated."""
+    config_path = work / f"scenario-{cfg['records']}.json"
+    result_path = work / f"result-{cfg['records']}.json"
+    config_path.write_text(json.dumps(cfg), encoding="utf-8")
+    env = dict(os.environ)
+    env.update({
+        "AZURE_OPENAI_ENDPOINT": urls["aoai"],
+        "AZURE_OPENAI_API_KEY": "bench",
+        "AZURE_OPENAI_USE_AAD": "0",
+        "AOAI_PROMPT_LOG_PATH": str(work / "aoai-prompts.log"),
+        "AOAI_CACHE_MODE": "off",
+        "MCP_CACHE_MODE": "off",
+    })
+    env.setdefault("AOAI_POOL_SIZE", str(max(8, int(cfg["workers"]) * 2)))
+    proc = subprocess.run(
+        [sys.executable, str(CURRENT_FILE), "_scenario", str(config_path), str(result_path)],
+        env=env, cwd=str(REPO_ROOT),
+        stdout=subprocess.DEVNULL if quiet else None,
+    )
+    if proc.returncode != 0 or not result_path.exists():
+        return {"records": cfg["records"], "driver": cfg["driver"], "workers": cfg["workers"], "failed": True, "exitCode": proc.returncode}
+    return json.loads(result_path.read_text(encoding="utf-8"))
+
+# ---------------------
+# Comparison
+# ---------------------
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Human readable deltas between two result documents (matched on records/driver/workers)."""
+    def key(s):
+        return (s.get("records"), s.get("driver"), s.get("workers"))
+    base = {key(s): s for s in baseline.get("scenarios", [])}
+    lines = [f"Baseline: {baseline.get('timestamp')} ({(baseline.get('gitCommit') or '?')[:10]})"]
+    for s in current.get("scenarios", []):
+        b = base.get(key(s))
+        if not b or s.get("failed") or b.get("failed"):
+            continue
+        def pct(cur, old):
+            return f"{(cur - old) / old * 100:+.1f}%" if cur is not None and old else "n/a"
+        lines.append(f"  N={s['records']} {s['driver']} w={s['workers']}: "
+                     f"records/sec {b['recordsPerSec']} -> {s['recordsPerSec']} ({pct(s['recordsPerSec'], b['recordsPerSec'])}), "
+                     f"peak RSS {b['peakRssMb']} -> {s['peakRssMb']} MB ({pct(s['peakRssMb'], b['peakRssMb'])})")
+        for name, st in s.get("stepLatencyMs", {}).items():
+            bs = b.get("stepLatencyMs", {}).get(name)
+            if bs:
+                lines.append(f"    {name}: p95 {bs['p95']} -> {st['p95']} ms ({pct(st['p95'], bs['p95'])})")
+    return lines
+
+# ---------------------
+# CLI
+# ---------------------
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark the eval harness against local mock AOAI/MCP servers.")
+    p.add_argument("--records", default="10,100", help="Comma separated dataset sizes (e.g. 10,100,1000,10000).")
+    p.add_argument("--workers", type=int, default=8, help="Records processed concurrently.")
+    p.add_argument("--driver", choices=["dataset", "record"], default="dataset", help="dataset: run_dataset; record: process_single_record on a thread pool.")
+    p.add_argument("--out", help="Result JSON path (default: eval/bench/results/bench_<timestamp>.json).")
+    p.add_argument("--compare", help="Previous result JSON to compare against.")
+    p.add_argument("--keep", action="store_true", help="Keep the temp datasets and run directories.")
+    p.add_argument("--verbose", action="store_true", help="Show the harness output of each scenario.")
+    p.add_argument("--description-lines", type=int, default=6, help="Lines per synthetic UI description.")
+    p.add_argument("--aoai-latency", default="lognormal:800:0.4")
+    p.add_argument("--aoai-error-rate", type=float, default=0.0)
+    p.add_argument("--aoai-429-rate", type=float, default=0.0)
+    p.add_argument("--aoai-retry-after", type=float, default=1.0)
+    p.add_argument("--aoai-lines", type=int, default=6)
+    p.add_argument("--mcp-latency", default="uniform:200:600")
+    p.add_argument("--mcp-error-rate", type=float, default=0.0)
+    p.add_argument("--mcp-components", type=int, default=8)
+    p.add_argument("--seed", type=int, default=0)
+    return p
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "_scenario":
+        return _scenario_main(argv[1], argv[2])
+    args = build_parser().parse_args(argv)
+    sizes = [int(x) for x in args.records.split(",") if x.strip()]
+    mock_config = {k: getattr(args, k) for k in (
+        "aoai_latency", "aoai_error_rate", "aoai_429_rate", "aoai_retry_after", "aoai_lines",
+        "mcp_latency", "mcp_error_rate", "mcp_components", "seed")}
+
+    work = Path(tempfile.mkdtemp(prefix="portal-eval-bench-"))
+    proc, urls = start_mocks(args)
+    print(f"[bench] Mock AOAI {urls['aoai']}  mock MCP {urls['mcp']}  work dir {work}")
+    scenarios = []
+    try:
+        for n in sizes:
+            dataset_dir = generate_dataset(work / f"dataset-{n}" / "UI Descriptions", n, args.description_lines)
+            cfg = {"records": n, "driver": args.driver, "workers": args.workers, "datasetDir": str(dataset_dir),
+                   "runRoot": str(work / f"runs-{n}"), "mcpEndpoint": urls["mcp"]}
+            print(f"[bench] N={n} driver={args.driver} workers={args.workers} ...")
+            res = spawn_scenario(cfg, urls, work, quiet=not args.verbose)
+            scenarios.append(res)
+            if res.get("failed"):
+                print(f"[bench] N={n} FAILED (exit {res.get('exitCode')})")
+            else:
+                print(f"[bench] N={n}: {res['recordsPerSec']} records/sec, {res['errors']} errors, peak RSS {res['peakRssMb']} MB")
+    finally:
+        stop_mocks(proc)
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    result = {
+        "timestamp": _now_iso(),
+        "gitCommit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "config": {"driver": args.driver, "workers": args.workers, "descriptionLines": args.description_lines, "mocks": mock_config},
+        "scenarios": scenarios,
+    }
+    out = Path(args.out) if args.out else DEFAULT_OUT_DIR / f"bench_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"[bench] Results written to {out}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print("\n".join(compare(result, baseline)))
+    return 0 if not any(s.get("failed") for s in scenarios) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,27 @@
 """
 Dataset loader for UI Descriptions from portal-uxagent-dataset.
 
-Hard-coded to always load from: <repo-root>/portal-uxagent-dataset/UI Descriptions
+Loads from: <repo-root>/portal-uxagent-dataset/UI Descriptions
+(a different directory with the same layout can be passed explicitly, e.g. synthetic
+datasets generated by eval/bench/run_bench.py)
+
+iter_dataset() is the lazy variant used by the judge runner: it yields lightweight
+RecordHandle objects (title, path, size, mtime, content hash) and only reads a
+description when asked. Content hashes are kept in a cached index file
+(.cache/dataset-index/<dir hash>.json) so later startups only stat the files.
+The content hash is the sha256 of the decoded text (newlines normalized, as
+load_dataset reads it), so it matches run manifests' descriptionHash and does not
+change when a checkout switches between CRLF and LF.
+Records can be split across hosts with stable hash sharding (--shard i/N).
+A record folder may also hold expected.json (expected_components for autoscore).
 """
 
+import hashlib
+import json
+import os
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator, Optional, Tuple
 
 
 def resolve_dataset_dir() -> Path:
@@ -21,16 +37,160 @@ def resolve_dataset_dir() -> Path:
     return dataset_dir
 
 
-def load_dataset() -> Dict[str, str]:
+INDEX_DIR = Path(__file__).resolve().parent.parent.parent / ".cache" / "dataset-index"
+INDEX_VERSION = 2  # 1 hashed the raw file bytes
+EXPECTED_FILE = "expected.json"  # optional per-record autoscore spec
+
+
+@dataclass(frozen=True)
+class RecordHandle:
+    """A dataset entry whose description is read on demand."""
+    title: str
+    path: Path
+    size: int
+    mtime_ns: int
+    content_hash: str
+
+    def read_text(self) -> str:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def read_expected(self) -> Optional[list]:
+        """
+        expected_components from an optional expected.json next to ui-description.md
+        (a list, or an object with an "expected_components" list); None if absent.
+        Raises ValueError naming the file when it is not valid JSON.
+        """
+        expected_file = self.path.parent / EXPECTED_FILE
+        if not expected_file.is_file():
+            return None
+        with open(expected_file, 'r', encoding='utf-8') as f:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise ValueError(f"invalid {EXPECTED_FILE} for {self.title}: {e}") from None
+        return data.get("expected_components") if isinstance(data, dict) else data
+
+
+def parse_shard(spec: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Parse a shard spec "i/N" (0 <= i < N) into (i, N); None/empty means no sharding.
+    """
+    if not spec:
+        return None
+    try:
+        i, n = (int(x) for x in spec.split("/", 1))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}' (expected i/N, e.g. 0/4)")
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"Invalid shard '{spec}' (need 0 <= i < N)")
+    return i, n
+
+
+def shard_of(title: str, count: int) -> int:
+    """
+    Stable shard assignment: depends only on the record title, so every host computes
+    the same partition and an edited description stays in its shard.
+    """
+    return int(hashlib.sha256(title.encode("utf-8")).hexdigest()[:16], 16) % count
+
+
+def _index_path(dataset_path: Path) -> Path:
+    key = hashlib.sha256(str(dataset_path.resolve()).encode("utf-8")).hexdigest()[:16]
+    return INDEX_DIR / f"{key}.json"
+
+
+def _description_hash(path: Path) -> str:
+    """sha256 of the description text; same as run_manifest.text_hash over load_dataset's value."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return hashlib.sha256(f.read().encode("utf-8")).hexdigest()
+
+
+def _load_index(index_path: Path) -> Dict[str, dict]:
+    try:
+        data = json.loads(index_path.read_text(encoding='utf-8'))
+        return data["entries"] if data.get("version") == INDEX_VERSION else {}
+    except Exception:
+        return {}
+
+
+def _save_index(index_path: Path, dataset_path: Path, entries: Dict[str, dict]) -> None:
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = index_path.with_name(index_path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": INDEX_VERSION, "datasetDir": str(dataset_path), "entries": entries}), encoding='utf-8')
+        os.replace(tmp, index_path)
+    except OSError as e:
+        print(f"Warning: could not write dataset index {index_path}: {e}")
+
+
+def iter_dataset(dataset_dir: Optional[Path] = None, *, shard: Optional[Tuple[int, int]] = None, use_index: bool = True) -> Iterator[RecordHandle]:
+    """
+    Lazily iterate the UI Descriptions dataset in title order.
+    
+    Args:
+        dataset_dir: Optional override for resolve_dataset_dir()
+        shard: Optional (i, N) from parse_shard(); only records with shard_of(title, N) == i are yielded
+        use_index: Reuse cached content hashes for files whose size and mtime are unchanged
+    
+    Yields:
+        RecordHandle per record; descriptions are not kept (files that are new or
+        changed since the last run are hashed once, and the index is refreshed when
+        the iteration ends or is abandoned).
+    """
+    dataset_path = Path(dataset_dir) if dataset_dir else resolve_dataset_dir()
+    if not dataset_path.exists():
+        raise FileNotFoundError(
+            f"Dataset path not found: {dataset_path}\n"
+            f"Expected: <repo-root>/portal-uxagent-dataset/UI Descriptions/"
+        )
+    index_path = _index_path(dataset_path)
+    cached = _load_index(index_path) if use_index else {}
+    entries: Dict[str, dict] = {}
+    changed = complete = False
+    try:
+        for folder in sorted(dataset_path.iterdir()):
+            if not folder.is_dir():
+                continue
+            title = folder.name
+            ui_description_file = folder / "ui-description.md"
+            try:
+                st = ui_description_file.stat()
+            except FileNotFoundError:
+                print(f"Warning: ui-description.md not found in {title}")
+                continue
+            prev = cached.get(title)
+            if prev and prev["size"] == st.st_size and prev["mtimeNs"] == st.st_mtime_ns:
+                content_hash = prev["hash"]
+            else:
+                content_hash = _description_hash(ui_description_file)
+                changed = True
+            entries[title] = {"size": st.st_size, "mtimeNs": st.st_mtime_ns, "hash": content_hash}
+            if shard is not None and shard_of(title, shard[1]) != shard[0]:
+                continue
+            yield RecordHandle(title, ui_description_file, st.st_size, st.st_mtime_ns, content_hash)
+        complete = True
+    finally:
+        # A full pass also drops removed records; an abandoned one keeps the entries it did not reach.
+        if use_index and changed:
+            _save_index(index_path, dataset_path, entries if complete else {**cached, **entries})
+        elif use_index and complete and len(entries) != len(cached):
+            _save_index(index_path, dataset_path, entries)
+
+
+def load_dataset(dataset_dir: Optional[Path] = None) -> Dict[str, str]:
     """
     Load the UI Descriptions dataset.
     
+    Args:
+        dataset_dir: Optional override for resolve_dataset_dir()
+    
     Returns:
         A dictionary where:
         - key: folder name (title) - e.g., "001_Portal for Bug triage..."
         - value: content of ui-description.md file
     """
-    dataset_path = resolve_dataset_dir()
+    dataset_path = Path(dataset_dir) if dataset_dir else resolve_dataset_dir()
     
     if not dataset_path.exists():
         raise FileNotFoundError(
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+Content-addressed on-disk cache for Azure OpenAI chat completions.
+
+Used by tool_aoai.AOAIClient.chat when AOAI_CACHE_MODE (or --cache-mode) is not "off".
+
+Key:   sha256 over deployment + api-version + response_format + canonical hash of messages
+Value: raw chat-completions response body (parsed again on replay, so a cached call
+       goes through exactly the same JSON-only parsing as a live one)
+Store: single SQLite file (WAL mode, safe for concurrent threads/processes)
+
+Modes:
+    off          no cache
+    read         serve hits, never write
+    readwrite    serve hits, store misses
+    replay-only  serve hits, fail on miss without touching the network
+
+Eviction: entries older than max_age_days are dropped, then least-recently-used entries
+until the stored bodies fit in max_mb. Runs on open and every EVICT_EVERY writes.
+
+CLI:
+    python eval/pipeline/aoai_cache.py --stats
+    python eval/pipeline/aoai_cache.py --evict
+"""
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import typing as t
+from pathlib import Path
+
+CACHE_MODES = ("off", "read", "readwrite", "replay-only")
+
+EVICT_EVERY = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key             TEXT PRIMARY KEY,
+    deployment      TEXT NOT NULL,
+    api_version     TEXT NOT NULL,
+    response_format TEXT NOT NULL,
+    messages_hash   TEXT NOT NULL,
+    body            TEXT NOT NULL,
+    size            INTEGER NOT NULL,
+    created         REAL NOT NULL,
+    last_access     REAL NOT NULL,
+    hits            INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions(last_access);
+"""
+
+class CacheMiss(RuntimeError):
+    """Raised in replay-only mode when a request has no cached response."""
+    pass
+
+def messages_hash(messages: list[dict[str,str]]) -> str:
+    canonical = json.dumps(messages, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def cache_key(*, deployment: str, api_version: str, response_format: str, messages: list[dict[str,str]]) -> str:
+    material = "\n".join([deployment, api_version, response_format, messages_hash(messages)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Thread-safe SQLite completion cache with hit/miss counters."""
+
+    def __init__(self, path: str | os.PathLike, *, mode: str = "readwrite", max_mb: float = 512, max_age_days: float = 30):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}' (expected one of {', '.join(CACHE_MODES)})")
+        self.path = Path(path)
+        self.mode = mode
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age_s = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+        if self.writable:
+            self.evict()
+
+    @property
+    def readable(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def writable(self) -> bool:
+        return self.mode == "readwrite"
+
+    @property
+    def replay_only(self) -> bool:
+        return self.mode == "replay-only"
+
+    def get(self, key: str) -> str | None:
+        if not self.readable:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            if self.mode != "read":
+                self._conn.execute("UPDATE completions SET last_access = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, body: str, *, deployment: str, api_version: str, response_format: str, messages: list[dict[str,str]]) -> None:
+        if not self.writable:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, deployment, api_version, response_format, messages_hash, body, size, created, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, deployment, api_version, response_format, messages_hash(messages), body, len(body.encode("utf-8")), now, now)
+            )
+            self._conn.commit()
+            self.counters["writes"] += 1
+            self._writes_since_evict += 1
+            due = self._writes_since_evict >= EVICT_EVERY
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then LRU entries until the size budget holds. Returns rows removed."""
+        removed = 0
+        with self._lock:
+            self._writes_since_evict = 0
+            if self.max_age_s > 0:
+                cur = self._conn.execute("DELETE FROM completions WHERE created < ?", (time.time() - self.max_age_s,))
+                removed += cur.rowcount
+            if self.max_bytes > 0:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+                if total > self.max_bytes:
+                    target = int(self.max_bytes * 0.9)
+                    freed = 0
+                    victims: list[str] = []
+                    for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY last_access ASC"):
+                        if total - freed <= target:
+                            break
+                        victims.append(key)
+                        freed += size
+                    self._conn.executemany("DELETE FROM completions WHERE key = ?", [(k,) for k in victims])
+                    removed += len(victims)
+            self._conn.commit()
+            self.counters["evicted"] += removed
+        return removed
+
+    def stats(self) -> dict[str,t.Any]:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "mode": self.mode,
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": total,
+            **counters,
+            "hitRate": round(counters["hits"] / lookups, 3) if lookups else None,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+# ---------------------
+# CLI
+# ---------------------
+
+def _cli():  # pragma: no cover
+    import argparse
+    ap = argparse.ArgumentParser(description="Inspect or prune the AOAI response cache.")
+    ap.add_argument("--path", default=os.getenv("AOAI_CACHE_PATH", ".cache/aoai-cache.sqlite"), help="Cache file path.")
+    ap.add_argument("--max-mb", type=float, default=float(os.getenv("AOAI_CACHE_MAX_MB", "512")))
+    ap.add_argument("--max-age-days", type=float, default=float(os.getenv("AOAI_CACHE_MAX_AGE_DAYS", "30")))
+    ap.add_argument("--evict", action="store_true", help="Run size/age eviction now.")
+    ap.add_argument("--stats", action="store_true", help="Print entry count and size.")
+    args = ap.parse_args()
+    cache = ResponseCache(args.path, mode="readwrite" if args.evict else "read", max_mb=args.max_mb, max_age_days=args.max_age_days)
+    if args.evict:
+        print(json.dumps({"evicted": cache.counters["evicted"]}))
+    print(json.dumps(cache.stats(), indent=2))
+    cache.close()
+
+if __name__ == "__main__":  # pragma: no cover
+    _cli()
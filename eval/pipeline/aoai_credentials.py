@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Thread-safe AAD token manager for Azure OpenAI calls (AZURE_OPENAI_USE_AAD=1).
+
+One TokenManager per process (see ``get_token_manager``) holds a token per scope:
+
+ - ``get_token(scope)`` returns the cached token without blocking while it is valid;
+   only the very first call for a scope (or one after the token really expired)
+   acquires it, and concurrent callers wait for that single acquisition instead of
+   each asking the credential
+ - a daemon thread refreshes every token AOAI_TOKEN_REFRESH_MARGIN_S before it
+   expires, so workers never stall on token acquisition mid-run; a failed refresh
+   keeps serving the current token and is retried with backoff until it expires.
+   The margin is at most half the token's lifetime, and a token is never refreshed
+   less than 5s after it was fetched, so short-lived tokens do not spin the loop
+
+The credential (``DefaultAzureCredential`` unless a factory is given) is created once,
+lazily, on first use.
+
+Environment:
+    AOAI_TOKEN_REFRESH_MARGIN_S   (default: 300; refresh this long before expiry)
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import threading
+import typing as t
+
+AOAI_TOKEN_REFRESH_MARGIN_S = float(os.getenv("AOAI_TOKEN_REFRESH_MARGIN_S", "300"))
+# A token this close to expiry is not handed out any more (the request could outlive it).
+_EXPIRY_SLACK_S = 30.0
+_RETRY_MIN_S = 5.0
+_RETRY_MAX_S = 60.0
+
+def _default_credential() -> t.Any:
+    try:
+        from azure.identity import DefaultAzureCredential  # type: ignore
+    except Exception:
+        raise RuntimeError("azure-identity not installed; cannot use AAD (pip install azure-identity)")
+    return DefaultAzureCredential()
+
+class TokenManager:
+    """Lock-protected per-scope token cache with background refresh ahead of expiry."""
+
+    def __init__(self, credential_factory: t.Callable[[], t.Any] | None = None, *, refresh_margin_s: float | None = None):
+        self._factory = credential_factory or _default_credential
+        self.refresh_margin_s = AOAI_TOKEN_REFRESH_MARGIN_S if refresh_margin_s is None else refresh_margin_s
+        self._credential: t.Any = None
+        self._credential_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._tokens: dict[str, dict[str,t.Any]] = {}   # scope -> {"token", "expires", "fetchedAt", "retryAt", "failures"}
+        self._acquiring: set[str] = set()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self.counters = {"acquired": 0, "refreshed": 0, "refreshFailures": 0, "cached": 0, "waited": 0}
+
+    def _get_credential(self) -> t.Any:
+        with self._credential_lock:  # not the token lock: creating the credential can be slow
+            if self._credential is None:
+                self._credential = self._factory()
+            return self._credential
+
+    def _fetch(self, scope: str) -> dict[str,t.Any]:
+        token = self._get_credential().get_token(scope)
+        if not token or not getattr(token, "token", None):
+            raise RuntimeError("Failed to acquire AAD token for Azure OpenAI")
+        now = time.time()
+        return {"token": token.token, "expires": float(getattr(token, "expires_on", now + 300)), "fetchedAt": now, "retryAt": 0.0, "failures": 0}
+
+    def get_token(self, scope: str) -> str:
+        """Valid token for ``scope``; blocks only while the first (or an expired) token is acquired."""
+        with self._cond:
+            waited = False
+            while True:
+                entry = self._tokens.get(scope)
+                if entry is not None and entry["expires"] - _EXPIRY_SLACK_S > time.time():
+                    self.counters["waited" if waited else "cached"] += 1
+                    return entry["token"]
+                if scope not in self._acquiring:
+                    self._acquiring.add(scope)
+                    break
+                waited = True
+                self._cond.wait()
+        try:
+            entry = self._fetch(scope)
+        except BaseException:
+            with self._cond:
+                self._acquiring.discard(scope)
+                self._cond.notify_all()  # a waiter takes over the acquisition
+            raise
+        with self._cond:
+            self._tokens[scope] = entry
+            self.counters["acquired"] += 1
+            self._acquiring.discard(scope)
+            self._cond.notify_all()
+        self._ensure_refresher()
+        return entry["token"]
+
+    def _ensure_refresher(self) -> None:
+        with self._cond:
+            start = self._thread is None and not self._closed
+            if start:
+                self._thread = threading.Thread(target=self._refresh_loop, name="aoai-token-refresh", daemon=True)
+        if start:
+            self._thread.start()
+        self._wake.set()  # re-plan around the new expiry
+
+    def _due(self, entry: dict[str,t.Any]) -> float:
+        margin = min(self.refresh_margin_s, (entry["expires"] - entry["fetchedAt"]) / 2)
+        return max(entry["expires"] - margin, entry["fetchedAt"] + _RETRY_MIN_S, entry["retryAt"])
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self._wake.clear()
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.time()
+                due = [s for s, e in self._tokens.items() if self._due(e) <= now and s not in self._acquiring]
+                upcoming = [self._due(e) for e in self._tokens.values()]
+            for scope in due:
+                self._refresh(scope)
+            if not due:
+                timeout = max(0.05, min(upcoming) - time.time()) if upcoming else None
+                self._wake.wait(timeout)
+
+    def _refresh(self, scope: str) -> None:
+        try:
+            fresh = self._fetch(scope)
+        except Exception as e:  # keep serving the current token; retry with backoff
+            with self._cond:
+                entry = self._tokens[scope]
+                entry["failures"] += 1
+                entry["retryAt"] = time.time() + min(_RETRY_MAX_S, _RETRY_MIN_S * (2 ** (entry["failures"] - 1)))
+                self.counters["refreshFailures"] += 1
+                left = entry["expires"] - time.time()
+            print(f"WARNING: AAD token refresh failed ({e}); current token valid for {max(0, left):.0f}s more", file=sys.stderr)
+            return
+        with self._cond:
+            self._tokens[scope] = fresh
+            self.counters["refreshed"] += 1
+
+    def stats(self) -> dict[str,t.Any]:
+        with self._cond:
+            now = time.time()
+            return {**self.counters, "scopes": {s: {"expiresInS": int(e["expires"] - now), "failures": e["failures"]} for s, e in self._tokens.items()}}
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._wake.set()
+
+_manager: TokenManager | None = None
+_manager_lock = threading.Lock()
+
+def get_token_manager() -> TokenManager:
+    """Process-wide token manager (created lazily)."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = TokenManager()
+        return _manager
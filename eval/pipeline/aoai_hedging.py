@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+"""
+Hedged Azure OpenAI requests (AOAI_HEDGE=on) to cut the latency tail.
+
+With hedging on, every attempt of ``AOAIClient.chat`` that has not answered after the
+step's hedge delay is sent a second time (to another route when AOAI_ROUTES offers one).
+The first usable response wins and the other request is cancelled by shutting down
+its socket, which also tells the service to stop generating (a request still waiting
+for a pooled connection is dropped before it is sent).
+
+ - hedge delay: the AOAI_HEDGE_QUANTILE (p90) of the last AOAI_HEDGE_WINDOW successful
+   latencies of the same step (``hedge_key``, e.g. "Judge Scoring"), never below
+   AOAI_HEDGE_MIN_MS; a step hedges only once it has AOAI_HEDGE_MIN_SAMPLES samples.
+   Samples and delay run from the moment a request holds a connection, so time
+   queued for the pool (AOAI_POOL_SIZE) does not trigger hedges, and no copy is sent
+   while the copy's route has no free connection either.
+   When the primary request is cancelled its sample is the time it had run, so the
+   tail the hedges cut stays visible to the quantile
+ - spend cap: at most AOAI_HEDGE_MAX_RATE hedges per call over the process, and at most
+   AOAI_HEDGE_MAX_EXTRA_TOKENS estimated tokens (prompt + completion estimate) spent on
+   hedges (0 = no token cap); a hedge also needs room in the route's TPM/RPM budget
+   right away, it never waits for quota. The losing request's reservation is settled
+   like any call: nothing for a request dropped before sending or rejected, its usage
+   when it completed anyway, the estimate when it was aborted in flight
+
+``HedgePolicy.stats()`` (run_summary.json "aoaiHedge") reports hedges, hedge rate, how
+often the hedge beat the primary and the extra tokens, per step; each hedge is also a
+"hedge" event in the prompt log.
+
+Environment:
+    AOAI_HEDGE                    (default: off; on = hedge slow calls)
+    AOAI_HEDGE_QUANTILE           (default: 0.9)
+    AOAI_HEDGE_MIN_SAMPLES        (default: 20)
+    AOAI_HEDGE_WINDOW             (default: 200)
+    AOAI_HEDGE_MIN_MS             (default: 1000)
+    AOAI_HEDGE_MAX_RATE           (default: 0.1)
+    AOAI_HEDGE_MAX_EXTRA_TOKENS   (default: 0 -> no token cap)
+"""
+from __future__ import annotations
+import os
+import math
+import time
+import socket
+import threading
+import typing as t
+from collections import deque
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import parse_url
+
+HEDGE_MODES = ("off", "on")
+AOAI_HEDGE = os.getenv("AOAI_HEDGE", "off").strip().lower()
+AOAI_HEDGE_QUANTILE = float(os.getenv("AOAI_HEDGE_QUANTILE", "0.9"))
+AOAI_HEDGE_MIN_SAMPLES = int(os.getenv("AOAI_HEDGE_MIN_SAMPLES", "20"))
+AOAI_HEDGE_WINDOW = int(os.getenv("AOAI_HEDGE_WINDOW", "200"))
+AOAI_HEDGE_MIN_MS = float(os.getenv("AOAI_HEDGE_MIN_MS", "1000"))
+AOAI_HEDGE_MAX_RATE = float(os.getenv("AOAI_HEDGE_MAX_RATE", "0.1"))
+AOAI_HEDGE_MAX_EXTRA_TOKENS = int(os.getenv("AOAI_HEDGE_MAX_EXTRA_TOKENS", "0"))
+
+class _StepState:
+    def __init__(self, window: int):
+        self.samples: deque[float] = deque(maxlen=window)
+        self.delay_ms: float | None = None
+        self.stale = True
+        self.counters = {"calls": 0, "hedged": 0, "hedgeWins": 0, "primaryWins": 0, "cancelled": 0, "skippedBudget": 0, "skippedQuota": 0, "skippedNoConnection": 0, "extraTokens": 0}
+
+class HedgePolicy:
+    """Thread-safe per-step hedge delays (latency quantile) and the process-wide hedge budget."""
+
+    def __init__(
+        self,
+        *,
+        quantile: float | None = None,
+        min_samples: int | None = None,
+        window: int | None = None,
+        min_delay_ms: float | None = None,
+        max_rate: float | None = None,
+        max_extra_tokens: int | None = None
+    ):
+        self.quantile = min(1.0, max(0.0, AOAI_HEDGE_QUANTILE if quantile is None else quantile))
+        self.min_samples = max(1, AOAI_HEDGE_MIN_SAMPLES if min_samples is None else min_samples)
+        self.window = max(self.min_samples, AOAI_HEDGE_WINDOW if window is None else window)
+        self.min_delay_ms = AOAI_HEDGE_MIN_MS if min_delay_ms is None else min_delay_ms
+        self.max_rate = max(0.0, AOAI_HEDGE_MAX_RATE if max_rate is None else max_rate)
+        self.max_extra_tokens = AOAI_HEDGE_MAX_EXTRA_TOKENS if max_extra_tokens is None else max_extra_tokens
+        self._steps: dict[str, _StepState] = {}
+        self._calls = 0
+        self._hedged = 0
+        self._extra_tokens = 0
+        self._lock = threading.Lock()
+
+    def _step(self, key: str) -> _StepState:
+        state = self._steps.get(key)
+        if state is None:
+            state = self._steps[key] = _StepState(self.window)
+        return state
+
+    def begin(self, key: str) -> float | None:
+        """Count a call of step ``key``; returns its hedge delay in ms (None: too few samples yet)."""
+        with self._lock:
+            state = self._step(key)
+            state.counters["calls"] += 1
+            self._calls += 1
+            if len(state.samples) < self.min_samples:
+                return None
+            if state.stale:
+                ordered = sorted(state.samples)
+                state.delay_ms = max(self.min_delay_ms, ordered[min(len(ordered) - 1, math.ceil(self.quantile * len(ordered)) - 1)])
+                state.stale = False
+            return state.delay_ms
+
+    def observe(self, key: str, latency_ms: float) -> None:
+        """Latency sample of a successful request of step ``key``."""
+        with self._lock:
+            state = self._step(key)
+            state.samples.append(float(latency_ms))
+            state.stale = True
+
+    def allow(self, key: str, tokens: int) -> bool:
+        """Take budget for one hedge costing ``tokens``; False (counted as skipped) when the caps are reached."""
+        with self._lock:
+            state = self._step(key)
+            over_rate = self._hedged + 1 > self.max_rate * self._calls
+            over_tokens = self.max_extra_tokens > 0 and self._extra_tokens + tokens > self.max_extra_tokens
+            if over_rate or over_tokens:
+                state.counters["skippedBudget"] += 1
+                return False
+            self._hedged += 1
+            self._extra_tokens += tokens
+            state.counters["hedged"] += 1
+            state.counters["extraTokens"] += tokens
+            return True
+
+    def skipped_quota(self, key: str) -> None:
+        with self._lock:
+            self._step(key).counters["skippedQuota"] += 1
+
+    def skipped_connection(self, key: str) -> None:
+        with self._lock:
+            self._step(key).counters["skippedNoConnection"] += 1
+
+    def record(self, key: str, *, hedge_won: bool, cancelled: bool) -> None:
+        """Outcome of a hedged request."""
+        with self._lock:
+            counters = self._step(key).counters
+            counters["hedgeWins" if hedge_won else "primaryWins"] += 1
+            if cancelled:
+                counters["cancelled"] += 1
+
+    def stats(self) -> dict[str,t.Any]:
+        with self._lock:
+            steps = {}
+            totals: dict[str,int] = {}
+            for key, state in self._steps.items():
+                c = state.counters
+                for name, value in c.items():
+                    totals[name] = totals.get(name, 0) + value
+                steps[key] = {
+                    **c,
+                    "hedgeRate": round(c["hedged"] / c["calls"], 3) if c["calls"] else 0.0,
+                    "hedgeWinRate": round(c["hedgeWins"] / c["hedged"], 3) if c["hedged"] else None,
+                    "delayMs": int(state.delay_ms) if state.delay_ms is not None else None,
+                    "samples": len(state.samples),
+                }
+            return {
+                "quantile": self.quantile,
+                "maxRate": self.max_rate,
+                "maxExtraTokens": self.max_extra_tokens or None,
+                **totals,
+                "hedgeRate": round(totals.get("hedged", 0) / totals["calls"], 3) if totals.get("calls") else 0.0,
+                "hedgeWinRate": round(totals["hedgeWins"] / totals["hedged"], 3) if totals.get("hedged") else None,
+                "steps": steps,
+            }
+
+# ---------------------
+# Cancellation
+# ---------------------
+
+# The ticket of the request the current thread is sending (see CancelTicket.__enter__).
+_active = threading.local()
+
+class RequestCancelled(Exception):
+    """The request was cancelled before it got a connection; nothing was sent."""
+
+class CancelTicket:
+    """Cancels the request sent by the thread inside ``with ticket:`` from any other thread.
+
+    The pools of ``CancellableAdapter`` bind the connection a request takes to the
+    sending thread's ticket and unbind it when the connection goes back to the pool,
+    so ``cancel()`` only ever aborts the socket of that one request. A request
+    cancelled while it waits for a connection raises ``RequestCancelled`` once it
+    gets one. ``sending`` is set when the request holds its connection (``sent_at``,
+    perf_counter) or has ended.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._conn: t.Any = None
+        self.cancelled = False
+        self.sent_at: float | None = None
+        self.sending = threading.Event()
+
+    def __enter__(self) -> "CancelTicket":
+        _active.ticket = self
+        return self
+
+    def __exit__(self, *exc: t.Any) -> None:
+        _active.ticket = None
+        with self._lock:
+            self._conn = None
+        self.sending.set()
+
+    def bind(self, conn: t.Any) -> bool:
+        """Tie ``conn`` to this ticket; False (not bound) when the ticket is already cancelled."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._conn = conn
+            self.sent_at = time.perf_counter()
+        self.sending.set()
+        return True
+
+    def release(self, conn: t.Any) -> None:
+        with self._lock:
+            if self._conn is conn:
+                self._conn = None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                _abort(self._conn)
+
+def _abort(conn: t.Any) -> None:
+    sock = getattr(conn, "sock", None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)  # the blocked read in the sending thread fails right away
+    except OSError:
+        pass
+
+class _CancellableMixin:
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        ticket = getattr(_active, "ticket", None)
+        if ticket is not None and not ticket.bind(conn):
+            # urlopen puts an empty slot back for the connection it never received.
+            conn.close()
+            raise RequestCancelled()
+        return conn
+
+    def _put_conn(self, conn):
+        ticket = getattr(_active, "ticket", None)
+        if ticket is not None:
+            ticket.release(conn)
+        super()._put_conn(conn)
+
+class _CancellablePool(_CancellableMixin, HTTPConnectionPool):
+    pass
+
+class _CancellableHTTPSPool(_CancellableMixin, HTTPSConnectionPool):
+    pass
+
+class CancellableAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections can be aborted through a CancelTicket."""
+
+    def init_poolmanager(self, *args: t.Any, **kwargs: t.Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CancellablePool, "https": _CancellableHTTPSPool}
+
+    def free_connections(self, url: str) -> int:
+        """Connections to the host of ``url`` that a request could take right now."""
+        parsed = parse_url(url)
+        scheme = (parsed.scheme or "http").lower()
+        target = (scheme, (parsed.host or "").lower(), parsed.port or (443 if scheme == "https" else 80))
+        pools = self.poolmanager.pools
+        free = None
+        for key in pools.keys():
+            if (key.key_scheme, key.key_host, key.key_port) != target:
+                continue
+            pool = pools.get(key)
+            queue = pool.pool if pool is not None else None
+            if queue is not None:
+                free = (free or 0) + queue.qsize()
+        return self._pool_maxsize if free is None else free  # no pool yet: all of it is free
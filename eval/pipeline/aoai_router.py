@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+Spread Azure OpenAI calls over several endpoints / deployments (AOAI_ROUTES).
+
+Every attempt of ``AOAIClient.chat`` asks the router for a route. Routes are drawn at
+random with probability proportional to
+
+    weight  x  available quota  x  latency factor
+
+ - available quota: the fraction of the route's TPM/RPM budget left in its RateScheduler
+   (and of the last ``x-ratelimit-remaining-*`` the server reported); 0 while the route
+   is paused by a Retry-After
+ - latency factor: best recent latency across routes / this route's recent latency
+   (exponentially weighted; routes without samples count as the best)
+
+A route that fails AOAI_ROUTE_FAIL_THRESHOLD times in a row (timeouts, connection errors,
+5xx, 401/403/404) is taken out of rotation for AOAI_ROUTE_COOLDOWN_S, doubling on every
+further ejection up to 10 minutes; afterwards it gets traffic again and one success
+restores it. 429s only lower the route's quota share. When every route is ejected the
+one that comes back first is used rather than failing the call.
+
+Routes must serve the same model: any of them may answer a call, so the response cache
+and step fingerprints key on the whole route set (``model_identity``: the deployment and
+api-version, or every distinct one joined by "+" when the routes differ).
+
+AOAI_ROUTES is a JSON list (or the path of a JSON file holding one):
+
+    [{"endpoint": "https://east.openai.azure.com", "deployment": "gpt-5-mini", "weight": 2},
+     {"endpoint": "https://west.openai.azure.com", "apiKeyEnv": "AOAI_WEST_KEY"}]
+
+Keys: endpoint (required), deployment, apiVersion, apiKey / apiKeyEnv, useAad, scope,
+weight, name; unset keys fall back to the AZURE_OPENAI_* settings.
+
+Environment:
+    AOAI_ROUTES                 (default: unset -> the single AZURE_OPENAI_ENDPOINT)
+    AOAI_ROUTE_FAIL_THRESHOLD   (default: 3)
+    AOAI_ROUTE_COOLDOWN_S       (default: 30)
+"""
+from __future__ import annotations
+import os
+import json
+import time
+import random
+import threading
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlparse
+
+AOAI_ROUTES = os.getenv("AOAI_ROUTES", "").strip()
+AOAI_ROUTE_FAIL_THRESHOLD = int(os.getenv("AOAI_ROUTE_FAIL_THRESHOLD", "3"))
+AOAI_ROUTE_COOLDOWN_S = float(os.getenv("AOAI_ROUTE_COOLDOWN_S", "30"))
+_COOLDOWN_MAX_S = 600.0
+_LATENCY_ALPHA = 0.3
+_MIN_SHARE = 0.01  # keeps a throttled or slow route from being starved of the samples that would restore it
+
+@dataclass(frozen=True)
+class Route:
+    endpoint: str
+    deployment: str
+    api_version: str
+    api_key: str = ""
+    use_aad: bool = False
+    scope: str = ""
+    weight: float = 1.0
+    name: str = ""
+
+    @property
+    def url(self) -> str:
+        return f"{self.endpoint.rstrip('/')}/openai/deployments/{self.deployment}/chat/completions?api-version={self.api_version}"
+
+def parse_routes(spec: str, *, deployment: str, api_version: str, api_key: str, use_aad: bool, scope: str) -> list[Route]:
+    """Routes from a JSON list or the path of a JSON file; keyword arguments are the per-key defaults."""
+    text = spec.strip()
+    if not text.startswith("["):
+        text = Path(text).read_text(encoding="utf-8")
+    items = json.loads(text)
+    if not isinstance(items, list) or not items:
+        raise ValueError("AOAI_ROUTES must be a non-empty JSON list of routes")
+    routes = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("endpoint"):
+            raise ValueError(f"AOAI_ROUTES[{i}]: 'endpoint' is required")
+        key = item.get("apiKey") or (os.getenv(item["apiKeyEnv"], "") if item.get("apiKeyEnv") else "") or api_key
+        dep = item.get("deployment") or deployment
+        weight = float(item.get("weight", 1.0))
+        if weight <= 0:
+            raise ValueError(f"AOAI_ROUTES[{i}]: weight must be > 0")
+        routes.append(Route(
+            endpoint=str(item["endpoint"]).rstrip("/"),
+            deployment=dep,
+            api_version=item.get("apiVersion") or api_version,
+            api_key=key,
+            use_aad=bool(item.get("useAad", use_aad)),
+            scope=item.get("scope") or scope,
+            weight=weight,
+            name=item.get("name") or f"{urlparse(str(item['endpoint'])).hostname or item['endpoint']}/{dep}",
+        ))
+    if len({r.name for r in routes}) != len(routes):
+        raise ValueError("AOAI_ROUTES: route names must be unique (set 'name')")
+    return routes
+
+def model_identity(routes: t.Sequence[Route]) -> tuple[str, str]:
+    """``(deployment, api_version)`` that responses from ``routes`` are keyed on.
+
+    The routes' shared values, so a single endpoint keeps its keys; with mixed values every
+    distinct one is joined by "+" (sorted), so answers of one route set are never
+    replayed for another.
+    """
+    return "+".join(sorted({r.deployment for r in routes})), "+".join(sorted({r.api_version for r in routes}))
+
+class _RouteState:
+    def __init__(self, route: Route):
+        self.route = route
+        self.latency_ms: float | None = None
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.counters = {"picked": 0, "succeeded": 0, "failed": 0, "ejected": 0}
+
+class AOAIRouter:
+    """Thread-safe weighted route picker with passive health checks."""
+
+    def __init__(
+        self,
+        routes: list[Route],
+        *,
+        available: t.Callable[[Route], float] | None = None,
+        fail_threshold: int | None = None,
+        cooldown_s: float | None = None,
+        seed: int | None = None
+    ):
+        if not routes:
+            raise ValueError("AOAIRouter needs at least one route")
+        self.routes = list(routes)
+        self._available = available or (lambda route: 1.0)
+        self.fail_threshold = max(1, AOAI_ROUTE_FAIL_THRESHOLD if fail_threshold is None else fail_threshold)
+        self.cooldown_s = AOAI_ROUTE_COOLDOWN_S if cooldown_s is None else cooldown_s
+        self._states = {r.name: _RouteState(r) for r in self.routes}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> Route:
+        return self.routes[0]
+
+    def pick(self, *, exclude: Route | None = None) -> Route:
+        """Route for the next attempt (``exclude``: the route that just failed, avoided if another is usable)."""
+        if len(self.routes) == 1:
+            with self._lock:
+                self._states[self.routes[0].name].counters["picked"] += 1
+            return self.routes[0]
+        # Quota is read outside the router lock (the schedulers have their own).
+        quota = {r.name: max(0.0, min(1.0, self._available(r))) for r in self.routes}
+        with self._lock:
+            now = time.monotonic()
+            live = [s for s in self._states.values() if s.ejected_until <= now]
+            if not live:
+                state = min(self._states.values(), key=lambda s: s.ejected_until)
+                state.counters["picked"] += 1
+                return state.route
+            if exclude is not None and len(live) > 1:
+                live = [s for s in live if s.route.name != exclude.name]
+            known = [s.latency_ms for s in live if s.latency_ms]
+            best = min(known) if known else None
+            scores = []
+            for s in live:
+                latency = (best / s.latency_ms) if best and s.latency_ms else 1.0
+                scores.append(s.route.weight * max(_MIN_SHARE, quota[s.route.name] * latency))
+            state = self._rng.choices(live, weights=scores)[0]
+            state.counters["picked"] += 1
+            return state.route
+
+    def has_alternative(self, route: Route) -> bool:
+        """Whether a route other than ``route`` is in rotation."""
+        with self._lock:
+            now = time.monotonic()
+            return any(s.ejected_until <= now for name, s in self._states.items() if name != route.name)
+
+    def record_success(self, route: Route, latency_ms: float) -> None:
+        with self._lock:
+            s = self._states[route.name]
+            s.counters["succeeded"] += 1
+            s.consecutive_failures = 0
+            s.ejections = 0
+            s.latency_ms = latency_ms if s.latency_ms is None else (1 - _LATENCY_ALPHA) * s.latency_ms + _LATENCY_ALPHA * latency_ms
+
+    def record_failure(self, route: Route) -> bool:
+        """Count a route fault; returns True when it takes the route out of rotation."""
+        with self._lock:
+            s = self._states[route.name]
+            s.counters["failed"] += 1
+            s.consecutive_failures += 1
+            if len(self.routes) == 1 or s.consecutive_failures < self.fail_threshold:
+                return False
+            s.ejections += 1
+            s.counters["ejected"] += 1
+            s.consecutive_failures = 0
+            s.ejected_until = time.monotonic() + min(_COOLDOWN_MAX_S, self.cooldown_s * (2 ** (s.ejections - 1)))
+            return True
+
+    def stats(self) -> list[dict[str,t.Any]]:
+        with self._lock:
+            now = time.monotonic()
+            states = list(self._states.values())
+            total = sum(s.counters["picked"] for s in states) or 1
+            return [{
+                "name": s.route.name,
+                "endpoint": s.route.endpoint,
+                "deployment": s.route.deployment,
+                "weight": s.route.weight,
+                **s.counters,
+                "share": round(s.counters["picked"] / total, 3),
+                "latencyMs": int(s.latency_ms) if s.latency_ms is not None else None,
+                "healthy": s.ejected_until <= now,
+            } for s in states]
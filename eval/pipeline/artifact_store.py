@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+"""
+Packed per-run artifact store (``<run_dir>/artifacts.sqlite``).
+
+With ARTIFACT_STORE=packed (or --artifact-store packed) each record is still processed
+in its own ``<run_dir>/<recordId>/`` directory, but once it finishes successfully the
+directory is packed into the run's store and removed, so a run keeps a single file
+(plus the directories of records in flight or failed) instead of a dozen per record.
+
+Contents are stored once by SHA-256 (the prompt templates copied into every record,
+identical info files, ...) and compressed with zstd when the ``zstandard`` package is
+installed, zlib otherwise; the codec is recorded per blob. Bytes round-trip exactly,
+so ``export`` reproduces the directory layout written by judge.py.
+
+Schema:
+    blobs(hash PRIMARY KEY, codec, size, data)
+    artifacts(record_id, name, hash) PRIMARY KEY (record_id, name)
+
+Reader API:
+    store = ArtifactStore.open_run(run_dir)        # None if the run is not packed
+    store.records(); store.names(rid); store.read_json(rid, "score.json")
+    iter_artifacts(run_dir, "record_steps.json")   # files and packed records alike
+
+CLI:
+    python eval/pipeline/artifact_store.py export <run_dir> [--out DIR] [--record ID ...]
+    python eval/pipeline/artifact_store.py stats <run_dir>
+    python eval/pipeline/artifact_store.py cat <run_dir> <recordId> <name>
+
+Environment:
+    ARTIFACT_STORE   (default: files; packed = pack finished records into artifacts.sqlite)
+"""
+from __future__ import annotations
+import os
+import json
+import zlib
+import shutil
+import hashlib
+import sqlite3
+import threading
+import typing as t
+from pathlib import Path
+
+try:  # optional, better ratio and speed than zlib
+    import zstandard as _zstd
+except ImportError:  # pragma: no cover
+    _zstd = None
+
+ARTIFACT_STORE_MODES = ("files", "packed")
+ARTIFACT_STORE = os.getenv("ARTIFACT_STORE", "files").lower()
+STORE_FILE = "artifacts.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash  TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size  INTEGER NOT NULL,
+    data  BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    record_id TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    hash      TEXT NOT NULL REFERENCES blobs(hash),
+    PRIMARY KEY (record_id, name)
+);
+"""
+
+_mode = ARTIFACT_STORE
+
+def configure_artifact_store(mode: str) -> str:
+    """Override ARTIFACT_STORE for this process."""
+    global _mode
+    if mode not in ARTIFACT_STORE_MODES:
+        raise ValueError(f"artifact store must be one of {ARTIFACT_STORE_MODES}, got {mode!r}")
+    _mode = mode
+    return _mode
+
+def artifact_store_mode() -> str:
+    return _mode
+
+def _compress(data: bytes) -> tuple[str, bytes]:
+    if _zstd is not None:
+        return "zstd", _zstd.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if _zstd is None:
+            raise RuntimeError("artifact was stored with zstd; install the 'zstandard' package to read it")
+        return _zstd.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown artifact codec {codec!r}")
+
+class ArtifactStore:
+    """Thread-safe content-addressed SQLite store of per-record artifacts."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    @classmethod
+    def open_run(cls, run_dir: Path, *, create: bool = False) -> "ArtifactStore | None":
+        path = Path(run_dir) / STORE_FILE
+        if not create and not path.exists():
+            return None
+        return cls(path)
+
+    def pack_dir(self, record_id: str, directory: Path, *, remove: bool = True) -> int:
+        """Store every file of ``directory`` under ``record_id`` (replacing what was stored before); returns the file count."""
+        directory = Path(directory)
+        if not directory.is_dir():
+            return 0
+        files = sorted(p for p in directory.iterdir() if p.is_file() and not p.name.endswith(".tmp"))
+        rows = []
+        blobs = []
+        for p in files:
+            data = p.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()
+            rows.append((record_id, p.name, digest))
+            blobs.append((digest, data))
+        with self._lock:
+            known = set()
+            for digest, data in blobs:
+                if digest in known or self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone():
+                    known.add(digest)
+                    continue
+                codec, packed = _compress(data)
+                self._conn.execute("INSERT INTO blobs (hash, codec, size, data) VALUES (?, ?, ?, ?)", (digest, codec, len(data), packed))
+                known.add(digest)
+            self._conn.execute("DELETE FROM artifacts WHERE record_id = ?", (record_id,))
+            self._conn.executemany("INSERT INTO artifacts (record_id, name, hash) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+        if remove:
+            shutil.rmtree(directory, ignore_errors=True)
+        return len(rows)
+
+    def records(self) -> list[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT record_id FROM artifacts ORDER BY record_id")]
+
+    def names(self, record_id: str) -> list[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT name FROM artifacts WHERE record_id = ? ORDER BY name", (record_id,))]
+
+    def read_bytes(self, record_id: str, name: str) -> bytes:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.codec, b.data FROM artifacts a JOIN blobs b ON b.hash = a.hash WHERE a.record_id = ? AND a.name = ?",
+                (record_id, name)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"{record_id}/{name}")
+        return _decompress(row[0], row[1])
+
+    def read_text(self, record_id: str, name: str) -> str:
+        return self.read_bytes(record_id, name).decode("utf-8")
+
+    def read_json(self, record_id: str, name: str) -> t.Any:
+        return json.loads(self.read_bytes(record_id, name))
+
+    def export(self, dest_dir: Path, record_ids: t.Iterable[str] | None = None) -> int:
+        """Write ``<dest_dir>/<recordId>/<name>`` for the given (default: all) records; returns the file count."""
+        count = 0
+        for rid in (list(record_ids) if record_ids is not None else self.records()):
+            out = Path(dest_dir) / rid
+            names = self.names(rid)
+            if names:
+                out.mkdir(parents=True, exist_ok=True)
+            for name in names:
+                (out / name).write_bytes(self.read_bytes(rid, name))
+                count += 1
+        return count
+
+    def stats(self) -> dict[str,t.Any]:
+        with self._lock:
+            records, artifacts = self._conn.execute("SELECT COUNT(DISTINCT record_id), COUNT(*) FROM artifacts").fetchone()
+            blobs, stored, unique = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            logical = self._conn.execute("SELECT COALESCE(SUM(b.size), 0) FROM artifacts a JOIN blobs b ON b.hash = a.hash").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "records": records,
+            "artifacts": artifacts,
+            "blobs": blobs,
+            "logicalBytes": logical,
+            "uniqueBytes": unique,
+            "storedBytes": stored,
+            "fileBytes": self.path.stat().st_size if self.path.exists() else None,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def iter_artifacts(run_dir: Path, name: str) -> t.Iterator[tuple[str, bytes]]:
+    """``(recordId, content)`` of artifact ``name`` for every record of a run, unpacked or packed."""
+    run_dir = Path(run_dir)
+    seen = set()
+    for path in sorted(run_dir.glob(f"*/{name}")):
+        seen.add(path.parent.name)
+        yield path.parent.name, path.read_bytes()
+    store = ArtifactStore.open_run(run_dir)
+    if store is None:
+        return
+    try:
+        for rid in store.records():
+            if rid in seen:
+                continue
+            try:
+                yield rid, store.read_bytes(rid, name)
+            except KeyError:
+                continue
+    finally:
+        store.close()
+
+def _cli():  # pragma: no cover
+    import argparse
+    ap = argparse.ArgumentParser(description="Inspect or unpack a run's packed artifact store.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export", help="Write the per-record directory layout from the store.")
+    p.add_argument("run_dir")
+    p.add_argument("--out", help="Destination directory (default: the run directory itself).")
+    p.add_argument("--record", action="append", help="Record id to export (repeatable; default: all).")
+    p = sub.add_parser("stats", help="Print record / blob counts and sizes.")
+    p.add_argument("run_dir")
+    p = sub.add_parser("cat", help="Print one artifact.")
+    p.add_argument("run_dir")
+    p.add_argument("record_id")
+    p.add_argument("name")
+    args = ap.parse_args()
+    store = ArtifactStore.open_run(Path(args.run_dir))
+    if store is None:
+        raise SystemExit(f"ERROR: no {STORE_FILE} in {args.run_dir}")
+    try:
+        if args.command == "export":
+            out = Path(args.out) if args.out else Path(args.run_dir)
+            count = store.export(out, args.record)
+            print(f"Exported {count} artifact(s) to {out}")
+        elif args.command == "stats":
+            print(json.dumps(store.stats(), indent=2))
+        else:
+            try:
+                print(store.read_text(args.record_id, args.name), end="")
+            except KeyError:
+                raise SystemExit(f"ERROR: {args.record_id}/{args.name} not in store")
+    finally:
+        store.close()
+
+if __name__ == "__main__":  # pragma: no cover
+    _cli()
@@ -0,0 +1,27 @@
+"""
+Autoscore: deterministic structural scoring of an MCP composition, no LLM involved.
+
+    nodes   = flatten_components(payload)          # normalized MCP payload -> flat node list
+    spec    = compile_specs(expected_components)   # compiled once per distinct spec (memoized)
+    result  = score_components(nodes, spec)        # componentCoverage / propFidelity (0.0-1.0)
+    verdict = gate_decision(result, mode="cap")    # judge | cap | skip before the LLM judge
+
+Expected components (per dataset record, ``expected.json`` next to ``ui-description.md``
+or an ``expected_components`` field in a record JSON):
+
+    [{"type": "KpiCard", "count": 3, "props": {"title": {"exists": true}}},
+     {"type": "Table", "props": {"sortable": true, "columns": {"regex": "status"}}}]
+
+Prop matchers: a literal (exact), a list (one-of), ``{"regex": pattern}`` and
+``{"exists": bool}``. Prop names may be dotted paths into nested props.
+"""
+from .flatten import Node, flatten_components
+from .matchers import compile_matcher
+from .engine import CompiledSpec, compile_specs, score_components, autoscore
+from .gate import GATE_MODES, configure_gate, gate_mode, gate_decision, skipped_judge, gated_overall, apply_gate
+
+__all__ = [
+    "Node", "flatten_components", "compile_matcher", "CompiledSpec", "compile_specs",
+    "score_components", "autoscore", "GATE_MODES", "configure_gate", "gate_mode",
+    "gate_decision", "skipped_judge", "gated_overall", "apply_gate",
+]
@@ -0,0 +1,114 @@
+"""Component coverage / prop fidelity scoring against compiled expected-component specs."""
+from __future__ import annotations
+import re
+import json
+import threading
+import typing as t
+
+from .flatten import Node, flatten_components
+from .matchers import Matcher, compile_matcher, prop_getter
+
+MAX_DETAILS = 20  # failures listed per record
+
+class _ComponentSpec(t.NamedTuple):
+    type: str                 # lower-cased for matching
+    label: str                # as written in the spec
+    count: int
+    props: tuple[tuple[str, t.Callable[[dict], t.Any], Matcher], ...]
+
+class CompiledSpec(t.NamedTuple):
+    components: tuple[_ComponentSpec, ...]
+    expected_count: int
+    required_props: int
+
+_compiled: dict[str, CompiledSpec] = {}
+_compiled_lock = threading.Lock()
+
+def compile_specs(expected_components: list[dict[str,t.Any]]) -> CompiledSpec:
+    """Compile an ``expected_components`` list (memoized on its canonical JSON, so each
+    distinct spec in a dataset is compiled once however many records/workers use it)."""
+    if not isinstance(expected_components, list):
+        raise ValueError("expected_components must be a list")
+    key = json.dumps(expected_components, sort_keys=True, separators=(",", ":"))
+    with _compiled_lock:
+        hit = _compiled.get(key)
+    if hit is not None:
+        return hit
+    components = []
+    for i, raw in enumerate(expected_components):
+        if not isinstance(raw, dict) or not isinstance(raw.get("type"), str):
+            raise ValueError(f"expected_components[{i}] must be an object with a string 'type'")
+        try:
+            count = int(raw.get("count", raw.get("minCount", 1)))
+        except (TypeError, ValueError):
+            count = 0
+        if count < 1:
+            raise ValueError(f"expected_components[{i}].count must be an integer >= 1")
+        raw_props = raw.get("props") or {}
+        if not isinstance(raw_props, dict):
+            raise ValueError(f"expected_components[{i}].props must be an object")
+        try:
+            props = tuple((name, prop_getter(name), compile_matcher(m)) for name, m in raw_props.items())
+        except (TypeError, re.error) as e:  # e.g. a non-string or invalid regex
+            raise ValueError(f"expected_components[{i}].props: {e}") from None
+        components.append(_ComponentSpec(raw["type"].lower(), raw["type"], count, props))
+    spec = CompiledSpec(
+        tuple(components),
+        sum(c.count for c in components),
+        sum(c.count * len(c.props) for c in components),
+    )
+    with _compiled_lock:
+        _compiled[key] = spec
+    return spec
+
+def score_components(nodes: list[Node], spec: CompiledSpec) -> dict[str,t.Any]:
+    """Score flattened ``nodes`` against ``spec``.
+
+    Each expected component claims up to ``count`` nodes of its type, best prop match
+    first; a node is claimed by at most one spec entry. componentCoverage = claimed /
+    expected; propFidelity = satisfied prop checks / (expected * props), missing
+    components counting as failed checks (None when the spec has no prop checks).
+    """
+    by_type: dict[str, list[int]] = {}
+    for i, n in enumerate(nodes):
+        by_type.setdefault(n.type.lower(), []).append(i)
+    claimed: set[int] = set()
+    found = satisfied = 0
+    missing: list[dict[str,t.Any]] = []
+    prop_failures: list[dict[str,t.Any]] = []
+    for comp in spec.components:
+        candidates = [i for i in by_type.get(comp.type, ()) if i not in claimed]
+        if comp.props:
+            ranked = []
+            for i in candidates:
+                props = nodes[i].props
+                ok = [m(get(props)) for _, get, m in comp.props]
+                ranked.append((-sum(ok), i, ok))
+            ranked.sort()
+            picked = ranked[:comp.count]
+            for neg, i, ok in picked:
+                satisfied -= neg
+                if len(prop_failures) < MAX_DETAILS:
+                    prop_failures.extend({"type": comp.label, "id": nodes[i].id, "prop": name}
+                                         for (name, _, _), good in zip(comp.props, ok) if not good)
+            picked_idx = [i for _, i, _ in picked]
+        else:
+            picked_idx = candidates[:comp.count]
+        claimed.update(picked_idx)
+        found += len(picked_idx)
+        if len(picked_idx) < comp.count:
+            missing.append({"type": comp.label, "expected": comp.count, "found": len(picked_idx)})
+    return {
+        "componentCoverage": round(found / spec.expected_count, 4) if spec.expected_count else 1.0,
+        "propFidelity": round(satisfied / spec.required_props, 4) if spec.required_props else None,
+        "expectedComponents": spec.expected_count,
+        "matchedComponents": found,
+        "renderedComponents": len(nodes),
+        "missing": missing,
+        "propFailures": prop_failures[:MAX_DETAILS],
+    }
+
+def autoscore(agent_output: t.Any, expected_components: list[dict[str,t.Any]]) -> dict[str,t.Any]:
+    """Convenience wrapper: parse (if a JSON string), flatten, compile and score."""
+    payload = json.loads(agent_output) if isinstance(agent_output, str) else agent_output
+    return score_components(flatten_components(payload), compile_specs(expected_components))
@@ -0,0 +1,44 @@
+"""Flatten a normalized MCP payload (judge._normalize_mcp_payload) into component nodes."""
+from __future__ import annotations
+import typing as t
+
+class Node(t.NamedTuple):
+    type: str
+    id: str | None
+    slot: str | None
+    props: dict
+    path: str
+
+# Keys under which the payload shapes seen so far keep their component lists / trees.
+_CONTAINERS = ("composition", "components", "root", "children", "items")
+
+def flatten_components(payload: t.Any) -> list[Node]:
+    """Depth-first list of every component in ``payload``.
+
+    Handles ``{"composition": {"components": [...]}}`` (MCP tool result),
+    a bare ``{"components": [...]}``, and the ``{"root": {"type", "children"}}`` tree
+    returned for non-JSON output. Component specs nested inside props (e.g. cards of a
+    Kanban column) are included too, with a path recording where they came from.
+    """
+    nodes: list[Node] = []
+    _walk(payload, "$", nodes)
+    return nodes
+
+def _walk(value: t.Any, path: str, out: list[Node]) -> None:
+    if isinstance(value, list):
+        for i, item in enumerate(value):
+            _walk(item, f"{path}[{i}]", out)
+        return
+    if not isinstance(value, dict):
+        return
+    ctype = value.get("type")
+    props = value.get("props")
+    if isinstance(ctype, str) and (isinstance(props, dict) or "children" in value or "slot" in value):
+        props = props if isinstance(props, dict) else {}
+        out.append(Node(ctype, value.get("id"), value.get("slot"), props, path))
+        for key, sub in props.items():
+            if isinstance(sub, (list, dict)):
+                _walk(sub, f"{path}.props.{key}", out)
+    for key in _CONTAINERS:
+        if key in value:
+            _walk(value[key], f"{path}.{key}", out)
@@ -0,0 +1,81 @@
+"""Gate the LLM judge on autoscore results.
+
+Modes (AUTOSCORE_GATE / --autoscore-gate):
+    off   autoscore is recorded only
+    cap   (default) zero component coverage skips the LLM judge (all dimensions 0);
+          partial coverage caps ``overall`` at 5 * componentCoverage
+    skip  like cap, and perfect coverage + prop fidelity also skips the judge, scoring
+          the structural dimensions (correctness, uiFidelity) 5; with only those two
+          dimensions scored the record has no ``overall`` (None), so it does not enter the
+          overall mean as a 5.0
+"""
+from __future__ import annotations
+import os
+import typing as t
+
+GATE_MODES = ("off", "cap", "skip")
+AUTOSCORE_GATE = os.getenv("AUTOSCORE_GATE", "cap").lower()
+SCORE_MAX = 5
+DIMENSIONS = ["correctness", "uiFidelity", "compositionality", "resilience", "clarity"]
+
+_gate_mode = AUTOSCORE_GATE
+
+def configure_gate(mode: str) -> str:
+    """Override AUTOSCORE_GATE for this process."""
+    global _gate_mode
+    if mode not in GATE_MODES:
+        raise ValueError(f"autoscore gate must be one of {GATE_MODES}, got {mode!r}")
+    _gate_mode = mode
+    return _gate_mode
+
+def gate_mode() -> str:
+    return _gate_mode
+
+def gate_decision(result: dict[str,t.Any] | None, mode: str | None = None) -> dict[str,t.Any]:
+    """``{"decision": "judge"|"cap"|"skip", "reason": ..., "overallCap": float?}``."""
+    mode = mode or _gate_mode
+    if mode not in GATE_MODES:
+        raise ValueError(f"autoscore gate must be one of {GATE_MODES}, got {mode!r}")
+    if not result or mode == "off":
+        return {"decision": "judge", "reason": "noSpec" if not result else "gateOff"}
+    coverage = result["componentCoverage"]
+    if coverage <= 0:
+        return {"decision": "skip", "reason": "zeroCoverage"}
+    if coverage >= 1 and result.get("propFidelity") in (None, 1.0) and mode == "skip":
+        return {"decision": "skip", "reason": "perfectCoverage"}
+    if coverage < 1:
+        return {"decision": "cap", "reason": "partialCoverage", "overallCap": round(SCORE_MAX * coverage, 2)}
+    return {"decision": "judge", "reason": "fullCoverage"}
+
+def skipped_judge(gate: dict[str,t.Any], result: dict[str,t.Any], dimensions: list[str] = DIMENSIONS) -> dict[str,t.Any]:
+    """Judge-shaped score for a record whose LLM judge was skipped by the gate."""
+    if gate["reason"] == "zeroCoverage":
+        scores = {d: 0 for d in dimensions}
+        rationale = f"LLM judge skipped: none of the {result['expectedComponents']} expected components were rendered."
+    else:
+        scores = {"correctness": SCORE_MAX, "uiFidelity": SCORE_MAX}
+        rationale = "LLM judge skipped: all expected components rendered with matching props."
+    out = {"dimensionScores": scores, "rationale": rationale, "judgeSkipped": gate["reason"]}
+    if len(scores) < len(dimensions):
+        out["overall"] = None  # not every dimension was scored
+    return out
+
+def gated_overall(overall: t.Any, gate: dict[str,t.Any]) -> t.Any:
+    """``overall`` after the gate's cap (unchanged when there is no cap or no numeric score)."""
+    cap = gate.get("overallCap")
+    if cap is not None and isinstance(overall, (int, float)) and overall > cap:
+        return cap
+    return overall
+
+def apply_gate(judge_obj: dict[str,t.Any], gate: dict[str,t.Any], result: dict[str,t.Any] | None) -> dict[str,t.Any]:
+    """Attach autoscore to a finalized judge result and apply the overall cap, if any."""
+    if result is None:
+        return judge_obj
+    judge_obj["autoscore"] = {k: result[k] for k in ("componentCoverage", "propFidelity")}
+    judge_obj["autoscore"]["gate"] = gate
+    overall = judge_obj.get("overall")
+    capped = gated_overall(overall, gate)
+    if capped != overall:
+        judge_obj["overallUncapped"] = overall
+        judge_obj["overall"] = capped
+    return judge_obj
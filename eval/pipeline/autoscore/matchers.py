@@ -0,0 +1,62 @@
+"""Prop matchers, compiled once into plain callables."""
+from __future__ import annotations
+import re
+import typing as t
+
+_MISSING = object()
+
+Matcher = t.Callable[[t.Any], bool]
+
+def compile_matcher(spec: t.Any) -> Matcher:
+    """Compile one expected-prop spec.
+
+    - ``"status"`` / ``3`` / ``true``   exact match (strings case-sensitive; 3 == 3.0)
+    - ``["active", "pending"]``        one-of (``true`` / ``false`` only match booleans, 1 / 0 only numbers)
+    - ``{"regex": "\\\\d{4}"}``          re.search against the value (non-strings are JSON-ish str()'d)
+    - ``{"exists": true|false}``       presence / absence of the prop
+    - ``{"oneOf": [...]}`` / ``{"equals": value}``  explicit forms (equals also takes lists/objects)
+    The value passed to a matcher is the prop value, or ``_MISSING`` when the prop is absent.
+    """
+    if isinstance(spec, dict):
+        if "regex" in spec:
+            pattern = re.compile(spec["regex"])
+            return lambda v: v is not _MISSING and v is not None and pattern.search(v if isinstance(v, str) else str(v)) is not None
+        if "exists" in spec:
+            want = bool(spec["exists"])
+            return lambda v: (v is not _MISSING and v is not None) == want
+        if "oneOf" in spec:
+            return compile_matcher(list(spec["oneOf"]))
+        if "equals" in spec:  # also allows list / object values compared as a whole
+            expected = spec["equals"]
+            return lambda v: v is not _MISSING and v == expected
+        raise ValueError(f"Unknown prop matcher {spec!r} (expected regex / exists / oneOf / equals)")
+    if isinstance(spec, list):
+        if all(_hashable(x) for x in spec):
+            choices = frozenset(_typed(x) for x in spec)
+            return lambda v: v is not _MISSING and _hashable(v) and _typed(v) in choices
+        return lambda v: v is not _MISSING and any(_typed(v) == _typed(x) for x in spec)
+    if isinstance(spec, bool):
+        return lambda v: v is spec
+    return lambda v: v is not _MISSING and not isinstance(v, bool) and v == spec
+
+def _hashable(v: t.Any) -> bool:
+    return isinstance(v, (str, int, float, bool)) or v is None
+
+def _typed(v: t.Any) -> tuple[bool, t.Any]:
+    # True == 1 and hash(True) == hash(1): tag booleans so they never match numbers.
+    return isinstance(v, bool), v
+
+def prop_getter(name: str) -> t.Callable[[dict], t.Any]:
+    """Accessor for a (possibly dotted) prop path; returns _MISSING when absent."""
+    if "." not in name:
+        return lambda props: props.get(name, _MISSING)
+    parts = name.split(".")
+
+    def get(props: dict) -> t.Any:
+        cur: t.Any = props
+        for p in parts:
+            if not isinstance(cur, dict) or p not in cur:
+                return _MISSING
+            cur = cur[p]
+        return cur
+    return get
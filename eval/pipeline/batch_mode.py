@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+"""
+Azure OpenAI Batch API execution mode for dataset-wide judging.
+
+Used by run_judge_over_dataset.py --llm-mode batch. Instead of three online chat calls
+per record, every LLM step of the run is submitted as one batch:
+
+  (1)+(2) load records and obtain agent outputs (MCP, concurrently with --workers)
+  (3)+(4) intended and rendered interpretations: one batch each, submitted together
+  (5)     judge scoring: one batch over every record whose steps 3 and 4 succeeded
+
+Results are fanned back into the same per-record artifacts judge.py writes online.
+Batch inputs/outputs are kept under <run_dir>/batch/ for inspection.
+
+Backends:
+  azure  Files + Batches REST API on AZURE_OPENAI_ENDPOINT
+         (AZURE_OPENAI_BATCH_DEPLOYMENT, AZURE_OPENAI_BATCH_API_VERSION)
+  local  file-based stand-in: batches are directories under a root folder and are
+         executed line by line through aoai_chat (so they honor the response cache,
+         e.g. --cache-mode replay-only for fully offline runs)
+
+Local stand-in server (processes batches submitted by other processes, e.g. the runner
+with --batch-local-runner serve --batch-root <root>):
+    python -m eval.pipeline.batch_mode serve --root eval/runs/_local_batches
+
+A local batch is claimed by renaming its ``queued`` marker, so an in-process runner and
+a ``serve`` process on the same root never both execute it.
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import uuid
+import datetime
+import threading
+import typing as t
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from pathlib import Path
+
+import requests
+
+from .tool_aoai import aoai_chat, _build_headers, _parse_completion, usage_fields, AZURE_OPENAI_DEPLOYMENT
+from . import judge
+
+BATCH_TERMINAL = {"completed", "failed", "expired", "cancelled"}
+# Terminal states whose output / error files hold the lines that did finish.
+BATCH_WITH_RESULTS = {"completed", "expired", "cancelled"}
+BATCH_BACKENDS = ("azure", "local")
+LOCAL_RUNNERS = ("inline", "serve")
+
+AZURE_OPENAI_BATCH_DEPLOYMENT  = os.getenv("AZURE_OPENAI_BATCH_DEPLOYMENT", AZURE_OPENAI_DEPLOYMENT)
+AZURE_OPENAI_BATCH_API_VERSION = os.getenv("AZURE_OPENAI_BATCH_API_VERSION", "2024-10-21")
+
+def _now_iso() -> str:
+    try:
+        return datetime.datetime.now(datetime.UTC).isoformat(timespec="milliseconds")
+    except Exception:
+        return datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+
+_print_lock = threading.Lock()
+
+def _log(msg: str) -> None:
+    with _print_lock:
+        print(msg, flush=True)
+
+def _read_jsonl(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+def _write_jsonl(path: Path, rows: t.Iterable[dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows), encoding="utf-8")
+
+# ---------------------
+# Backends
+# ---------------------
+
+class AzureBatchBackend:
+    """Azure OpenAI Files + Batches REST API."""
+
+    def __init__(self, *, endpoint: str | None = None, api_version: str | None = None, deployment: str | None = None):
+        self.endpoint = (endpoint or os.getenv("AZURE_OPENAI_ENDPOINT", "")).rstrip("/")
+        if not self.endpoint:
+            raise RuntimeError("AZURE_OPENAI_ENDPOINT not configured")
+        self.api_version = api_version or AZURE_OPENAI_BATCH_API_VERSION
+        self.deployment = deployment or AZURE_OPENAI_BATCH_DEPLOYMENT
+        self._session = requests.Session()
+
+    def _url(self, path: str) -> str:
+        return f"{self.endpoint}/openai/{path}?api-version={self.api_version}"
+
+    def _check(self, resp: requests.Response, what: str) -> requests.Response:
+        if not (200 <= resp.status_code < 300):
+            raise RuntimeError(f"Batch API {what} failed: {resp.status_code} {resp.text[:500]}")
+        return resp
+
+    def submit(self, input_path: Path) -> str:
+        headers = {k: v for k, v in _build_headers().items() if k.lower() != "content-type"}
+        with input_path.open("rb") as fh:
+            resp = self._session.post(self._url("files"), headers=headers, data={"purpose": "batch"},
+                                      files={"file": (input_path.name, fh, "application/jsonl")}, timeout=300)
+        file_id = self._check(resp, "file upload").json()["id"]
+        resp = self._session.post(self._url("batches"), headers=_build_headers(), timeout=60, json={
+            "input_file_id": file_id,
+            "endpoint": "/chat/completions",
+            "completion_window": "24h",
+        })
+        return self._check(resp, "create").json()["id"]
+
+    def status(self, batch_id: str) -> dict:
+        resp = self._session.get(self._url(f"batches/{batch_id}"), headers=_build_headers(), timeout=60)
+        return self._check(resp, "status").json()
+
+    def _file_lines(self, file_id: str | None) -> list[dict]:
+        if not file_id:
+            return []
+        resp = self._session.get(self._url(f"files/{file_id}/content"), headers=_build_headers(), timeout=300)
+        text = self._check(resp, "download").text
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def results(self, status: dict) -> list[dict]:
+        return self._file_lines(status.get("output_file_id")) + self._file_lines(status.get("error_file_id"))
+
+def default_local_responder(body: dict) -> dict:
+    """Answer one batch line through aoai_chat and wrap it as a chat-completions body."""
+    response_format = (body.get("response_format") or {}).get("type", "json_object")
+    call: dict = {}
+    parsed = aoai_chat(body["messages"], response_format=response_format, call_info=call)
+    usage = {"prompt_tokens": call.get("promptTokens"), "completion_tokens": call.get("completionTokens"), "total_tokens": call.get("totalTokens"),
+             "prompt_tokens_details": {"cached_tokens": call.get("cachedTokens") or 0}}
+    return {
+        "id": f"chatcmpl-local-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "model": body.get("model"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": json.dumps(parsed, ensure_ascii=False)}}],
+        "usage": usage,
+    }
+
+class LocalBatchBackend:
+    """File-based stand-in for the Batch API.
+
+    Each batch is a directory ``<root>/<batch_id>/`` holding ``input.jsonl``,
+    ``status.json``, a ``queued`` marker until some process claims it and, once done,
+    ``output.jsonl`` / ``errors.jsonl`` in the Azure batch output format. With
+    ``inline=True`` submitted batches are executed on a background thread; otherwise a
+    separate ``serve`` process picks them up. A batch still running after
+    ``completion_window_s`` expires like an Azure one: finished lines are kept, the rest
+    are reported as ``batch_expired`` errors.
+    """
+
+    def __init__(self, root: str | os.PathLike, *, responder: t.Callable[[dict], dict] | None = None, workers: int = 4, inline: bool = True,
+                 completion_window_s: float = 24 * 3600):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.responder = responder or default_local_responder
+        self.workers = max(1, workers)
+        self.inline = inline
+        self.completion_window_s = completion_window_s
+        self._lock = threading.Lock()
+
+    def _dir(self, batch_id: str) -> Path:
+        return self.root / batch_id
+
+    def _set_status(self, batch_id: str, **fields: t.Any) -> dict:
+        path = self._dir(batch_id) / "status.json"
+        with self._lock:
+            current = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"id": batch_id, "object": "batch"}
+            current.update(fields)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(current, indent=2), encoding="utf-8")
+            tmp.replace(path)
+        return current
+
+    def submit(self, input_path: Path) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        d = self._dir(batch_id)
+        d.mkdir(parents=True)
+        (d / "input.jsonl").write_bytes(Path(input_path).read_bytes())
+        self._set_status(batch_id, status="validating", created_at=int(time.time()), endpoint="/chat/completions")
+        (d / "queued").touch()
+        if self.inline:
+            threading.Thread(target=self.process, args=(batch_id,), name=f"local-{batch_id}", daemon=True).start()
+        return batch_id
+
+    def status(self, batch_id: str) -> dict:
+        return json.loads((self._dir(batch_id) / "status.json").read_text(encoding="utf-8"))
+
+    def results(self, status: dict) -> list[dict]:
+        d = self._dir(status["id"])
+        return _read_jsonl(d / "output.jsonl") + _read_jsonl(d / "errors.jsonl")
+
+    def _claim(self, batch_id: str) -> bool:
+        """Take a queued batch; the rename succeeds for exactly one process or thread."""
+        d = self._dir(batch_id)
+        try:
+            (d / "queued").rename(d / f"claimed.{os.getpid()}.{threading.get_ident()}")
+        except FileNotFoundError:
+            return False
+        return True
+
+    def process(self, batch_id: str) -> bool:
+        """Execute a queued batch; False when another process or thread claimed it first."""
+        if not self._claim(batch_id):
+            return False
+        d = self._dir(batch_id)
+        lines = _read_jsonl(d / "input.jsonl")
+        started = time.monotonic()
+        self._set_status(batch_id, status="in_progress", in_progress_at=int(time.time()),
+                         request_counts={"total": len(lines), "completed": 0, "failed": 0})
+
+        def run(line: dict) -> tuple[bool, dict]:
+            try:
+                body = self.responder(line["body"])
+                return True, {"id": f"response-{uuid.uuid4().hex[:8]}", "custom_id": line["custom_id"],
+                              "response": {"status_code": 200, "body": body}, "error": None}
+            except Exception as e:
+                return False, {"id": f"response-{uuid.uuid4().hex[:8]}", "custom_id": line["custom_id"],
+                               "response": None, "error": {"code": type(e).__name__, "message": str(e)}}
+
+        outcomes: list[tuple[bool, dict] | None] = [None] * len(lines)
+        expired = False
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="local-batch")
+        try:
+            futures = {pool.submit(run, line): i for i, line in enumerate(lines)}
+            for fut in as_completed(futures, timeout=max(0.0, started + self.completion_window_s - time.monotonic())):
+                outcomes[futures[fut]] = fut.result()
+        except FuturesTimeout:
+            expired = True
+        finally:
+            # Lines still running when the window closes finish in the background; their results are dropped.
+            pool.shutdown(wait=not expired, cancel_futures=True)
+        for i, outcome in enumerate(outcomes):
+            if outcome is None:
+                outcomes[i] = (False, {"id": f"response-{uuid.uuid4().hex[:8]}", "custom_id": lines[i]["custom_id"], "response": None,
+                                       "error": {"code": "batch_expired", "message": "This line could not be executed before the completion window expired."}})
+        # Output files first: a reader that sees the terminal status also sees every finished line.
+        _write_jsonl(d / "output.jsonl", [row for ok, row in outcomes if ok])
+        _write_jsonl(d / "errors.jsonl", [row for ok, row in outcomes if not ok])
+        ok_count = sum(1 for ok, _ in outcomes if ok)
+        self._set_status(batch_id, status="expired" if expired else "completed", **{"expired_at" if expired else "completed_at": int(time.time())},
+                         output_file_id="output.jsonl", error_file_id="errors.jsonl",
+                         request_counts={"total": len(lines), "completed": ok_count, "failed": len(lines) - ok_count})
+        return True
+
+    def serve(self, poll_interval: float = 1.0) -> None:  # pragma: no cover
+        """Process batches submitted to ``root`` by other processes until interrupted."""
+        print(f"[local-batch] serving {self.root}", flush=True)
+        while True:
+            for marker in sorted(self.root.glob("*/queued")):
+                batch_id = marker.parent.name
+                if self.process(batch_id):
+                    print(f"[local-batch] processed {batch_id}: {self.status(batch_id).get('status')}", flush=True)
+            time.sleep(poll_interval)
+
+def make_backend(kind: str, *, run_dir: Path, local_root: str | None = None, workers: int = 4, local_runner: str = "inline"):
+    """Batch backend for the runner; ``local_runner`` = serve leaves local batches to a separate ``serve`` process."""
+    if kind == "azure":
+        return AzureBatchBackend()
+    if kind == "local":
+        if local_runner not in LOCAL_RUNNERS:
+            raise ValueError(f"local batch runner must be one of {LOCAL_RUNNERS}, got {local_runner!r}")
+        return LocalBatchBackend(local_root or (run_dir / "batch" / "local-server"), workers=workers, inline=local_runner == "inline")
+    raise ValueError(f"Unknown batch backend '{kind}' (expected one of {', '.join(BATCH_BACKENDS)})")
+
+# ---------------------
+# Stage execution
+# ---------------------
+
+def run_stage(stage: str, requests_by_id: dict[str, list[dict]], backend, work_dir: Path, *, poll_interval: float = 10.0, timeout_s: float = 24 * 3600) -> tuple[dict[str, t.Any], dict]:
+    """Submit one batch for ``stage`` and wait for it.
+
+    Returns ``(results, info)`` where ``results`` maps custom_id to the parsed JSON
+    content or to an Exception, and ``info`` describes the batch (id, timings, counts).
+    """
+    info: dict[str, t.Any] = {"stage": stage, "requests": len(requests_by_id), "startedAt": _now_iso()}
+    if not requests_by_id:
+        info["endedAt"] = _now_iso()
+        return {}, info
+    input_path = work_dir / f"{stage}.input.jsonl"
+    _write_jsonl(input_path, ({
+        "custom_id": cid,
+        "method": "POST",
+        "url": "/chat/completions",
+        "body": {"model": AZURE_OPENAI_BATCH_DEPLOYMENT, "messages": messages, "response_format": {"type": "json_object"}},
+    } for cid, messages in requests_by_id.items()))
+
+    batch_id = backend.submit(input_path)
+    info["batchId"] = batch_id
+    _log(f"[batch] {stage}: submitted {len(requests_by_id)} requests as {batch_id}")
+    deadline = time.monotonic() + timeout_s
+    while True:
+        status = backend.status(batch_id)
+        if status.get("status") in BATCH_TERMINAL:
+            break
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Batch {batch_id} ({stage}) did not finish within {timeout_s}s (status={status.get('status')})")
+        time.sleep(poll_interval)
+    info.update({"status": status.get("status"), "requestCounts": status.get("request_counts"), "endedAt": _now_iso()})
+    _log(f"[batch] {stage}: {batch_id} {status.get('status')} {status.get('request_counts') or ''}")
+
+    # Expired / cancelled batches still carry the lines that finished before the cut-off.
+    rows = backend.results(status) if status.get("status") in BATCH_WITH_RESULTS else []
+    _write_jsonl(work_dir / f"{stage}.output.jsonl", rows)
+    results: dict[str, t.Any] = {}
+    calls: dict[str, dict] = {}
+    for row in rows:
+        cid = row.get("custom_id")
+        resp = row.get("response") or {}
+        if row.get("error") or resp.get("status_code") != 200:
+            results[cid] = RuntimeError(f"batch line failed: {row.get('error') or resp.get('status_code')}")
+            continue
+        try:
+            results[cid], usage = _parse_completion(json.dumps(resp.get("body") or {}))
+            calls[cid] = {"batch": True, "attempts": 1, **usage_fields(usage)}
+        except Exception as e:
+            results[cid] = e
+    for cid in requests_by_id:
+        results.setdefault(cid, RuntimeError(f"no result for {cid} in batch {batch_id} (status={status.get('status')})"))
+    info["calls"] = calls
+    return results, info
+
+def _checked(value: t.Any, purpose: str, check: t.Callable[[dict], t.Any] | None = None) -> t.Any:
+    """Apply judge.py's JSON checks to a batch result, turning SystemExit into an error."""
+    if isinstance(value, Exception):
+        raise value
+    try:
+        obj = judge._coerce_json(value, purpose)
+        return check(obj) if check else obj
+    except SystemExit:
+        raise RuntimeError(f"{purpose} output invalid")
+
+# ---------------------
+# Dataset-wide orchestration
+# ---------------------
+
+def _batch_step_fields(info: dict, custom_id: str | None = None, compaction: dict | None = None) -> dict:
+    fields = {"llmMode": "batch", "batchId": info.get("batchId"), "startedAt": info["startedAt"], "endedAt": info["endedAt"]}
+    call = info.get("calls", {}).get(custom_id)
+    if call or compaction:
+        fields["call"] = {**(call or {}), **({"compaction": compaction} if compaction else {})}
+    return fields
+
+def process_records_batch(items: list[tuple[int, Path, Path]], *, ui_key: str, mcp_endpoint: str, model: str, backend, work_dir: Path, workers: int = 1, poll_interval: float = 10.0, judge_mode: str = "classic") -> dict[int, dict]:
+    """Run steps 1–5 for ``items`` = [(idx, record_path, out_dir)] with batched LLM stages.
+
+    With ``judge_mode="fused"`` steps 3-5 are a single batch of fused judge calls.
+    Returns ``{idx: {"summary": ...}}`` or ``{idx: {"error": str}}`` per record.
+    """
+    if judge_mode not in ("classic", "fused"):
+        raise ValueError(f"batch mode supports judge_mode classic or fused, got {judge_mode!r}")
+    work_dir.mkdir(parents=True, exist_ok=True)
+    outcomes: dict[int, dict] = {}
+    live: dict[int, dict] = {}  # idx -> record state
+
+    # STEPS 1+2 (online; MCP calls in parallel)
+    def prepare(item: tuple[int, Path, Path]) -> tuple[int, dict]:
+        idx, record_path, out_dir = item
+        try:
+            ctx = judge.start_record(record_path, out_dir, ui_key=ui_key)
+            started, t0 = _now_iso(), time.perf_counter()
+            call: dict = {}
+            agent_output, agent_info = judge._get_agent_output(ctx["uiDescription"], endpoint=mcp_endpoint, call_info=call)
+            judge.save_agent_output(out_dir, agent_output, agent_info)
+            ctx["stepLog"].append({"step":2,"name":"mcp_output","endpoint":mcp_endpoint,"agentOutputLength":len(agent_output),**agent_info,
+                                   "startedAt":started,"endedAt":_now_iso(),"durationMs":int((time.perf_counter() - t0) * 1000),"call":call})
+            started, t0 = _now_iso(), time.perf_counter()
+            auto_result, gate = judge.run_autoscore(ctx, agent_output, out_dir)
+            if auto_result is not None:
+                ctx["stepLog"].append({"step":2,"name":"autoscore","componentCoverage":auto_result["componentCoverage"],"propFidelity":auto_result["propFidelity"],"gate":gate["decision"],
+                                       "startedAt":started,"endedAt":_now_iso(),"durationMs":int((time.perf_counter() - t0) * 1000)})
+            return idx, {"ctx": ctx, "outDir": out_dir, "agentOutput": agent_output, "agentInfo": agent_info, "autoscore": (auto_result, gate),
+                         "compaction": {"intended": {}, "rendered": {}, "judge": {}, "fused": {}}}
+        except Exception as e:
+            return idx, {"error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-prep") as pool:
+        for idx, state in pool.map(prepare, items):
+            if "error" in state:
+                outcomes[idx] = {"error": state["error"]}
+            elif state["autoscore"][1]["decision"] == "skip":
+                outcomes[idx] = _finish_gated(state, mcp_endpoint=mcp_endpoint, model=model, ui_key=ui_key)
+            else:
+                live[idx] = state
+    cid = {idx: state["ctx"]["recordId"] for idx, state in live.items()}
+
+    if judge_mode == "fused":
+        _run_fused_stage(live, cid, outcomes, mcp_endpoint=mcp_endpoint, model=model, ui_key=ui_key, backend=backend, work_dir=work_dir, poll_interval=poll_interval)
+        return outcomes
+
+    # STEPS 3+4: independent, so both batches are in flight together
+    req3 = {cid[i]: judge.build_intended_messages(s["ctx"]["uiDescription"], s["ctx"]["prompts"]["intended"], s["compaction"]["intended"]) for i, s in live.items()}
+    for state in live.values():  # --rendered-extractor local: no batch line for parseable payloads
+        state["rendered"] = judge.interpret_rendered_local(state["outDir"], state["agentOutput"])
+    req4 = {cid[i]: judge.build_rendered_messages(s["agentOutput"], s["ctx"]["prompts"]["rendered"], s["compaction"]["rendered"]) for i, s in live.items() if s["rendered"] is None}
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="batch-stage") as pool:
+        f3 = pool.submit(run_stage, "step3_intended", req3, backend, work_dir, poll_interval=poll_interval)
+        f4 = pool.submit(run_stage, "step4_rendered", req4, backend, work_dir, poll_interval=poll_interval)
+        (res3, info3), (res4, info4) = f3.result(), f4.result()
+
+    for idx in list(live):
+        state = live[idx]
+        prompts, out_dir = state["ctx"]["prompts"], state["outDir"]
+        try:
+            state["intended"] = _checked(res3[cid[idx]], "Intended Interpretation")
+            judge.save_intended(out_dir, prompts["intended"], state["intended"])
+            if state["rendered"] is None:
+                state["rendered"] = _checked(res4[cid[idx]], "Rendered Interpretation")
+                judge.save_rendered(out_dir, prompts["rendered"], state["rendered"])
+                state["renderedExtractor"] = "llm" if judge.rendered_extractor_mode() == "llm" else "llm-fallback"
+            else:
+                state["renderedExtractor"] = "local"
+        except Exception as e:
+            outcomes[idx] = {"error": str(e)}
+            del live[idx]
+
+    # STEP 5
+    req5 = {cid[i]: judge.build_judge_messages(s["intended"], s["rendered"], s["ctx"]["prompts"]["judge"], s["ctx"]["uiDescription"], s["agentOutput"], s["compaction"]["judge"]) for i, s in live.items()}
+    res5, info5 = run_stage("step5_judge", req5, backend, work_dir, poll_interval=poll_interval)
+
+    for idx, state in live.items():
+        ctx, out_dir = state["ctx"], state["outDir"]
+        try:
+            judge_obj = judge.apply_gate(_checked(res5[cid[idx]], "Judge Scoring", judge.finalize_judge), state["autoscore"][1], state["autoscore"][0])
+            judge.save_judge(out_dir, ctx["prompts"]["judge"], judge_obj)
+            ctx["stepLog"].append({"step":3,"name":"intended","keys":list(state["intended"].keys()),**_batch_step_fields(info3, cid[idx], state["compaction"]["intended"])})
+            ctx["stepLog"].append({"step":4,"name":"rendered","keys":list(state["rendered"].keys()),"extractor":state["renderedExtractor"],
+                                   **_batch_step_fields(info4, cid[idx], state["compaction"]["rendered"])})
+            ctx["stepLog"].append({"step":5,"name":"judge","overall":judge_obj.get("overall"),"dimensions":list(judge_obj.get("dimensionScores", {}).keys()),**_batch_step_fields(info5, cid[idx], state["compaction"]["judge"])})
+            summary = judge.finish_record(ctx, out_dir, model=model, mcp_endpoint=mcp_endpoint, ui_key=ui_key,
+                                          agent_info=state["agentInfo"], judge_obj=judge_obj,
+                                          meta_extra={"llmMode": "batch", "batchIds": {"step3": info3.get("batchId"), "step4": info4.get("batchId"), "step5": info5.get("batchId")}})
+            outcomes[idx] = {"summary": summary}
+        except Exception as e:
+            outcomes[idx] = {"error": str(e)}
+
+    _write_jsonl(work_dir / "stages.jsonl", [{k: v for k, v in info.items() if k != "calls"} for info in (info3, info4, info5)])
+    return outcomes
+
+def _finish_gated(state: dict, *, mcp_endpoint: str, model: str, ui_key: str) -> dict:
+    """Finish a record whose LLM steps were skipped by the autoscore gate (no batch lines)."""
+    auto_result, gate = state["autoscore"]
+    try:
+        judge_obj = judge.apply_gate(judge.finalize_judge(judge.skipped_judge(gate, auto_result)), gate, auto_result)
+        for step, name in ((3, "intended"), (4, "rendered"), (5, "judge")):
+            state["ctx"]["stepLog"].append({"step": step, "name": name, "skipped": gate["reason"]})
+        summary = judge.finish_record(state["ctx"], state["outDir"], model=model, mcp_endpoint=mcp_endpoint, ui_key=ui_key,
+                                      agent_info=state["agentInfo"], judge_obj=judge_obj, meta_extra={"llmMode": "batch", "judgeSkipped": gate["reason"]})
+        return {"summary": summary}
+    except Exception as e:
+        return {"error": str(e)}
+
+def _run_fused_stage(live: dict[int, dict], cid: dict[int, str], outcomes: dict[int, dict], *, mcp_endpoint: str, model: str, ui_key: str, backend, work_dir: Path, poll_interval: float) -> None:
+    """STEPS 3-5 as one batch of fused judge calls."""
+    req = {cid[i]: judge.build_fused_messages(s["ctx"]["uiDescription"], s["agentOutput"], s["ctx"]["prompts"]["fused"], s["compaction"]["fused"]) for i, s in live.items()}
+    res, info = run_stage("fused_judge", req, backend, work_dir, poll_interval=poll_interval)
+
+    for idx, state in live.items():
+        ctx, out_dir = state["ctx"], state["outDir"]
+        try:
+            fused = _checked(res[cid[idx]], "Fused Judge")
+            intended, rendered, judge_obj = _checked(fused, "Fused Judge", judge.split_fused)
+            judge_obj = judge.apply_gate(judge_obj, state["autoscore"][1], state["autoscore"][0])
+            judge.save_fused(out_dir, ctx["prompts"]["fused"], fused)
+            judge._write_json(out_dir / "intended_interpretation.json", intended)
+            judge._write_json(out_dir / "rendered_interpretation.json", rendered)
+            ctx["stepLog"].append({"step":5,"name":"fused","fusedSteps":[3,4,5],"overall":judge_obj.get("overall"),"dimensions":list(judge_obj.get("dimensionScores", {}).keys()),**_batch_step_fields(info, cid[idx], state["compaction"]["fused"])})
+            summary = judge.finish_record(ctx, out_dir, model=model, mcp_endpoint=mcp_endpoint, ui_key=ui_key,
+                                          agent_info=state["agentInfo"], judge_obj=judge_obj,
+                                          meta_extra={"llmMode": "batch", "judgeMode": "fused", "stepsCompleted": [1,2,"3-5"],
+                                                      "promptTemplates": {"fused": judge.PROMPT_FUSED.name}, "batchIds": {"fused": info.get("batchId")}})
+            outcomes[idx] = {"summary": summary}
+        except Exception as e:
+            outcomes[idx] = {"error": str(e)}
+
+    _write_jsonl(work_dir / "stages.jsonl", [{k: v for k, v in info.items() if k != "calls"}])
+
+# ---------------------
+# CLI
+# ---------------------
+
+def _cli():  # pragma: no cover
+    import argparse
+    ap = argparse.ArgumentParser(description="Local file-based stand-in for the Azure OpenAI Batch API.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("serve", help="Process batches submitted to a local batch root.")
+    sp.add_argument("--root", required=True, help="Directory holding local batches.")
+    sp.add_argument("--workers", type=int, default=4, help="Concurrent requests per batch.")
+    sp.add_argument("--poll-sec", type=float, default=1.0)
+    sp.add_argument("--completion-window-s", type=float, default=24 * 3600, help="Expire batches still running after this long (default: 24h).")
+    args = ap.parse_args()
+    try:
+        LocalBatchBackend(args.root, workers=args.workers, inline=False, completion_window_s=args.completion_window_s).serve(args.poll_sec)
+    except KeyboardInterrupt:
+        print("Interrupted.", file=sys.stderr)
+
+if __name__ == "__main__":  # pragma: no cover
+    _cli()
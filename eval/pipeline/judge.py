@@ -2,24 +2,34 @@
 """
 LLM-only single-record evaluation pipeline.
 
-Steps:
+Steps (2 and 3 run concurrently; 4 starts once 2 lands; 5 waits for 3 and 4):
   (1) Load record & extract UI description
-  (2) Obtain agent output via (currently stub) MCP tool
+  (2) Obtain agent output via MCP tool (optionally reused from the MCP output cache),
+      then autoscore it against the record's expected_components (if any). Zero
+      coverage skips steps 4-5; partial coverage caps the overall score (see autoscore/gate.py)
   (3) LLM: Interpret intended UI -> intended_interpretation.json
   (4) LLM: Interpret rendered UI -> rendered_interpretation.json
+      (--rendered-extractor local derives it from the MCP payload instead; LLM only if unparseable)
   (5) LLM: Judge & score -> score.json
 
+With --judge-mode fused, steps 3-5 are a single LLM call (judge_fused.prompt.txt) that
+returns both interpretations and the scores; --judge-mode calibrate runs classic and
+fused side by side (classic is scored, the fused result is kept for agreement checks).
+
 Artifacts:
   record.json
   ui_description.txt
   agent_output.txt
+  autoscore.json                                 (records with expected_components)
   prompt_step3_intended.txt
   intended_interpretation.json
   prompt_step4_rendered.txt
   rendered_interpretation.json
   prompt_step5_judge.txt
+  prompt_fused_judge.txt / fused_response.json   (fused / calibrate modes)
   score.json
   meta.json
+  fingerprints.json                              (per-step input fingerprints, see step_fingerprints.py)
 
 This version removes all heuristic/stub scoring or interpretation. Failure in any
 LLM step aborts the run with non‑zero exit.
@@ -32,7 +42,9 @@ import datetime
 from pathlib import Path
 from typing import Any, Dict, Optional
 import sys
-import requests
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Default MCP tool call timeout (seconds). Can be overridden via env MCP_TOOL_TIMEOUT_SEC.
 _DEFAULT_MCP_TIMEOUT = 30
@@ -42,15 +54,34 @@ except Exception:
     _DEFAULT_MCP_TIMEOUT = 90
 
 try:
-    from .tool_aoai import aoai_chat  # uses environment-configured Azure OpenAI deployment
+    from .tool_aoai import aoai_chat, configure_cache, cache_mode, cache_stats, estimate_cost, routes_configured, CACHE_MODES  # uses environment-configured Azure OpenAI deployment
 except Exception as e:  # pragma: no cover
     print(f"ERROR: cannot import aoai_chat from tool_aoai.py: {e}", file=sys.stderr)
     raise
+from .mcp_cache import MCPOutputCache, MCP_CACHE_MODES
+from .mcp_client import MCPClient, MCPError, MCPBatchPrefetcher
+from .prompt_compaction import compact_input, configure_compaction
+from .rendered_extractor import extract_rendered, configure_rendered_extractor, rendered_extractor_mode, EXTRACTOR_MODES
+from .autoscore import flatten_components, compile_specs, score_components, gate_decision, skipped_judge, gated_overall, apply_gate, configure_gate, gate_mode, GATE_MODES
+from .step_fingerprints import content_hash, llm_inputs, step_fingerprint, load_fingerprints, save_fingerprints, link_artifacts
 
 PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
 PROMPT_INTENDED = PROMPTS_DIR / "interpret_intended.prompt.txt"
 PROMPT_RENDERED = PROMPTS_DIR / "interpret_rendered.prompt.txt"
 PROMPT_JUDGE    = PROMPTS_DIR / "judge_scoring.prompt.txt"
+PROMPT_FUSED    = PROMPTS_DIR / "judge_fused.prompt.txt"
+
+# classic: steps 3, 4, 5 as separate calls; fused: one call; calibrate: both (classic scored)
+JUDGE_MODES = ("classic", "fused", "calibrate")
+
+# Step-2 output cache (see mcp_cache.py). Mode: off | write | reuse.
+MCP_CACHE_PATH = os.environ.get("MCP_CACHE_PATH", ".cache/mcp-outputs.sqlite")
+_mcp_cache_mode = os.environ.get("MCP_CACHE_MODE", "off")
+_mcp_cache: MCPOutputCache | None = None
+_mcp_clients: Dict[str, MCPClient] = {}
+_mcp_pool_size: Optional[int] = None
+_mcp_prefetcher: MCPBatchPrefetcher | None = None
+_mcp_lock = threading.Lock()
 
 def _now_iso() -> str:
     try:
@@ -79,60 +110,24 @@ def extract_ui_description(record: Dict[str, Any], ui_key: str) -> str:
             return str(record[c])
     raise SystemExit("UI description key not found in record.")
 
-def _call_mcp_tool(description: str, endpoint: str) -> str:
+def _call_mcp_tool(description: str, endpoint: str, call_info: Optional[Dict[str, Any]] = None) -> str:
     """
-    Call MCP server via HTTP. Fail fast if unavailable.
+    Call MCP server via HTTP (pooled client, see mcp_client.py). Fail fast if unavailable.
     Exits with code 31 if MCP returns an error.
+    ``call_info`` (optional) is filled with attempts, health-check, connection reuse and total latency.
+    A result prefetched through /mcp/tools/call-batch (configure_mcp_batch) is used when there is one.
     """
-    # Health check
-    try:
-        resp = requests.get(f"{endpoint}/mcp/health", timeout=3)
-        if resp.status_code != 200:
-            print(f"ERROR: MCP server at {endpoint} unhealthy: {resp.status_code}", file=sys.stderr)
-            raise SystemExit(30)
-    except requests.RequestException as e:
-        print(f"ERROR: Cannot reach MCP server at {endpoint}: {e}", file=sys.stderr)
-        raise SystemExit(30)
-    
-    # Call tool
-    payload = {
-        "name": "create_portal_ui",
-        "arguments": {"message": description}
-    }
-    timeout_seconds = max(1, _DEFAULT_MCP_TIMEOUT)
-    attempts = 2  # single retry on timeout or transient network error
-    last_exc: Exception | None = None
-    for attempt in range(1, attempts + 1):
+    prefetcher = _mcp_prefetcher
+    result = None
+    if prefetcher is not None and prefetcher.client.endpoint == endpoint.rstrip("/"):
+        result = prefetcher.take(description, call_info)
+    if result is None:
         try:
-            resp = requests.post(f"{endpoint}/mcp/tools/call", json=payload, timeout=timeout_seconds)
-            if resp.status_code != 200:
-                print(f"ERROR: MCP tool call failed: {resp.status_code}", file=sys.stderr)
-                raise SystemExit(32)
-            try:
-                result = resp.json()
-            except Exception as e:  # JSON parse error
-                print(f"ERROR: Cannot parse MCP response: {e}", file=sys.stderr)
-                raise SystemExit(33)
-            break
-        except requests.Timeout as e:
-            last_exc = e
-            if attempt < attempts:
-                print(f"WARNING: MCP tool call timed out after {timeout_seconds}s (attempt {attempt}/{attempts}), retrying...", file=sys.stderr)
-                continue
-            print(f"ERROR: MCP tool call timeout after {timeout_seconds}s (final attempt)", file=sys.stderr)
-            raise SystemExit(32)
-        except requests.RequestException as e:
-            last_exc = e
-            if attempt < attempts:
-                print(f"WARNING: MCP tool call exception '{e}' (attempt {attempt}/{attempts}), retrying...", file=sys.stderr)
-                continue
-            print(f"ERROR: MCP tool call exception: {e}", file=sys.stderr)
-            raise SystemExit(32)
-    else:  # pragma: no cover - defensive, loop should exit via break/raise
-        if last_exc:
-            print(f"ERROR: MCP tool call failed: {last_exc}", file=sys.stderr)
-            raise SystemExit(32)
-    
+            result = get_mcp_client(endpoint).call_tool("create_portal_ui", {"message": description}, call_info=call_info)
+        except MCPError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            raise SystemExit(e.exit_code)
+
     # Normalize payload
     normalized = _normalize_mcp_payload(result)
     if "error" in normalized:
@@ -145,6 +140,136 @@ def _call_mcp_tool(description: str, endpoint: str) -> str:
     
     return json.dumps(normalized, indent=2)
 
+def configure_mcp_cache(mode: str | None = None, path: str | None = None) -> MCPOutputCache | None:
+    """Select the MCP output cache mode for this process (overrides MCP_CACHE_MODE)."""
+    global _mcp_cache, _mcp_cache_mode
+    with _mcp_lock:
+        if mode is not None:
+            if mode not in MCP_CACHE_MODES:
+                raise ValueError(f"Unknown MCP cache mode '{mode}' (expected one of {', '.join(MCP_CACHE_MODES)})")
+            _mcp_cache_mode = mode
+        if _mcp_cache is not None:
+            _mcp_cache.close()
+            _mcp_cache = None
+        return _open_mcp_cache(path)
+
+def _open_mcp_cache(path: str | None = None) -> MCPOutputCache | None:
+    # Caller holds _mcp_lock.
+    global _mcp_cache
+    if _mcp_cache_mode != "off":
+        _mcp_cache = MCPOutputCache(path or MCP_CACHE_PATH, mode=_mcp_cache_mode)
+    return _mcp_cache
+
+def _get_mcp_cache() -> MCPOutputCache | None:
+    cache = _mcp_cache
+    if cache is not None or _mcp_cache_mode == "off":
+        return cache
+    with _mcp_lock:  # first caller opens it; the others get the same instance
+        return _mcp_cache if _mcp_cache is not None else _open_mcp_cache()
+
+def mcp_cache_stats() -> Optional[Dict[str, Any]]:
+    return _mcp_cache.stats() if _mcp_cache is not None else None
+
+def configure_mcp_client(pool_size: int | None = None) -> None:
+    """Size the keep-alive pool of MCP clients created from now on (the runner passes its worker count)."""
+    global _mcp_pool_size
+    with _mcp_lock:
+        _mcp_pool_size = pool_size
+
+def get_mcp_client(endpoint: str) -> MCPClient:
+    """Process-wide MCP client for ``endpoint`` (created lazily, shared by all workers)."""
+    with _mcp_lock:
+        client = _mcp_clients.get(endpoint)
+        if client is None:
+            client = _mcp_clients[endpoint] = MCPClient(endpoint, pool_size=_mcp_pool_size, timeout_s=_DEFAULT_MCP_TIMEOUT)
+        return client
+
+def mcp_client_stats() -> Optional[list]:
+    with _mcp_lock:
+        clients = list(_mcp_clients.values())
+    return [c.stats() for c in clients] or None
+
+def configure_mcp_batch(endpoint: Optional[str] = None, chunk_size: int = 0) -> MCPBatchPrefetcher | None:
+    """Prefetch step 2 through /mcp/tools/call-batch, ``chunk_size`` records per request (0: off; closes the current prefetcher)."""
+    global _mcp_prefetcher
+    with _mcp_lock:
+        previous, _mcp_prefetcher = _mcp_prefetcher, None
+    if previous is not None:
+        previous.close()
+    if endpoint and chunk_size > 0:
+        prefetcher = MCPBatchPrefetcher(get_mcp_client(endpoint), chunk_size=chunk_size)
+        with _mcp_lock:
+            _mcp_prefetcher = prefetcher
+    return _mcp_prefetcher
+
+def prefetch_agent_outputs(descriptions: list) -> int:
+    """Queue step-2 calls for ``descriptions`` (in processing order); returns how many were queued."""
+    prefetcher = _mcp_prefetcher
+    return prefetcher.prefetch(descriptions) if prefetcher is not None else 0
+
+def mcp_batch_stats() -> Optional[Dict[str, Any]]:
+    prefetcher = _mcp_prefetcher
+    return prefetcher.stats() if prefetcher is not None else None
+
+def _mcp_build_id(endpoint: str) -> Optional[str]:
+    """Build identifier reported by /mcp/health (cached by the endpoint's client); None if unreachable."""
+    return get_mcp_client(endpoint).build_id()
+
+_untracked_warned: set = set()
+
+def _mcp_build_tracked(endpoint: str) -> bool:
+    """Whether agent outputs of ``endpoint`` may be reused across runs (MCP cache, --incremental-from).
+
+    Needs a build id that follows the agent code (MCP_BUILD_ID or the server's code hash); a
+    server that only reports its version could serve stale outputs after code edits. An
+    unreachable server counts as tracked so the cache can still stand in for it.
+    """
+    client = get_mcp_client(endpoint)
+    if client.build_id() is None or client.build_id_tracked():
+        return True
+    with _mcp_lock:
+        warn = endpoint not in _untracked_warned
+        _untracked_warned.add(endpoint)
+    if warn:
+        print(f"WARNING: MCP server at {endpoint} reports no build id that tracks its code (set MCP_BUILD_ID); agent outputs are not reused across runs", file=sys.stderr)
+    return False
+
+def _mcp_fingerprint(description_hash: str, endpoint: str) -> Optional[str]:
+    """Step-2 input fingerprint (None when the server build is not tracked, so step 2 is never linked)."""
+    if not _mcp_build_tracked(endpoint):
+        return None
+    return step_fingerprint("mcp", description=description_hash, endpoint=endpoint, buildId=_mcp_build_id(endpoint))
+
+def mcp_call_needed(description: str, endpoint: str, *, out_dir: Optional[Path] = None, resume: bool = False, incremental_from: Optional[Path] = None) -> bool:
+    """Whether step 2 of a record would call the MCP server, i.e. is not reused (resume / fingerprint) or cached."""
+    if resume and out_dir is not None and load_step_artifact(out_dir, "mcp") is not None:
+        return False
+    if incremental_from is not None:
+        fingerprint = _mcp_fingerprint(content_hash(description), endpoint)
+        if fingerprint is not None and load_fingerprints(incremental_from).get("mcp") == fingerprint and (incremental_from / STEP_ARTIFACTS["mcp"][0]).is_file():
+            return False
+    cache = _get_mcp_cache()
+    return cache is None or not _mcp_build_tracked(endpoint) or not cache.contains(description, endpoint, _mcp_build_id(endpoint))
+
+def _get_agent_output(description: str, endpoint: str, call_info: Optional[Dict[str, Any]] = None) -> tuple[str, Dict[str, Any]]:
+    """Step 2 through the optional MCP output cache.
+
+    Returns the agent output plus ``{"source": "fresh"|"cached", "buildId": ...}``.
+    """
+    cache = _get_mcp_cache()
+    if cache is None:
+        return _call_mcp_tool(description, endpoint=endpoint, call_info=call_info), {"source": "fresh"}
+    build_id = _mcp_build_id(endpoint)
+    hit = cache.get(description, endpoint, build_id) if _mcp_build_tracked(endpoint) else None
+    if hit is not None:
+        if call_info is not None:
+            call_info.update(cacheHit=True, attempts=0)
+        return hit[0], {"source": "cached", "buildId": hit[1]}
+    output = _call_mcp_tool(description, endpoint=endpoint, call_info=call_info)
+    build_id = build_id or "unknown"
+    cache.put(description, endpoint, build_id, output)
+    return output, {"source": "fresh", "buildId": build_id}
+
 def _normalize_mcp_payload(payload: dict) -> dict:
     """
     Normalize various MCP response shapes:
@@ -187,13 +312,19 @@ def _read_prompt(p: Path) -> str:
     return p.read_text(encoding="utf-8")
 
 def _write_text(path: Path, content: str):
-    path.write_text(content, encoding="utf-8")
+    # Replace rather than rewrite in place: the file may be a hard link into a previous run (--incremental-from).
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(content, encoding="utf-8")
+    os.replace(tmp, path)
 
 def _write_json(path: Path, obj: Any):
-    path.write_text(json.dumps(obj, indent=2), encoding="utf-8")
+    _write_text(path, json.dumps(obj, indent=2))
+
+def _aoai_json(messages, purpose: str, call_info: Optional[Dict[str, Any]] = None):
+    # Each step hedges against its own latency profile (AOAI_HEDGE).
+    return _coerce_json(aoai_chat(messages=messages, call_info=call_info, hedge_key=purpose), purpose)
 
-def _aoai_json(messages, purpose: str):
-    resp = aoai_chat(messages=messages)
+def _coerce_json(resp, purpose: str):
     # Expect dict; if string, attempt JSON parse
     if isinstance(resp, str):
         try:
@@ -207,33 +338,73 @@ def _aoai_json(messages, purpose: str):
         raise SystemExit(1)
     return resp
 
-def llm_interpret_intended(ui_description: str, template: str) -> dict:
-    prompt_filled = template.replace("{{UI_DESCRIPTION}}", ui_description)
-    messages = [
+# Message builders / result checks are shared by the online steps below and by the
+# dataset-wide Batch API mode (batch_mode.py). Inputs are compacted (minified, repeated
+# props deduplicated, trimmed to PROMPT_TOKEN_BUDGET; see prompt_compaction.py) and the
+# optional ``stats`` dict receives the token counts before/after compaction.
+
+def _compaction_stats(call_info: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    return call_info.setdefault("compaction", {}) if call_info is not None else None
+
+def build_intended_messages(ui_description: str, template: str, stats: Optional[Dict[str, Any]] = None) -> list[dict]:
+    prompt_filled = template.replace("{{UI_DESCRIPTION}}", compact_input(ui_description, stats, name="uiDescription"))
+    return [
         {"role": "system", "content": "You extract intended UI structure. Output strict JSON only."},
         {"role": "user", "content": prompt_filled},
     ]
-    return _aoai_json(messages, "Intended Interpretation")
 
-def llm_interpret_rendered(agent_output: str, template: str) -> dict:
-    prompt_filled = template.replace("{{AGENT_OUTPUT}}", agent_output)
-    messages = [
+def build_rendered_messages(agent_output: str, template: str, stats: Optional[Dict[str, Any]] = None) -> list[dict]:
+    prompt_filled = template.replace("{{AGENT_OUTPUT}}", compact_input(agent_output, stats, name="agentOutput"))
+    return [
         {"role": "system", "content": "You summarize rendered UI structure. Output strict JSON only."},
         {"role": "user", "content": prompt_filled},
     ]
-    return _aoai_json(messages, "Rendered Interpretation")
 
-def llm_judge(intended: dict, rendered: dict, template: str, ui_description: str, agent_output: str) -> dict:
+def build_judge_messages(intended: dict, rendered: dict, template: str, ui_description: str, agent_output: str, stats: Optional[Dict[str, Any]] = None) -> list[dict]:
     filled = (template
-              .replace("{{INTENDED_JSON}}", json.dumps(intended, ensure_ascii=False))
-              .replace("{{RENDERED_JSON}}", json.dumps(rendered, ensure_ascii=False))
-              .replace("{{UI_DESCRIPTION}}", ui_description)
-              .replace("{{AGENT_OUTPUT}}", agent_output))
-    messages = [
+              .replace("{{INTENDED_JSON}}", compact_input(intended, stats, name="intended"))
+              .replace("{{RENDERED_JSON}}", compact_input(rendered, stats, name="rendered"))
+              .replace("{{UI_DESCRIPTION}}", compact_input(ui_description, stats, name="uiDescription"))
+              .replace("{{AGENT_OUTPUT}}", compact_input(agent_output, stats, name="agentOutput")))
+    return [
         {"role": "system", "content": "You are an impartial evaluator returning scores JSON only."},
         {"role": "user", "content": filled},
     ]
-    result = _aoai_json(messages, "Judge Scoring")
+
+def llm_interpret_intended(ui_description: str, template: str, call_info: Optional[Dict[str, Any]] = None) -> dict:
+    return _aoai_json(build_intended_messages(ui_description, template, _compaction_stats(call_info)), "Intended Interpretation", call_info)
+
+def llm_interpret_rendered(agent_output: str, template: str, call_info: Optional[Dict[str, Any]] = None) -> dict:
+    return _aoai_json(build_rendered_messages(agent_output, template, _compaction_stats(call_info)), "Rendered Interpretation", call_info)
+
+def llm_judge(intended: dict, rendered: dict, template: str, ui_description: str, agent_output: str, call_info: Optional[Dict[str, Any]] = None) -> dict:
+    messages = build_judge_messages(intended, rendered, template, ui_description, agent_output, _compaction_stats(call_info))
+    return finalize_judge(_aoai_json(messages, "Judge Scoring", call_info))
+
+def build_fused_messages(ui_description: str, agent_output: str, template: str, stats: Optional[Dict[str, Any]] = None) -> list[dict]:
+    filled = (template
+              .replace("{{UI_DESCRIPTION}}", compact_input(ui_description, stats, name="uiDescription"))
+              .replace("{{AGENT_OUTPUT}}", compact_input(agent_output, stats, name="agentOutput")))
+    return [
+        {"role": "system", "content": "You extract intended and rendered UI structure and score them. Output strict JSON only."},
+        {"role": "user", "content": filled},
+    ]
+
+def split_fused(result: dict) -> tuple[dict, dict, dict]:
+    """Split a fused response into (intended, rendered, judge) shaped like the classic step outputs."""
+    for key in ("intended", "rendered"):
+        if not isinstance(result.get(key), dict):
+            print(f"ERROR: fused judge output missing {key} interpretation", file=sys.stderr)
+            raise SystemExit(1)
+    judge_obj = finalize_judge({k: v for k, v in result.items() if k not in ("intended", "rendered")})
+    return result["intended"], result["rendered"], judge_obj
+
+def llm_fused_judge(ui_description: str, agent_output: str, template: str, call_info: Optional[Dict[str, Any]] = None) -> dict:
+    messages = build_fused_messages(ui_description, agent_output, template, _compaction_stats(call_info))
+    return _aoai_json(messages, "Fused Judge", call_info)
+
+def finalize_judge(result: dict) -> dict:
+    """Validate judge output and fill ``overall`` as the mean of numeric dimensions."""
     if "dimensionScores" not in result:
         print("ERROR: judge output missing dimensionScores", file=sys.stderr)
         raise SystemExit(1)
@@ -243,62 +414,217 @@ def llm_judge(intended: dict, rendered: dict, template: str, ui_description: str
             result["overall"] = round(sum(scores)/len(scores), 2)
     return result
 
-def process_single_record(record_path: Path, out_dir: Path, *, ui_key: str, mcp_endpoint: str, model: str) -> dict:
-    # Env sanity
-    _require_env("AZURE_OPENAI_ENDPOINT")
-    out_dir.mkdir(parents=True, exist_ok=True)
+def _now_iso_ms() -> str:
+    try:
+        return datetime.datetime.now(datetime.UTC).isoformat(timespec="milliseconds")
+    except Exception:
+        return datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+
+def _run_step_graph(steps: Dict[str, Dict[str, Any]]) -> tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """Run a small dependency graph of pipeline steps.
 
-    for p in (PROMPT_INTENDED, PROMPT_RENDERED, PROMPT_JUDGE):
+    ``steps`` maps a step name to ``{"deps": [names...], "fn": callable(results) -> Any}``.
+    Every step starts as soon as all of its dependencies have finished; independent
+    steps run concurrently. Returns ``(results, timings)`` keyed by step name. The
+    first failing step (including SystemExit) cancels steps not yet started and is
+    re-raised.
+    """
+    results: Dict[str, Any] = {}
+    timings: Dict[str, Dict[str, Any]] = {}
+    pending = dict(steps)
+    running: Dict[Any, str] = {}
+
+    def timed(name: str, fn):
+        started_iso, t0 = _now_iso_ms(), time.perf_counter()
+        try:
+            return fn(results)
+        finally:
+            timings[name] = {"startedAt": started_iso, "endedAt": _now_iso_ms(), "durationMs": int((time.perf_counter() - t0) * 1000)}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(steps)), thread_name_prefix="step") as pool:
+        while pending or running:
+            ready = [n for n, spec in pending.items() if all(d in results for d in spec.get("deps", []))]
+            for name in ready:
+                running[pool.submit(timed, name, pending.pop(name)["fn"])] = name
+            if not running:
+                raise RuntimeError(f"Unsatisfiable step dependencies: {sorted(pending)}")
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    results[name] = fut.result()
+                except BaseException:
+                    for other in running:
+                        other.cancel()
+                    raise
+    return results, timings
+
+def read_prompts() -> Dict[str, str]:
+    for p in (PROMPT_INTENDED, PROMPT_RENDERED, PROMPT_JUDGE, PROMPT_FUSED):
         _ensure_prompt(p)
+    return {
+        "intended": _read_prompt(PROMPT_INTENDED),
+        "rendered": _read_prompt(PROMPT_RENDERED),
+        "judge": _read_prompt(PROMPT_JUDGE),
+        "fused": _read_prompt(PROMPT_FUSED),
+    }
 
-    step_log = []  # consolidated per-record log
+def start_record(record_path: Path, out_dir: Path, *, ui_key: str) -> Dict[str, Any]:
+    """Step 1: load the record, write its input artifacts, return the record context."""
+    # Env sanity (replay-only answers every LLM call from the response cache)
+    if cache_mode() != "replay-only" and not routes_configured():
+        _require_env("AZURE_OPENAI_ENDPOINT")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    prompts = read_prompts()
 
-    # STEP 1
     record = load_record(record_path)
     record_id = str(record.get("id") or record_path.stem)
     ui_description = extract_ui_description(record, ui_key=ui_key)
-    step_log.append({"step":1,"name":"load_record","recordId":record_id,"uiDescriptionLength":len(ui_description),"recordKeys":list(record.keys())})
-
-    # STEP 2
-    agent_output = _call_mcp_tool(ui_description, endpoint=mcp_endpoint)
-    step_log.append({"step":2,"name":"mcp_output","endpoint":mcp_endpoint,"agentOutputLength":len(agent_output)})
-
-    intended_prompt = _read_prompt(PROMPT_INTENDED)
-    rendered_prompt = _read_prompt(PROMPT_RENDERED)
-    judge_prompt    = _read_prompt(PROMPT_JUDGE)
-
-    # STEP 3
-    intended_obj = llm_interpret_intended(ui_description, intended_prompt)
-    step_log.append({"step":3,"name":"intended","keys":list(intended_obj.keys())})
-
-    # STEP 4
-    rendered_obj = llm_interpret_rendered(agent_output, rendered_prompt)
-    step_log.append({"step":4,"name":"rendered","keys":list(rendered_obj.keys())})
-
-    # STEP 5
-    judge_obj = llm_judge(intended_obj, rendered_obj, judge_prompt, ui_description, agent_output)
-    step_log.append({"step":5,"name":"judge","overall":judge_obj.get("overall"),"dimensions":list(judge_obj.get("dimensionScores", {}).keys())})
-
-    # Existing artifact writes
     _write_json(out_dir / "record.json", record)
     _write_text(out_dir / "ui_description.txt", ui_description)
+    return {
+        "record": record,
+        "recordId": record_id,
+        "uiDescription": ui_description,
+        "expectedComponents": record.get("expected_components"),
+        "prompts": prompts,
+        "stepLog": [{"step":1,"name":"load_record","recordId":record_id,"uiDescriptionLength":len(ui_description),"recordKeys":list(record.keys())}],
+    }
+
+def save_agent_output(out_dir: Path, agent_output: str, agent_info: Optional[Dict[str, Any]] = None):
     _write_text(out_dir / "agent_output.txt", agent_output)
-    _write_text(out_dir / "prompt_step3_intended.txt", intended_prompt)
+    if agent_info is not None:
+        _write_json(out_dir / "agent_output_info.json", agent_info)
+
+def save_intended(out_dir: Path, template: str, intended_obj: dict):
+    _write_text(out_dir / "prompt_step3_intended.txt", template)
     _write_json(out_dir / "intended_interpretation.json", intended_obj)
-    _write_text(out_dir / "prompt_step4_rendered.txt", rendered_prompt)
+
+def save_rendered(out_dir: Path, template: str, rendered_obj: dict):
+    _write_text(out_dir / "prompt_step4_rendered.txt", template)
     _write_json(out_dir / "rendered_interpretation.json", rendered_obj)
-    _write_text(out_dir / "prompt_step5_judge.txt", judge_prompt)
+
+def interpret_rendered_local(out_dir: Path, agent_output: str) -> Optional[dict]:
+    """Step 4 without an LLM when RENDERED_EXTRACTOR=local; None means fall back to the LLM."""
+    if rendered_extractor_mode() != "local":
+        return None
+    rendered_obj = extract_rendered(agent_output)
+    if rendered_obj is not None:
+        # No prompt file: --resume only reuses rendered artifacts built from the LLM prompt.
+        (out_dir / "prompt_step4_rendered.txt").unlink(missing_ok=True)
+        _write_json(out_dir / "rendered_interpretation.json", rendered_obj)
+    return rendered_obj
+
+def save_judge(out_dir: Path, template: str, judge_obj: dict):
+    _write_text(out_dir / "prompt_step5_judge.txt", template)
     _write_json(out_dir / "step5_response.json", judge_obj)
 
+def save_fused(out_dir: Path, template: str, fused_obj: dict):
+    _write_text(out_dir / "prompt_fused_judge.txt", template)
+    _write_json(out_dir / "fused_response.json", fused_obj)
+
+def run_autoscore(ctx: Dict[str, Any], agent_output: str, out_dir: Path) -> tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """Score the agent output against the record's expected_components; returns (result, gate).
+
+    ``result`` is None when the record has no expected components or the output is not
+    JSON, in which case the gate always lets the LLM judge run.
+    """
+    expected = ctx.get("expectedComponents")
+    result = None
+    if expected:
+        try:
+            result = score_components(flatten_components(json.loads(agent_output)), compile_specs(expected))
+        except ValueError as e:  # bad spec or non-JSON output
+            print(f"WARNING: autoscore unavailable for {ctx['recordId']}: {e}", file=sys.stderr)
+    gate = gate_decision(result)
+    if result is not None:
+        _write_json(out_dir / "autoscore.json", {**result, "gate": gate})
+    return result, gate
+
+TOKEN_FIELDS = ("promptTokens", "completionTokens", "cachedTokens", "totalTokens")
+
+def record_totals(step_log: list) -> Dict[str, Any]:
+    """Per-record rollup of step durations and LLM usage/cost from the step log ``call`` blocks.
+
+    Answers from the AOAI response cache are counted as ``cacheHits`` / ``cacheHitTokens``
+    rather than in the token totals, and steps taken over by --resume / --incremental-from
+    have no latency entry, so both totals and percentiles describe work actually done.
+    """
+    usage: Dict[str, Any] = {f: 0 for f in TOKEN_FIELDS}
+    usage.update(llmCalls=0, attempts=0, queueWaitMs=0, cacheHits=0, cacheHitTokens=0, originalInputTokens=0, compactedInputTokens=0, costUsd=None)
+    for s in step_log:
+        call = s.get("call")
+        if not call or s.get("name") == "mcp_output":
+            continue
+        compaction = call.get("compaction") or {}
+        usage["originalInputTokens"] += compaction.get("originalTokens", 0)
+        usage["compactedInputTokens"] += compaction.get("compactedTokens", 0)
+        if call.get("cacheHit"):
+            usage["cacheHits"] += 1
+            usage["cacheHitTokens"] += call.get("totalTokens") or 0
+            continue
+        usage["llmCalls"] += 1
+        usage["attempts"] += call.get("attempts") or 0
+        usage["queueWaitMs"] += call.get("queueWaitMs") or 0
+        for f in TOKEN_FIELDS:
+            usage[f] += call.get(f) or 0
+        cost = estimate_cost(call)
+        if cost is not None:
+            usage["costUsd"] = round((usage["costUsd"] or 0) + cost, 6)
+    return {
+        "stepLatencyMs": {s["name"]: s["durationMs"] for s in step_log
+                          if "durationMs" in s and not s.get("resumed") and not s.get("incremental")},
+        "usage": usage,
+    }
+
+# Step artifacts reused by --resume: (artifact, saved prompt template or None)
+STEP_ARTIFACTS = {
+    "mcp":      ("agent_output.txt", None),
+    "intended": ("intended_interpretation.json", "prompt_step3_intended.txt"),
+    "rendered": ("rendered_interpretation.json", "prompt_step4_rendered.txt"),
+    "judge":    ("step5_response.json", "prompt_step5_judge.txt"),
+    "fused":    ("fused_response.json", "prompt_fused_judge.txt"),
+}
+
+def link_step_artifacts(src_dir: Path, out_dir: Path, step: str) -> bool:
+    """Hard-link (or copy) a step's artifact and saved prompt from a previous run's record directory."""
+    artifact, prompt_file = STEP_ARTIFACTS[step]
+    names = [artifact] + ([prompt_file] if prompt_file else [])
+    if step == "mcp":
+        return link_artifacts(src_dir, out_dir, names + ["agent_output_info.json"], optional=["agent_output_info.json"])
+    return link_artifacts(src_dir, out_dir, names)
+
+def load_step_artifact(out_dir: Path, step: str, template: Optional[str] = None) -> Optional[Any]:
+    """Return a previously saved step result, or None if missing, unreadable or built from another prompt template."""
+    artifact, prompt_file = STEP_ARTIFACTS[step]
+    try:
+        if prompt_file is not None and (out_dir / prompt_file).read_text(encoding="utf-8") != template:
+            return None
+        raw = (out_dir / artifact).read_text(encoding="utf-8")
+        if step != "mcp":
+            return json.loads(raw)
+        try:
+            info = json.loads((out_dir / "agent_output_info.json").read_text(encoding="utf-8"))
+        except Exception:
+            info = {"source": "resumed", "buildId": None}
+        return raw, info
+    except Exception:
+        return None
+
+def finish_record(ctx: Dict[str, Any], out_dir: Path, *, model: str, mcp_endpoint: str, ui_key: str, agent_info: Dict[str, Any], judge_obj: dict, meta_extra: Optional[Dict[str, Any]] = None) -> dict:
+    """Write score.json, record_steps.json and meta.json; return the record summary."""
+    record_id = ctx["recordId"]
     score_payload = {"recordId": record_id, "timestamp": _now_iso(), "model": model, **judge_obj}
     _write_json(out_dir / "score.json", score_payload)
+    totals = record_totals(ctx["stepLog"])
 
     # Single consolidated log
     _write_json(out_dir / "record_steps.json", {
         "recordId": record_id,
         "model": model,
         "mcpEndpoint": mcp_endpoint,
-        "steps": step_log
+        "steps": ctx["stepLog"],
+        "totals": totals
     })
 
     meta = {
@@ -308,17 +634,200 @@ def process_single_record(record_path: Path, out_dir: Path, *, ui_key: str, mcp_
         "mcpEndpoint": mcp_endpoint,
         "uiKey": ui_key,
         "stepsCompleted": [1,2,3,4,5],
+        "agentOutputSource": agent_info["source"],
+        "mcpBuildId": agent_info.get("buildId"),
         "llmOnly": True,
         "promptTemplates": {
             "intended": PROMPT_INTENDED.name,
             "rendered": PROMPT_RENDERED.name,
             "judge": PROMPT_JUDGE.name
         },
-        "consolidatedStepLog": "record_steps.json"
+        "consolidatedStepLog": "record_steps.json",
+        **(meta_extra or {})
     }
     _write_json(out_dir / "meta.json", meta)
 
-    return {"recordId": record_id, "outDir": str(out_dir), "overall": judge_obj.get("overall")}
+    return {"recordId": record_id, "outDir": str(out_dir), "overall": judge_obj.get("overall"), **totals}
+
+def process_single_record(record_path: Path, out_dir: Path, *, ui_key: str, mcp_endpoint: str, model: str, resume: bool = False, judge_mode: str = "classic", incremental_from: Optional[Path] = None) -> dict:
+    """Run steps 1-5 for one record.
+
+    With ``resume=True`` a step whose artifact is already in ``out_dir`` (built from the
+    current prompt template, with all of its inputs reused too) is loaded instead of re-run,
+    so a partially finished record only repeats the steps that failed.
+
+    ``incremental_from`` is the same record's directory in a previous run: a step whose
+    input fingerprint (see step_fingerprints.py) matches the one recorded there has its
+    artifacts linked from it instead of being re-run.
+
+    ``judge_mode`` (see JUDGE_MODES) selects separate step 3/4/5 calls, one fused call, or
+    both; in calibrate mode the summary carries the fused scores under ``calibration``.
+    """
+    if judge_mode not in JUDGE_MODES:
+        raise ValueError(f"judge_mode must be one of {JUDGE_MODES}, got {judge_mode!r}")
+    # STEP 1
+    ctx = start_record(record_path, out_dir, ui_key=ui_key)
+    ui_description = ctx["uiDescription"]
+    prompts = ctx["prompts"]
+    resumed: set[str] = set()
+    linked: set[str] = set()
+    calls: Dict[str, Dict[str, Any]] = {name: {} for name in ("mcp", "intended", "rendered", "judge", "fused")}
+    extractors: Dict[str, str] = {}
+    description_hash = content_hash(ui_description)
+    fingerprints: Dict[str, str] = {}
+    previous_fingerprints = load_fingerprints(incremental_from) if incremental_from is not None else {}
+
+    def reuse(step: str, deps: list[str], template: Optional[str] = None, fingerprint: Optional[str] = None) -> Optional[Any]:
+        if fingerprint is not None:
+            fingerprints[step] = fingerprint
+        if resume and all(d in resumed for d in deps):
+            prev = load_step_artifact(out_dir, step, template)
+            if prev is not None:
+                resumed.add(step)
+                return prev
+        # The fingerprint covers the step's inputs, so unlike resume it does not need its deps reused.
+        if fingerprint is not None and previous_fingerprints.get(step) == fingerprint and link_step_artifacts(incremental_from, out_dir, step):
+            prev = load_step_artifact(out_dir, step, template)
+            if prev is not None:
+                linked.add(step)
+                return prev
+        return None
+
+    # STEPS 2-5 as a dependency graph:
+    #   2 (MCP) and 3 (intended) are independent; 4 needs 2; 5 needs 3 and 4.
+    #   The autoscore gate runs right after 2; when it skips the judge, 4 and 5 make no LLM calls.
+    def step_mcp(_res):
+        prev = reuse("mcp", [], fingerprint=_mcp_fingerprint(description_hash, mcp_endpoint))
+        if prev is not None:
+            return prev
+        agent_output, agent_info = _get_agent_output(ui_description, endpoint=mcp_endpoint, call_info=calls["mcp"])
+        save_agent_output(out_dir, agent_output, agent_info)
+        return agent_output, agent_info
+
+    def step_intended(_res):
+        prev = reuse("intended", [], prompts["intended"],
+                     step_fingerprint("intended", description=description_hash, **llm_inputs(prompts["intended"])))
+        if prev is not None:
+            return prev
+        intended_obj = llm_interpret_intended(ui_description, prompts["intended"], calls["intended"])
+        save_intended(out_dir, prompts["intended"], intended_obj)
+        return intended_obj
+
+    def step_autoscore(res):
+        # Always re-run (local and cheap); the fingerprint records which gate policy scored the record.
+        fingerprints["autoscore"] = step_fingerprint("autoscore", agentOutput=content_hash(res["mcp"][0]),
+                                                     expected=content_hash(ctx.get("expectedComponents")), gate=gate_mode())
+        return run_autoscore(ctx, res["mcp"][0], out_dir)
+
+    def gated(res) -> bool:
+        return res["autoscore"][1]["decision"] == "skip"
+
+    def step_rendered(res):
+        if gated(res):
+            return None
+        rendered_obj = interpret_rendered_local(out_dir, res["mcp"][0])
+        if rendered_obj is not None:
+            extractors["rendered"] = "local"
+            return rendered_obj
+        extractors["rendered"] = "llm" if rendered_extractor_mode() == "llm" else "llm-fallback"
+        prev = reuse("rendered", ["mcp"], prompts["rendered"],
+                     step_fingerprint("rendered", agentOutput=content_hash(res["mcp"][0]), **llm_inputs(prompts["rendered"])))
+        if prev is not None:
+            return prev
+        rendered_obj = llm_interpret_rendered(res["mcp"][0], prompts["rendered"], calls["rendered"])
+        save_rendered(out_dir, prompts["rendered"], rendered_obj)
+        return rendered_obj
+
+    def step_judge(res):
+        if gated(res):
+            return finalize_judge(skipped_judge(res["autoscore"][1], res["autoscore"][0]))
+        prev = reuse("judge", ["intended", "rendered"], prompts["judge"],
+                     step_fingerprint("judge", description=description_hash, agentOutput=content_hash(res["mcp"][0]),
+                                      intended=content_hash(res["intended"]), rendered=content_hash(res["rendered"]), **llm_inputs(prompts["judge"])))
+        if prev is not None:
+            return prev
+        judge_obj = llm_judge(res["intended"], res["rendered"], prompts["judge"], ui_description, res["mcp"][0], calls["judge"])
+        save_judge(out_dir, prompts["judge"], judge_obj)
+        return judge_obj
+
+    # Fused: steps 3-5 as one call once 2 lands.
+    def step_fused(res):
+        if gated(res):
+            return None
+        prev = reuse("fused", ["mcp"], prompts["fused"],
+                     step_fingerprint("fused", description=description_hash, agentOutput=content_hash(res["mcp"][0]), **llm_inputs(prompts["fused"])))
+        if prev is None:
+            prev = llm_fused_judge(ui_description, res["mcp"][0], prompts["fused"], calls["fused"])
+            save_fused(out_dir, prompts["fused"], prev)
+        return split_fused(prev)
+
+    graph: Dict[str, Dict[str, Any]] = {
+        "mcp":       {"deps": [], "fn": step_mcp},
+        "autoscore": {"deps": ["mcp"], "fn": step_autoscore},
+    }
+    if judge_mode != "fused":
+        graph["intended"] = {"deps": [], "fn": step_intended}
+        graph["rendered"] = {"deps": ["autoscore"], "fn": step_rendered}
+        graph["judge"] = {"deps": ["intended", "rendered"], "fn": step_judge}
+    if judge_mode != "classic":
+        graph["fused"] = {"deps": ["autoscore"], "fn": step_fused}
+    results, timings = _run_step_graph(graph)
+    for name in resumed:
+        timings[name]["resumed"] = True
+    for name in linked:
+        timings[name]["incremental"] = True
+    for name, call in calls.items():
+        if call:
+            timings[name]["call"] = call
+    agent_output, agent_info = results["mcp"]
+    auto_result, gate = results["autoscore"]
+    skipped = gate["decision"] == "skip"
+
+    step_log = ctx["stepLog"]
+    step_log.append({"step":2,"name":"mcp_output","endpoint":mcp_endpoint,"agentOutputLength":len(agent_output),**agent_info,**timings["mcp"]})
+    if auto_result is not None:
+        step_log.append({"step":2,"name":"autoscore","componentCoverage":auto_result["componentCoverage"],"propFidelity":auto_result["propFidelity"],"gate":gate["decision"],**timings["autoscore"]})
+    if judge_mode != "fused":
+        intended_obj, rendered_obj, judge_obj = results["intended"], results["rendered"], results["judge"]
+        step_log.append({"step":3,"name":"intended","keys":list(intended_obj.keys()),**timings["intended"]})
+        if skipped:
+            step_log.append({"step":4,"name":"rendered","skipped":gate["reason"]})
+            step_log.append({"step":5,"name":"judge","skipped":gate["reason"],"overall":judge_obj.get("overall")})
+        else:
+            step_log.append({"step":4,"name":"rendered","keys":list(rendered_obj.keys()),"extractor":extractors.get("rendered"),**timings["rendered"]})
+            step_log.append({"step":5,"name":"judge","overall":judge_obj.get("overall"),"dimensions":list(judge_obj.get("dimensionScores", {}).keys()),**timings["judge"]})
+    if judge_mode != "classic" and skipped:
+        step_log.append({"step":5,"name":"fused","skipped":gate["reason"]})
+    elif judge_mode != "classic":
+        fused_intended, fused_rendered, fused_judge = results["fused"]
+        step_log.append({"step":5,"name":"fused","fusedSteps":[3,4,5],"overall":fused_judge.get("overall"),"dimensions":list(fused_judge.get("dimensionScores", {}).keys()),**timings["fused"]})
+    if judge_mode == "fused" and skipped:
+        judge_obj = finalize_judge(skipped_judge(gate, auto_result))
+    elif judge_mode == "fused":
+        intended_obj, rendered_obj, judge_obj = fused_intended, fused_rendered, fused_judge
+        _write_json(out_dir / "intended_interpretation.json", intended_obj)
+        _write_json(out_dir / "rendered_interpretation.json", rendered_obj)
+    judge_obj = apply_gate(judge_obj, gate, auto_result)
+
+    meta_extra: Dict[str, Any] = {"judgeMode": judge_mode}
+    if judge_mode == "fused":
+        meta_extra.update(stepsCompleted=[1,2,"3-5"], promptTemplates={"fused": PROMPT_FUSED.name})
+    elif judge_mode == "calibrate":
+        meta_extra["promptTemplates"] = {"intended": PROMPT_INTENDED.name, "rendered": PROMPT_RENDERED.name, "judge": PROMPT_JUDGE.name, "fused": PROMPT_FUSED.name}
+    if resume:
+        meta_extra["resumedSteps"] = sorted(resumed)
+    if incremental_from is not None:
+        meta_extra.update(incrementalFrom=str(incremental_from), reusedSteps=sorted(linked))
+    save_fingerprints(out_dir, fingerprints)
+    summary = finish_record(ctx, out_dir, model=model, mcp_endpoint=mcp_endpoint, ui_key=ui_key, agent_info=agent_info, judge_obj=judge_obj, meta_extra=meta_extra)
+    if auto_result is not None:
+        summary["autoscore"] = judge_obj["autoscore"]
+    if incremental_from is not None:
+        summary["reusedSteps"] = sorted(linked)
+    if judge_mode == "calibrate" and not skipped:
+        # Same cap as the classic overall it is compared with
+        summary["calibration"] = {"overall": gated_overall(fused_judge.get("overall"), gate), "dimensionScores": fused_judge.get("dimensionScores", {})}
+    return summary
 
 def build_arg_parser():
     p = argparse.ArgumentParser(description="LLM-only single-record evaluation (HTTP MCP only).")
@@ -327,12 +836,36 @@ def build_arg_parser():
     p.add_argument("--ui-key", default="ui_description", help="Field containing UI description")
     p.add_argument("--mcp-endpoint", required=True, help="MCP server HTTP endpoint (e.g. http://localhost:3001)")
     p.add_argument("--model", default=os.environ.get("AZURE_OPENAI_DEPLOYMENT", "deployment"), help="Model/deployment label for metadata only")
+    p.add_argument("--cache-mode", choices=CACHE_MODES, help="AOAI response cache mode (default: AOAI_CACHE_MODE or off)")
+    p.add_argument("--mcp-cache", choices=MCP_CACHE_MODES, help="MCP output cache: off|write|reuse (default: MCP_CACHE_MODE or off)")
+    p.add_argument("--judge-mode", choices=JUDGE_MODES, default="classic", help="classic: steps 3-5 as three calls; fused: one call; calibrate: both, fused kept for comparison")
+    p.add_argument("--rendered-extractor", choices=EXTRACTOR_MODES, help="Step 4: llm, or local (derived from the MCP payload, LLM fallback) (default: RENDERED_EXTRACTOR or llm)")
+    p.add_argument("--autoscore-gate", choices=GATE_MODES, help="Gate the LLM judge on autoscore: off|cap|skip (default: AUTOSCORE_GATE or cap)")
+    p.add_argument("--compaction", choices=["on", "off"], help="Compact LLM step inputs (default: PROMPT_COMPACTION or on)")
+    p.add_argument("--prompt-budget", type=int, help="Max estimated tokens per prompt input, 0 = no trimming (default: PROMPT_TOKEN_BUDGET or 6000)")
+    p.add_argument("--incremental-from", metavar="RECORD_DIR", help="Output directory of a previous run of this record; steps with unchanged input fingerprints are linked from it")
     return p
 
 def main(argv: Optional[list[str]] = None) -> int:
     ap = build_arg_parser()
     args = ap.parse_args(argv)
-    summary = process_single_record(Path(args.record), Path(args.out_dir), ui_key=args.ui_key, mcp_endpoint=args.mcp_endpoint, model=args.model)
+    if args.cache_mode:
+        configure_cache(args.cache_mode)
+    if args.mcp_cache:
+        configure_mcp_cache(args.mcp_cache)
+    if args.autoscore_gate:
+        configure_gate(args.autoscore_gate)
+    if args.rendered_extractor:
+        configure_rendered_extractor(args.rendered_extractor)
+    configure_compaction(enabled=None if args.compaction is None else args.compaction == "on", budget=args.prompt_budget)
+    summary = process_single_record(Path(args.record), Path(args.out_dir), ui_key=args.ui_key, mcp_endpoint=args.mcp_endpoint, model=args.model, judge_mode=args.judge_mode,
+                                     incremental_from=Path(args.incremental_from) if args.incremental_from else None)
+    stats = cache_stats()
+    if stats:
+        summary["aoaiCache"] = stats
+    stats = mcp_cache_stats()
+    if stats:
+        summary["mcpCache"] = stats
     print(json.dumps({"status": "ok", **summary}, indent=2))
     return 0
 
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+On-disk cache of normalized MCP agent outputs (step 2 of judge.py).
+
+Key:   sha256(UI description) + MCP endpoint + build id reported by GET /mcp/health
+       (``buildId``, else ``version``; "unknown" for servers that report neither).
+       judge.py only reads the cache when the build id tracks the agent code
+       (``buildIdSource`` other than "version": MCP_BUILD_ID or the server's code hash)
+Value: the normalized agent output exactly as _call_mcp_tool returns it
+Store: single SQLite file (WAL mode), default .cache/mcp-outputs.sqlite
+
+Modes:
+    off    no cache
+    write  always call the MCP server, store the fresh output
+    reuse  serve a cached output for the same description + build (skipping step 2);
+           call and store on miss. When the server cannot be reached the newest
+           output cached for that description + endpoint is reused.
+
+CLI:
+    python eval/pipeline/mcp_cache.py --stats
+"""
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import typing as t
+from pathlib import Path
+
+MCP_CACHE_MODES = ("off", "write", "reuse")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mcp_outputs (
+    description_hash TEXT NOT NULL,
+    endpoint         TEXT NOT NULL,
+    build_id         TEXT NOT NULL,
+    output           TEXT NOT NULL,
+    created          REAL NOT NULL,
+    PRIMARY KEY (description_hash, endpoint, build_id)
+);
+CREATE INDEX IF NOT EXISTS idx_mcp_outputs_created ON mcp_outputs(description_hash, endpoint, created);
+"""
+
+def description_hash(description: str) -> str:
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+class MCPOutputCache:
+    """Thread-safe SQLite store of agent outputs keyed on (description, endpoint, build)."""
+
+    def __init__(self, path: str | os.PathLike, *, mode: str = "reuse"):
+        if mode not in MCP_CACHE_MODES:
+            raise ValueError(f"Unknown MCP cache mode '{mode}' (expected one of {', '.join(MCP_CACHE_MODES)})")
+        self.path = Path(path)
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "writes": 0}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    @property
+    def reuse(self) -> bool:
+        return self.mode == "reuse"
+
+    def get(self, description: str, endpoint: str, build_id: str | None) -> tuple[str, str] | None:
+        """Return ``(output, build_id)`` or None.
+
+        ``build_id=None`` means the server build is unknown (unreachable): the newest
+        entry for the description + endpoint is returned.
+        """
+        if not self.reuse:
+            return None
+        with self._lock:
+            row = self._lookup(description, endpoint, build_id)
+            self.counters["hits" if row else "misses"] += 1
+        return (row[0], row[1]) if row else None
+
+    def contains(self, description: str, endpoint: str, build_id: str | None) -> bool:
+        """Whether ``get`` would hit (without counting a hit or miss)."""
+        if not self.reuse:
+            return False
+        with self._lock:
+            return self._lookup(description, endpoint, build_id) is not None
+
+    def _lookup(self, description: str, endpoint: str, build_id: str | None) -> tuple[str, str] | None:
+        dh = description_hash(description)
+        if build_id is None:
+            return self._conn.execute(
+                "SELECT output, build_id FROM mcp_outputs WHERE description_hash = ? AND endpoint = ? ORDER BY created DESC LIMIT 1",
+                (dh, endpoint)
+            ).fetchone()
+        return self._conn.execute(
+            "SELECT output, build_id FROM mcp_outputs WHERE description_hash = ? AND endpoint = ? AND build_id = ?",
+            (dh, endpoint, build_id)
+        ).fetchone()
+
+    def put(self, description: str, endpoint: str, build_id: str, output: str) -> None:
+        if self.mode == "off":
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO mcp_outputs (description_hash, endpoint, build_id, output, created) VALUES (?, ?, ?, ?, ?)",
+                (description_hash(description), endpoint, build_id, output, time.time())
+            )
+            self._conn.commit()
+            self.counters["writes"] += 1
+
+    def stats(self) -> dict[str,t.Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM mcp_outputs").fetchone()[0]
+            builds = [r[0] for r in self._conn.execute("SELECT DISTINCT build_id FROM mcp_outputs ORDER BY build_id")]
+            counters = dict(self.counters)
+        return {"mode": self.mode, "path": str(self.path), "entries": entries, "buildIds": builds, **counters}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def _cli():  # pragma: no cover
+    import argparse
+    ap = argparse.ArgumentParser(description="Inspect the MCP output cache.")
+    ap.add_argument("--path", default=os.getenv("MCP_CACHE_PATH", ".cache/mcp-outputs.sqlite"), help="Cache file path.")
+    ap.add_argument("--stats", action="store_true", help="Print entry count and cached build ids.")
+    args = ap.parse_args()
+    cache = MCPOutputCache(args.path, mode="reuse")
+    print(json.dumps(cache.stats(), indent=2))
+    cache.close()
+
+if __name__ == "__main__":  # pragma: no cover
+    _cli()
@@ -0,0 +1,502 @@
+#!/usr/bin/env python
+"""
+Pooled HTTP client for the MCP server (step 2 of judge.py).
+
+One client per endpoint is shared by all workers of a run:
+  * a keep-alive ``requests.Session`` whose connection pool is sized to the worker
+    count (run_judge_over_dataset.py passes --workers), so records reuse sockets
+    instead of opening two new connections each;
+  * ``GET /mcp/health`` runs once, and again only after a failed tool call, instead
+    of before every record; its ``buildId`` feeds the MCP output cache;
+  * transient failures (timeouts, connection errors, 429/500/502/503/504) are retried with
+    full-jitter exponential backoff.
+
+``call_tool_batch`` sends many calls as one ``POST /mcp/tools/call-batch`` and reads the
+NDJSON lines the server streams back as each call finishes; ``MCPBatchPrefetcher`` uses it
+to fetch step 2 for a whole chunk of dataset records per request (--mcp-batch). Batch
+streams use a separate pool of MCP_BATCH_INFLIGHT connections, so a long batch never holds
+a socket a worker's single call is waiting for.
+
+Every call fills ``call_info`` with attempts, whether the health check ran, whether the
+final attempt reused a pooled connection and how many new connections it opened; the
+client keeps the same counters for the run summary (``stats()``).
+
+Errors raise MCPError carrying the exit code judge.py has always used:
+30 unreachable/unhealthy, 32 tool call failed, 33 unparseable response.
+
+Environment:
+    MCP_POOL_SIZE       (default: 8; overridden by the runner's worker count)
+    MCP_MAX_RETRIES     (default: 3)
+    MCP_RETRY_BASE_MS   (default: 500)
+    MCP_RETRY_MAX_MS    (default: 10000)
+    MCP_BATCH_SIZE      (default: 0 = no batching; records per /mcp/tools/call-batch request)
+    MCP_BATCH_INFLIGHT  (default: 2; batch requests open at once, on their own connections)
+    MCP_BATCH_AHEAD     (default: 4; chunks sent before the workers take their records)
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import random
+import threading
+import typing as t
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, InvalidStateError
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "8"))
+MCP_MAX_RETRIES = int(os.getenv("MCP_MAX_RETRIES", "3"))
+MCP_RETRY_BASE_MS = int(os.getenv("MCP_RETRY_BASE_MS", "500"))
+MCP_RETRY_MAX_MS = int(os.getenv("MCP_RETRY_MAX_MS", "10000"))
+MCP_BATCH_SIZE = int(os.getenv("MCP_BATCH_SIZE", "0"))
+MCP_BATCH_INFLIGHT = int(os.getenv("MCP_BATCH_INFLIGHT", "2"))
+MCP_BATCH_AHEAD = int(os.getenv("MCP_BATCH_AHEAD", "4"))
+TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+
+class MCPError(Exception):
+    def __init__(self, message: str, exit_code: int, status: int | None = None):
+        super().__init__(message)
+        self.exit_code = exit_code
+        self.status = status
+
+# Connections opened by the current thread since its last reset (set in _new_conn,
+# which urllib3 calls in the requesting thread when the pool has no idle socket).
+_conn_events = threading.local()
+
+class _CountingPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _conn_events.opened = getattr(_conn_events, "opened", 0) + 1
+        return super()._new_conn()
+
+class _CountingHTTPSPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _conn_events.opened = getattr(_conn_events, "opened", 0) + 1
+        return super()._new_conn()
+
+class _CountingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args: t.Any, **kwargs: t.Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CountingPool, "https": _CountingHTTPSPool}
+
+class MCPClient:
+    """Thread-safe MCP HTTP client with a shared keep-alive pool and cached health check."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        *,
+        pool_size: int | None = None,
+        timeout_s: float = 90,
+        max_retries: int | None = None,
+        retry_base_ms: int | None = None,
+        retry_max_ms: int | None = None
+    ):
+        self.endpoint = endpoint.rstrip("/")
+        self.pool_size = max(1, pool_size or MCP_POOL_SIZE)
+        self.timeout_s = max(1, timeout_s)
+        self.max_retries = MCP_MAX_RETRIES if max_retries is None else max(0, max_retries)
+        self.retry_base_ms = MCP_RETRY_BASE_MS if retry_base_ms is None else retry_base_ms
+        self.retry_max_ms = MCP_RETRY_MAX_MS if retry_max_ms is None else retry_max_ms
+        self._session = requests.Session()
+        # pool_block=True: at most pool_size sockets; max_retries=0: retries are ours.
+        adapter = _CountingAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True, max_retries=0)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # Batch streams stay open until their last call finishes: separate sockets.
+        self._batch_session = requests.Session()
+        batch_adapter = _CountingAdapter(pool_connections=1, pool_maxsize=max(1, MCP_BATCH_INFLIGHT), pool_block=True, max_retries=0)
+        self._batch_session.mount("http://", batch_adapter)
+        self._batch_session.mount("https://", batch_adapter)
+        self._lock = threading.Lock()
+        self._health_lock = threading.Lock()
+        self._healthy = False
+        self._health: dict[str,t.Any] | None = None
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "healthChecks": 0, "newConnections": 0, "reusedConnections": 0, "errors": 0,
+                         "batches": 0, "batchCalls": 0}
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self.counters[k] += v
+
+    def _get(self, path: str, timeout: float) -> requests.Response:
+        _conn_events.opened = 0
+        resp = self._session.get(f"{self.endpoint}{path}", timeout=timeout)
+        self._count(newConnections=_conn_events.opened, reusedConnections=0 if _conn_events.opened else 1)
+        return resp
+
+    def check_health(self, *, force: bool = False) -> dict[str,t.Any] | None:
+        """Health body from ``GET /mcp/health`` (cached once a check passed); raises MCPError(30) if unhealthy."""
+        self._ensure_healthy(force=force)
+        return self._health
+
+    def _ensure_healthy(self, *, force: bool = False) -> bool:
+        """Run the health check unless an earlier one passed; True if this call ran it."""
+        with self._health_lock:
+            if self._healthy and not force:
+                return False
+            self._count(healthChecks=1)
+            try:
+                resp = self._get("/mcp/health", timeout=3)
+            except requests.RequestException as e:
+                self._healthy = False
+                raise MCPError(f"Cannot reach MCP server at {self.endpoint}: {e}", 30)
+            if resp.status_code != 200:
+                self._healthy = False
+                raise MCPError(f"MCP server at {self.endpoint} unhealthy: {resp.status_code}", 30)
+            try:
+                body = resp.json()
+            except ValueError:
+                body = None
+            self._health = body if isinstance(body, dict) else {}
+            self._healthy = True
+            return True
+
+    def build_id(self) -> str | None:
+        """Build identifier from the (cached) health check: ``buildId``, else ``version``, else "unknown"; None if unreachable."""
+        try:
+            health = self.check_health()
+        except MCPError:
+            return None
+        return str(health.get("buildId") or health.get("version") or "unknown") if health is not None else None
+
+    def build_id_tracked(self) -> bool:
+        """Whether ``build_id`` follows the agent code: an explicit ``buildId`` not derived from a version string."""
+        try:
+            health = self.check_health()
+        except MCPError:
+            return False
+        return bool(health and health.get("buildId")) and health.get("buildIdSource") != "version"
+
+    def _backoff_ms(self, attempt: int) -> float:
+        # Full jitter: uniform over [0, base * 2^(attempt-1)], capped.
+        return random.uniform(0, min(self.retry_max_ms, self.retry_base_ms * (2 ** (attempt - 1))))
+
+    def call_tool(self, name: str, arguments: dict[str,t.Any], *, call_info: dict[str,t.Any] | None = None) -> t.Any:
+        """POST /mcp/tools/call and return the parsed JSON body."""
+        info = call_info if call_info is not None else {}
+        t0 = time.perf_counter()
+        self._count(calls=1)
+        info["healthChecked"] = self._ensure_healthy()
+        info["healthMs"] = int((time.perf_counter() - t0) * 1000)
+        payload = {"name": name, "arguments": arguments}
+        attempts = self.max_retries + 1
+        opened = 0
+        backoff_total = 0.0
+        for attempt in range(1, attempts + 1):
+            info["attempts"] = attempt
+            self._count(attempts=1)
+            _conn_events.opened = 0
+            error: str | None = None
+            try:
+                resp = self._session.post(f"{self.endpoint}/mcp/tools/call", json=payload, timeout=self.timeout_s)
+                if resp.status_code in TRANSIENT_STATUS:
+                    error = f"MCP tool call failed: {resp.status_code}"
+            except requests.Timeout:
+                error = f"MCP tool call timeout after {self.timeout_s:g}s"
+            except requests.RequestException as e:
+                error = f"MCP tool call exception: {e}"
+            opened += _conn_events.opened
+            reused = _conn_events.opened == 0
+            self._count(newConnections=_conn_events.opened, reusedConnections=1 if reused else 0)
+            if error is None:
+                break
+            if attempt == attempts:
+                self._count(errors=1)
+                info.update(connectionReused=reused, newConnections=opened, backoffMs=int(backoff_total), latencyMs=int((time.perf_counter() - t0) * 1000))
+                raise MCPError(f"{error} (final attempt)", 32)
+            delay = self._backoff_ms(attempt)
+            backoff_total += delay
+            self._count(retries=1)
+            print(f"WARNING: {error} (attempt {attempt}/{attempts}), retrying in {delay:.0f} ms...", file=sys.stderr)
+            time.sleep(delay / 1000.0)
+            # The server may have gone away: refresh the health check before retrying (fails fast if it is down).
+            self._ensure_healthy(force=True)
+        info.update(connectionReused=reused, newConnections=opened, backoffMs=int(backoff_total), responseBytes=len(resp.content))
+        if resp.status_code != 200:
+            self._count(errors=1)
+            raise MCPError(f"MCP tool call failed: {resp.status_code}", 32, resp.status_code)
+        try:
+            result = resp.json()
+        except ValueError as e:
+            self._count(errors=1)
+            raise MCPError(f"Cannot parse MCP response: {e}", 33)
+        info["latencyMs"] = int((time.perf_counter() - t0) * 1000)
+        return result
+
+    def call_tool_batch(
+        self,
+        name: str,
+        calls: list[tuple[str, dict[str,t.Any]]],
+        *,
+        concurrency: int | None = None,
+        on_result: t.Callable[[dict[str,t.Any]], None] | None = None,
+        call_info: dict[str,t.Any] | None = None
+    ) -> dict[str, dict[str,t.Any]]:
+        """POST /mcp/tools/call-batch for ``calls`` = [(id, arguments)] and return ``{id: line}``.
+
+        Each NDJSON line (``{"index", "id", "status", "elapsedMs", "result"|"error"}``) is
+        passed to ``on_result`` as soon as it arrives. A transient status or a stream that
+        breaks off re-sends only the calls not answered yet, with the same backoff as
+        call_tool; calls still unanswered after the last attempt are missing from the result.
+        A server without the endpoint (404/405) raises MCPError(32) with its status.
+        """
+        info = call_info if call_info is not None else {}
+        t0 = time.perf_counter()
+        self._count(batches=1, batchCalls=len(calls))
+        info["healthChecked"] = self._ensure_healthy()
+        answered: dict[str, dict[str,t.Any]] = {}
+        attempts = self.max_retries + 1
+        opened = 0
+        backoff_total = 0.0
+        error: str | None = None
+        for attempt in range(1, attempts + 1):
+            info["attempts"] = attempt
+            self._count(attempts=1)
+            _conn_events.opened = 0
+            pending = [(cid, args) for cid, args in calls if cid not in answered]
+            payload: dict[str,t.Any] = {"calls": [{"id": cid, "name": name, "arguments": args} for cid, args in pending]}
+            if concurrency:
+                payload["concurrency"] = concurrency
+            error = None
+            try:
+                with self._batch_session.post(f"{self.endpoint}/mcp/tools/call-batch", json=payload, timeout=self.timeout_s, stream=True) as resp:
+                    if resp.status_code in TRANSIENT_STATUS:
+                        error = f"MCP batch call failed: {resp.status_code}"
+                    elif resp.status_code != 200:
+                        self._count(errors=1, newConnections=_conn_events.opened, reusedConnections=0 if _conn_events.opened else 1)
+                        raise MCPError(f"MCP batch call failed: {resp.status_code}", 32, resp.status_code)
+                    else:
+                        for raw in resp.iter_lines():
+                            if not raw:
+                                continue
+                            try:
+                                line = json.loads(raw)
+                            except ValueError:
+                                continue
+                            if line.get("done"):
+                                info["server"] = {k: v for k, v in line.items() if k != "done"}
+                                continue
+                            cid = str(line.get("id"))
+                            answered[cid] = line
+                            if on_result is not None:
+                                on_result(line)
+                        if len(answered) < len(calls):
+                            error = f"MCP batch stream ended with {len(calls) - len(answered)} call(s) unanswered"
+            except requests.Timeout:
+                error = f"MCP batch call timeout after {self.timeout_s:g}s"
+            except requests.RequestException as e:
+                error = f"MCP batch call exception: {e}"
+            opened += _conn_events.opened
+            self._count(newConnections=_conn_events.opened, reusedConnections=0 if _conn_events.opened else 1)
+            if error is None or attempt == attempts:
+                break
+            delay = self._backoff_ms(attempt)
+            backoff_total += delay
+            self._count(retries=1)
+            print(f"WARNING: {error} (attempt {attempt}/{attempts}), retrying {len(calls) - len(answered)} call(s) in {delay:.0f} ms...", file=sys.stderr)
+            time.sleep(delay / 1000.0)
+            self._ensure_healthy(force=True)
+        if error is not None:
+            self._count(errors=1)
+            print(f"WARNING: {error} (final attempt)", file=sys.stderr)
+        info.update(calls=len(calls), answered=len(answered), newConnections=opened, backoffMs=int(backoff_total),
+                    latencyMs=int((time.perf_counter() - t0) * 1000))
+        return answered
+
+    def stats(self) -> dict[str,t.Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        total = counters["newConnections"] + counters["reusedConnections"]
+        return {
+            "endpoint": self.endpoint,
+            "poolSize": self.pool_size,
+            **counters,
+            "connectionReuseRate": round(counters["reusedConnections"] / total, 3) if total else None,
+        }
+
+    def close(self) -> None:
+        self._session.close()
+        self._batch_session.close()
+
+class _Chunk:
+    __slots__ = ("no", "items", "sent", "untaken")
+
+    def __init__(self, no: int, items: list[tuple[str, Future]]):
+        self.no = no
+        self.items = items
+        self.sent = False
+        self.untaken = len(items)
+
+class MCPBatchPrefetcher:
+    """Fetches ``create_portal_ui`` results ahead of the workers, one batch request per chunk of messages.
+
+    ``prefetch(messages)`` queues the messages in processing order as chunks of ``chunk_size``.
+    Only ``ahead`` chunks are sent before the workers have taken their messages (at most
+    ``inflight`` requests open), so the prefetch stays a bounded window in front of the
+    records being processed; a worker that takes a message from a chunk not sent yet sends
+    that chunk right away. ``take(message)`` waits for that message's NDJSON line (not for
+    the rest of its chunk) and returns the tool result, or None if the message was not
+    prefetched, its call failed or the prefetch was stopped, in which case the caller makes
+    the single call itself. ``stop()`` drops the chunks not sent yet (early stop). A server
+    without the batch endpoint disables prefetching after the first request.
+    """
+
+    def __init__(self, client: MCPClient, *, chunk_size: int, inflight: int | None = None, ahead: int | None = None, tool: str = "create_portal_ui"):
+        self.client = client
+        self.chunk_size = max(1, chunk_size)
+        self.ahead = max(1, MCP_BATCH_AHEAD if ahead is None else ahead)
+        self.tool = tool
+        self._pool = ThreadPoolExecutor(max_workers=max(1, inflight or MCP_BATCH_INFLIGHT), thread_name_prefix="mcp-batch")
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[Future, _Chunk]] = {}  # queued, not taken yet
+        self._chunks: list[_Chunk] = []
+        self._pending: deque[_Chunk] = deque()  # not sent yet, in order
+        self._open = 0  # sent chunks with messages not taken yet
+        self._disabled = False
+        self._stopped = False  # early stop
+        self._closed = False
+        self.counters = {"batches": 0, "prefetched": 0, "taken": 0, "failed": 0, "dropped": 0}
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self.counters[k] += v
+
+    @staticmethod
+    def _resolve(fut: Future, value: tuple[dict[str,t.Any], t.Any]) -> bool:
+        try:
+            fut.set_result(value)
+            return True
+        except InvalidStateError:  # already answered (or released by close)
+            return False
+
+    def prefetch(self, messages: t.Iterable[str]) -> int:
+        """Queue ``messages`` (duplicates and already queued ones are skipped); returns how many were queued."""
+        with self._lock:
+            if self._disabled or self._stopped or self._closed:
+                return 0
+            new = [m for m in dict.fromkeys(messages) if m not in self._entries]
+            for i in range(0, len(new), self.chunk_size):
+                chunk = _Chunk(len(self._chunks) + 1, [(m, Future()) for m in new[i:i + self.chunk_size]])
+                for m, fut in chunk.items:
+                    self._entries[m] = (fut, chunk)
+                self._chunks.append(chunk)
+                self._pending.append(chunk)
+        self._send(self._next_chunks())
+        return len(new)
+
+    def _next_chunks(self) -> list[_Chunk]:
+        """Chunks that fit in the window now (marked sent)."""
+        out = []
+        with self._lock:
+            while self._pending and self._open < self.ahead and not (self._disabled or self._stopped or self._closed):
+                out.append(self._mark_sent(self._pending.popleft()))
+        return out
+
+    def _mark_sent(self, chunk: _Chunk) -> _Chunk:
+        chunk.sent = True
+        self._open += 1
+        return chunk
+
+    def _send(self, chunks: list[_Chunk]) -> None:
+        for chunk in chunks:
+            try:
+                self._pool.submit(self._fetch, chunk)
+            except RuntimeError:  # closed meanwhile
+                self._release([chunk], "prefetch closed")
+
+    def _release(self, chunks: list[_Chunk], reason: str) -> int:
+        released = 0
+        for chunk in chunks:
+            for _, fut in chunk.items:
+                released += self._resolve(fut, ({"batch": chunk.no, "error": reason}, None))
+        return released
+
+    def stop(self) -> None:
+        """Send no further chunks; messages of unsent chunks fall back to single calls."""
+        with self._lock:
+            self._stopped = True
+            dropped = list(self._pending)
+            self._pending.clear()
+        self._count(dropped=self._release(dropped, "prefetch stopped"))
+
+    def _fetch(self, chunk: _Chunk) -> None:
+        by_id = {str(i): entry for i, entry in enumerate(chunk.items)}
+        batch = {"batch": chunk.no, "batchSize": len(chunk.items)}
+        try:
+            if self._disabled:
+                return
+            self._count(batches=1)
+
+            def deliver(line: dict[str,t.Any]) -> None:
+                entry = by_id.get(str(line.get("id")))
+                if entry is None:
+                    return
+                ok = line.get("status") == 200 and isinstance(line.get("result"), dict)
+                info = {**batch, "status": line.get("status"), "serverMs": line.get("elapsedMs")}
+                if not ok:
+                    info["error"] = line.get("error")
+                if self._resolve(entry[1], (info, line.get("result") if ok else None)):
+                    self._count(prefetched=1 if ok else 0, failed=0 if ok else 1)
+
+            self.client.call_tool_batch(self.tool, [(cid, {"message": m}) for cid, (m, _) in by_id.items()], on_result=deliver)
+        except MCPError as e:
+            if e.status in (404, 405):
+                with self._lock:
+                    warn, self._disabled = not self._disabled, True
+                    dropped = list(self._pending)
+                    self._pending.clear()
+                self._release(dropped, "batch endpoint unavailable")
+                if warn:
+                    print(f"WARNING: {self.client.endpoint} has no /mcp/tools/call-batch ({e.status}); making one call per record", file=sys.stderr)
+            else:
+                print(f"WARNING: {e}", file=sys.stderr)
+        except Exception as e:  # a failed prefetch only costs the single calls it would have saved
+            print(f"WARNING: MCP batch prefetch failed: {e}", file=sys.stderr)
+        finally:
+            for _, fut in chunk.items:
+                if self._resolve(fut, ({**batch, "error": "not answered"}, None)):
+                    self._count(failed=1)
+
+    def take(self, message: str, call_info: dict[str,t.Any] | None = None) -> t.Any | None:
+        """Prefetched tool result for ``message`` (waiting for its line if still in flight), else None."""
+        urgent: list[_Chunk] = []
+        with self._lock:
+            entry = self._entries.pop(message, None)
+            if entry is None:
+                return None
+            fut, chunk = entry
+            if not chunk.sent and chunk in self._pending:
+                # The workers caught up with the window: send this chunk now.
+                self._pending.remove(chunk)
+                urgent.append(self._mark_sent(chunk))
+            chunk.untaken -= 1
+            if chunk.untaken == 0 and chunk.sent:
+                self._open -= 1
+        self._send(urgent + self._next_chunks())
+        t0 = time.perf_counter()
+        info, result = fut.result()
+        if call_info is not None:
+            call_info["batch"] = {**info, "waitMs": int((time.perf_counter() - t0) * 1000)}
+        if result is not None:
+            self._count(taken=1)
+        return result
+
+    def stats(self) -> dict[str,t.Any]:
+        with self._lock:
+            return {"endpoint": self.client.endpoint, "chunkSize": self.chunk_size, "ahead": self.ahead, "disabled": self._disabled,
+                    "stopped": self._stopped, **self.counters, "unused": len(self._entries)}
+
+    def close(self) -> None:
+        """Cancel chunks not sent yet and release anyone still waiting on them."""
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+            chunks = list(self._chunks)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._release(chunks, "prefetch closed")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""Merge sharded judge runs into one aggregate.
+
+Each host runs ``run_judge_over_dataset.py --shard i/N`` and produces its own run
+directory (results.jsonl + run_manifest.json). This command combines them:
+
+  <out_dir>/
+    results.jsonl     (all records, re-indexed in dataset title order)
+    run_summary.json  (aggregate over every shard; "mergedFrom" lists the inputs)
+    summary.md
+
+Per-record artifacts stay in the shard run directories. Missing or duplicate shards
+are reported; records present in more than one run keep the newest journal line. A
+record whose last line in a run is "invalidated" (see ResultsJournal.invalidate)
+counts as unfinished in that run.
+
+Usage:
+  python eval/pipeline/merge_shard_runs.py eval/runs/host0_run eval/runs/host1_run --out eval/runs/merged
+"""
+from __future__ import annotations
+import argparse, json, datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+import sys
+CURRENT_FILE = Path(__file__).resolve()
+REPO_ROOT = CURRENT_FILE.parent.parent.parent  # eval/pipeline/ -> eval/ -> repo root
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from eval.pipeline.results_journal import ResultsJournal, read_journal  # type: ignore
+from eval.pipeline.run_manifest import RunManifest  # type: ignore
+from eval.pipeline.run_judge_over_dataset import _write_run_summary  # type: ignore
+
+
+def _shard_key(manifest: RunManifest) -> str | None:
+    return manifest.data.get("config", {}).get("shard")
+
+
+def merge_runs(run_dirs: List[Path], out_dir: Path) -> Dict[str, Any]:
+    manifests = [RunManifest.load(d) for d in run_dirs]
+
+    shards = [_shard_key(m) for m in manifests]
+    counts = {s.split("/")[1] for s in shards if s}
+    if len(counts) > 1:
+        raise SystemExit(f"ERROR: runs were sharded with different N: {sorted(counts)}")
+    if counts:
+        n = int(counts.pop())
+        seen = [int(s.split("/")[0]) for s in shards if s]
+        missing = sorted(set(range(n)) - set(seen))
+        dupes = sorted({i for i in seen if seen.count(i) > 1})
+        if missing:
+            print(f"[merge] WARNING: missing shard(s) {missing} of {n}; aggregate is partial")
+        if dupes:
+            print(f"[merge] WARNING: shard(s) {dupes} appear more than once; newest line per record wins")
+    if len({m.data.get("datasetDir") for m in manifests}) > 1:
+        print("[merge] WARNING: runs were started from different dataset directories")
+
+    # title -> (finishedAt, recordId, journal line)
+    merged: Dict[str, tuple[str, str, Dict[str, Any]]] = {}
+    all_titles: set[str] = set()
+    for run_dir, manifest in zip(run_dirs, manifests):
+        titles = {r["idx"]: r["title"] for r in manifest.records}
+        last: Dict[int, Dict[str, Any]] = {}
+        journal_path = run_dir / 'results.jsonl'
+        if journal_path.exists():
+            for line in read_journal(journal_path):
+                last[line["idx"]] = line
+        last = {idx: line for idx, line in last.items() if line.get("status") != "invalidated"}
+        all_titles.update(titles.values())
+        for idx, line in last.items():
+            title = titles.get(idx)
+            if title is None:
+                continue
+            prev = merged.get(title)
+            if prev is None or line.get("finishedAt", "") >= prev[0]:
+                merged[title] = (line.get("finishedAt", ""), line["recordId"], line)
+        print(f"[merge] {run_dir}: shard={_shard_key(manifest) or '-'} records={len(titles)} finished={len(last)}")
+
+    # A record unfinished in one copy of a duplicated shard may be finished in another.
+    pending = len(all_titles - merged.keys())
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    journal_path = out_dir / 'results.jsonl'
+    journal_path.unlink(missing_ok=True)
+    journal = ResultsJournal(journal_path, snapshot_every=0)
+    try:
+        for idx, title in enumerate(sorted(merged), 1):
+            _, rid, line = merged[title]
+            if line.get("status") == "error":
+                result = {"error": {"recordId": rid, "error": line.get("error")}}
+            else:
+                result = {"entry": line["entry"], "skipped": line.get("status") == "skipped"}
+            journal.record(idx, rid, result)
+    finally:
+        journal.close()
+
+    summary = _write_run_summary(out_dir, journal, len(merged) + pending, complete=pending == 0)
+    summary["mergedFrom"] = [{"runDir": str(d), "shard": s} for d, s in zip(run_dirs, shards)]
+    (out_dir / 'run_summary.json').write_text(json.dumps(summary, indent=2), encoding='utf-8')
+    return summary
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description='Merge sharded run directories into one run_summary.json.')
+    p.add_argument('run_dirs', nargs='+', help='Shard run directories (each with run_manifest.json and results.jsonl).')
+    p.add_argument('--out', help='Output directory (default: <parent of first run>/merged_<timestamp>).')
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    run_dirs = [Path(d) for d in args.run_dirs]
+    if args.out:
+        out_dir = Path(args.out)
+    else:
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d_%H%M%S")
+        out_dir = run_dirs[0].parent / f"merged_{stamp}"
+    summary = merge_runs(run_dirs, out_dir)
+    print(json.dumps({k: summary[k] for k in ("runDir", "complete", "recordsTotal", "recordsProcessed", "aggregate")}, indent=2))
+    if summary.get('errors'):
+        print(f"Merged with {len(summary['errors'])} errors.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+Prompt input compaction applied by the message builders in judge.py (steps 3-5).
+
+Every variable input (UI description, agent output, interpretation JSON) goes through
+compact_input() before it is placed into a prompt template:
+
+ 1. JSON inputs are minified (no indentation / separator whitespace). The agent output
+    arrives as ``json.dumps(..., indent=2)`` so this alone removes a large share of
+    its tokens.
+ 2. Identical ``props`` objects repeated across components are replaced, after the first
+    occurrence, by ``{"$sameAs": "<ref>"}``: the first component's id, or its JSON path
+    (``$.composition.components[3]``) when it has none.
+ 3. Inputs still above the per-input token budget are trimmed: for JSON, trailing items of
+    the largest array are dropped (a sibling ``"<key>_omitted": n`` records how many); for
+    text (or JSON that is still too large) the middle is cut, keeping head and tail
+    (``...[N tokens truncated]...``).
+
+The prompt templates in eval/prompts explain these markers to the model.
+
+Token counts use tiktoken (o200k_base) when it is installed, else ~4 chars/token.
+
+Environment:
+    PROMPT_COMPACTION     (default: on; off sends inputs verbatim)
+    PROMPT_TOKEN_BUDGET   (default: 6000; max estimated tokens per input, 0 = no trimming)
+"""
+from __future__ import annotations
+import os
+import json
+import threading
+import typing as t
+
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "on").lower() not in ("0", "off", "false")
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+_settings = {"enabled": PROMPT_COMPACTION, "budget": PROMPT_TOKEN_BUDGET}
+_encoder: t.Any = None
+_encoder_lock = threading.Lock()
+
+def configure_compaction(enabled: bool | None = None, budget: int | None = None) -> dict[str,t.Any]:
+    """Override PROMPT_COMPACTION / PROMPT_TOKEN_BUDGET for this process."""
+    if enabled is not None:
+        _settings["enabled"] = enabled
+    if budget is not None:
+        _settings["budget"] = max(0, budget)
+    return dict(_settings)
+
+def compaction_settings() -> dict[str,t.Any]:
+    return dict(_settings)
+
+def count_tokens(text: str) -> int:
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    import tiktoken  # type: ignore
+                    _encoder = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def _minify(obj: t.Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def dedupe_props(obj: t.Any) -> tuple[t.Any, int]:
+    """Replace repeated identical component ``props`` with ``{"$sameAs": ref}``. Returns (obj, replaced).
+
+    ``ref`` is the first component's id, or its JSON path when it has none (trimming only
+    drops trailing items, so a kept reference always points at a kept component).
+    """
+    replaced = 0
+
+    def walk(node: t.Any, path: str) -> t.Any:
+        nonlocal replaced
+        if isinstance(node, dict):
+            return {k: walk(v, f"{path}.{k}") for k, v in node.items()}
+        if not isinstance(node, list):
+            return node
+        items = [walk(v, f"{path}[{i}]") for i, v in enumerate(node)]
+        seen: dict[str, str] = {}
+        for i, item in enumerate(items):
+            props = item.get("props") if isinstance(item, dict) else None
+            if not isinstance(props, dict) or not props:
+                continue
+            key = _minify(props)
+            if len(key) < 24:  # not worth a reference
+                continue
+            if key in seen:
+                items[i] = {**item, "props": {"$sameAs": seen[key]}}
+                replaced += 1
+            else:
+                seen[key] = str(item["id"]) if item.get("id") not in (None, "") else f"{path}[{i}]"
+        return items
+
+    return walk(obj, "$"), replaced
+
+def _largest_list(node: t.Any, parent: dict | None = None, key: str | None = None) -> tuple[int, dict | None, str | None]:
+    best: tuple[int, dict | None, str | None] = (0, None, None)
+    if isinstance(node, dict):
+        for k, v in node.items():
+            cand = _largest_list(v, node, k)
+            if cand[0] > best[0]:
+                best = cand
+    elif isinstance(node, list):
+        if parent is not None and len(node) > 1:
+            best = (len(_minify(node)), parent, key)
+        for v in node:
+            cand = _largest_list(v)
+            if cand[0] > best[0]:
+                best = cand
+    return best
+
+def _trim_json(obj: t.Any, budget: int) -> tuple[t.Any, bool]:
+    """Drop trailing items of the largest array until the minified JSON fits ``budget``."""
+    trimmed = False
+    for _ in range(8):  # a few passes over successively smaller arrays
+        text = _minify(obj)
+        total = count_tokens(text)
+        if total <= budget:
+            break
+        _, parent, key = _largest_list(obj)
+        if parent is None:
+            break
+        items = parent[key]
+        sizes = [count_tokens(_minify(v)) + 1 for v in items]
+        keep = len(items)
+        while keep > 1 and total > budget:
+            keep -= 1
+            total -= sizes[keep]
+        parent[f"{key}_omitted"] = parent.get(f"{key}_omitted", 0) + len(items) - keep
+        parent[key] = items[:keep]
+        trimmed = True
+    return obj, trimmed
+
+def _trim_text(text: str, budget: int) -> str:
+    tokens = count_tokens(text)
+    if tokens <= budget:
+        return text
+    keep_chars = max(1, int(len(text) * budget / tokens))
+    head, tail = keep_chars * 2 // 3, keep_chars // 3
+    return f"{text[:head]}\n...[{tokens - budget} tokens truncated]...\n{text[-tail:] if tail else ''}"
+
+def compact_input(value: t.Any, stats: dict[str,t.Any] | None = None, *, name: str = "input") -> str:
+    """Return the prompt text for ``value`` (a JSON-able object or a string), compacted.
+
+    ``stats`` (optional) accumulates originalTokens / compactedTokens / dedupedProps /
+    trimmedInputs across the inputs of one prompt (also when compaction is off, as a baseline).
+    """
+    if isinstance(value, str):
+        original = value
+        try:
+            obj = json.loads(value) if value.lstrip()[:1] in ("{", "[") else None
+        except ValueError:
+            obj = None
+    else:
+        obj = value
+        original = json.dumps(value, ensure_ascii=False)
+
+    budget = _settings["budget"]
+    deduped = trimmed = 0
+    if not _settings["enabled"]:
+        out = original
+    elif obj is not None:
+        obj, deduped = dedupe_props(obj)
+        if budget:
+            obj, trimmed = _trim_json(obj, budget)
+        out = _minify(obj)
+    else:
+        out = "\n".join(line.rstrip() for line in original.strip().splitlines())
+    if _settings["enabled"] and budget and count_tokens(out) > budget:
+        out = _trim_text(out, budget)
+        trimmed = True
+
+    if stats is not None:
+        stats["originalTokens"] = stats.get("originalTokens", 0) + count_tokens(original)
+        stats["compactedTokens"] = stats.get("compactedTokens", 0) + count_tokens(out)
+        stats["dedupedProps"] = stats.get("dedupedProps", 0) + deduped
+        if trimmed:
+            stats.setdefault("trimmedInputs", []).append(name)
+        stats["ratio"] = round(stats["compactedTokens"] / stats["originalTokens"], 3) if stats["originalTokens"] else 1.0
+    return out
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Buffered background writer for the AOAI prompt log (JSON lines).
+
+Callers only enqueue records; a single daemon thread batches them and appends to the
+log file. A batch is flushed when it reaches ``batch_size`` records, when
+``flush_interval_s`` has passed since the first buffered record, on close() and at
+interpreter exit. Records written after close() are rejected (counted in
+``stats["rejected"]``, with one warning on stderr). When the file exceeds ``max_bytes``
+it is rotated:
+
+    aoai-prompts.log -> aoai-prompts.log.1[.gz] -> ... -> aoai-prompts.log.<backups>[.gz]
+
+Rotated segments are gzip-compressed when ``gzip_rotated`` is set.
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import gzip
+import queue
+import shutil
+import atexit
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+_STOP = object()
+
+class PromptLogWriter:
+    """Thread-safe, non-blocking JSONL appender with size-based rotation."""
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        max_bytes: int = 50 * 1024 * 1024,
+        backups: int = 5,
+        gzip_rotated: bool = False,
+        flush_interval_s: float = 1.0,
+        batch_size: int = 200
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = max(0, backups)
+        self.gzip_rotated = gzip_rotated
+        self.flush_interval_s = flush_interval_s
+        self.batch_size = max(1, batch_size)
+        self.stats = {"records": 0, "batches": 0, "rotations": 0, "errors": 0, "rejected": 0}
+        self._queue: queue.Queue = queue.Queue()
+        self._flushed = threading.Condition()
+        self._pending = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="aoai-prompt-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record: dict[str,t.Any]) -> bool:
+        """Enqueue ``record``; False once the writer is closed (the record would land behind the stop marker)."""
+        with self._flushed:
+            if self._closed:
+                self.stats["rejected"] += 1
+                warn = self.stats["rejected"] == 1
+            else:
+                self._pending += 1
+                self._queue.put(record)
+                return True
+        if warn:
+            print(f"[aoai.log] writer for {self.path} is closed; dropping records written after close()", file=sys.stderr)
+        return False
+
+    def flush(self, timeout: float | None = 5.0) -> None:
+        """Block until every record enqueued so far is on disk."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._flushed:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._flushed.wait(remaining if remaining is not None else 0.1)
+
+    def close(self) -> None:
+        with self._flushed:  # write() checks _closed under the same lock, so nothing is queued after _STOP
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout=10)
+
+    # ---------------------
+    # Writer thread
+    # ---------------------
+
+    def _run(self) -> None:
+        batch: list[dict[str,t.Any]] = []
+        first_at = 0.0
+        while True:
+            timeout = None if not batch else max(0.0, first_at + self.flush_interval_s - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._write_batch(batch)
+                return
+            if item is not None:
+                if not batch:
+                    first_at = time.monotonic()
+                batch.append(item)
+                if len(batch) < self.batch_size and time.monotonic() - first_at < self.flush_interval_s:
+                    continue
+            if batch:
+                self._write_batch(batch)
+                batch = []
+
+    def _write_batch(self, batch: list[dict[str,t.Any]]) -> None:
+        if not batch:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(payload)
+            self.stats["records"] += len(batch)
+            self.stats["batches"] += 1
+            if self.max_bytes > 0 and self.path.stat().st_size >= self.max_bytes:
+                self._rotate()
+        except Exception as e:  # pragma: no cover
+            self.stats["errors"] += 1
+            print(f"[aoai.log] failed: {e}", file=sys.stderr)
+        finally:
+            with self._flushed:
+                self._pending -= len(batch)
+                self._flushed.notify_all()
+
+    def _segment(self, i: int) -> Path:
+        suffix = f".{i}.gz" if self.gzip_rotated else f".{i}"
+        return self.path.with_name(self.path.name + suffix)
+
+    def _rotate(self) -> None:
+        if self.backups == 0:
+            self.path.unlink(missing_ok=True)
+            self.stats["rotations"] += 1
+            return
+        self._segment(self.backups).unlink(missing_ok=True)
+        for i in range(self.backups - 1, 0, -1):
+            src = self._segment(i)
+            if src.exists():
+                src.replace(self._segment(i + 1))
+        if self.gzip_rotated:
+            with self.path.open("rb") as src, gzip.open(self._segment(1), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            self.path.unlink()
+        else:
+            self.path.replace(self._segment(1))
+        self.stats["rotations"] += 1
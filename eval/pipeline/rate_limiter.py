@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Client-side request pacing for Azure OpenAI deployments.
+
+One RateScheduler is shared by every caller in the process that targets the same
+deployment (see tool_aoai.get_scheduler). It keeps two token buckets sized from the
+deployment quota:
+
+ - tokens-per-minute  (AOAI_TPM): each call reserves its estimated prompt tokens plus
+   AOAI_COMPLETION_TOKEN_ESTIMATE; the reservation is corrected with the actual
+   ``usage.total_tokens`` once the response arrives
+ - requests-per-minute (AOAI_RPM): one unit per call
+
+Both buckets are filled to ``quota * headroom`` (AOAI_RATE_HEADROOM, default 0.9) so the
+process stays just under quota. Server feedback is folded in after every response:
+
+ - ``Retry-After`` / ``retry-after-ms`` pause *all* callers until the given time
+ - ``x-ratelimit-remaining-requests`` / ``x-ratelimit-remaining-tokens`` clamp the
+   buckets down when the server knows of less budget than we do (other clients)
+
+A quota of 0 disables that bucket; Retry-After pauses apply regardless.
+
+``available()`` reports the fraction of budget left (used by aoai_router.py to weight routes).
+``try_acquire()`` reserves only if the call fits right now (hedged copies never wait for quota).
+"""
+from __future__ import annotations
+import time
+import email.utils
+import threading
+import typing as t
+
+# Server-reported remaining budgets older than this no longer describe the current window.
+_REMAINING_TTL_S = 60.0
+
+def estimate_tokens(messages: list[dict[str,str]]) -> int:
+    """Rough local token estimate (~4 chars/token plus per-message overhead)."""
+    total = 3
+    for m in messages:
+        total += 4 + (len(str(m.get("content", ""))) + 3) // 4
+    return total
+
+def parse_retry_after(headers: t.Mapping[str,str]) -> float | None:
+    """Seconds to wait according to retry-after-ms / Retry-After, or None."""
+    lower = {k.lower(): v for k, v in headers.items()}
+    ms = lower.get("retry-after-ms")
+    if ms:
+        try:
+            return max(0.0, float(ms) / 1000.0)
+        except ValueError:
+            pass
+    ra = lower.get("retry-after")
+    if not ra:
+        return None
+    try:
+        return max(0.0, float(ra))
+    except ValueError:
+        pass
+    try:  # HTTP-date form
+        dt = email.utils.parsedate_to_datetime(ra)
+        return max(0.0, dt.timestamp() - time.time())
+    except Exception:
+        return None
+
+class _Bucket:
+    def __init__(self, per_minute: float, headroom: float):
+        self.capacity = max(1.0, per_minute * headroom)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+class RateScheduler:
+    """Thread-safe TPM/RPM token buckets plus a shared Retry-After pause."""
+
+    def __init__(self, *, tpm: int = 0, rpm: int = 0, headroom: float = 0.9, completion_estimate: int = 400):
+        self.tokens = _Bucket(tpm, headroom) if tpm > 0 else None
+        self.requests = _Bucket(rpm, headroom) if rpm > 0 else None
+        self.completion_estimate = completion_estimate
+        self._pause_until = 0.0
+        self._remaining: dict[str, tuple[float, float, float]] = {}  # header -> (remaining, peak seen, when)
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited": 0, "waitMs": 0, "throttled": 0, "pauses": 0}
+
+    def acquire(self, estimated_prompt_tokens: int) -> tuple[int, float]:
+        """Block until the call fits the budgets. Returns ``(reserved_tokens, waited_seconds)``."""
+        reserved = estimated_prompt_tokens + self.completion_estimate
+        waited = 0.0
+        while True:
+            with self._lock:
+                delay = self._reserve(reserved)
+                if delay <= 0:
+                    if waited > 0:
+                        self.stats["waited"] += 1
+                        self.stats["waitMs"] += int(waited * 1000)
+                    return reserved, waited
+            time.sleep(delay)
+            waited += delay
+
+    def try_acquire(self, estimated_prompt_tokens: int) -> int | None:
+        """Reserve without waiting: the reserved tokens, or None when the call does not fit right now."""
+        reserved = estimated_prompt_tokens + self.completion_estimate
+        with self._lock:
+            return reserved if self._reserve(reserved) <= 0 else None
+
+    def _reserve(self, reserved: int) -> float:
+        """Take ``reserved`` tokens and one request if both fit (lock held); else the seconds until they would."""
+        now = time.monotonic()
+        delay = max(0.0, self._pause_until - now)
+        for bucket, amount in ((self.tokens, reserved), (self.requests, 1)):
+            if bucket is not None:
+                bucket.refill(now)
+                delay = max(delay, bucket.wait_for(amount))
+        if delay <= 0:
+            if self.tokens is not None:
+                self.tokens.level -= min(reserved, self.tokens.capacity)
+            if self.requests is not None:
+                self.requests.level -= 1
+            self.stats["acquired"] += 1
+        return delay
+
+    def settle(self, reserved_tokens: int, actual_tokens: int | None) -> None:
+        """Return over-reserved tokens (or charge the shortfall) once usage is known."""
+        if self.tokens is None or actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.refill(time.monotonic())
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + (reserved_tokens - actual_tokens))
+
+    def observe(self, status: int, headers: t.Mapping[str,str]) -> float | None:
+        """Fold response headers into the schedule. Returns the Retry-After delay, if any."""
+        lower = {k.lower(): v for k, v in headers.items()}
+        retry_after = parse_retry_after(lower)
+        with self._lock:
+            now = time.monotonic()
+            if status == 429:
+                self.stats["throttled"] += 1
+            if retry_after is not None and (status == 429 or status >= 500):
+                until = now + retry_after
+                if until > self._pause_until:
+                    self._pause_until = until
+                    self.stats["pauses"] += 1
+            for bucket, header in ((self.tokens, "x-ratelimit-remaining-tokens"), (self.requests, "x-ratelimit-remaining-requests")):
+                if bucket is None or header not in lower:
+                    continue
+                try:
+                    remaining = float(lower[header])
+                except ValueError:
+                    continue
+                bucket.refill(now)
+                bucket.level = min(bucket.level, remaining)
+            for header in ("x-ratelimit-remaining-tokens", "x-ratelimit-remaining-requests"):
+                try:
+                    remaining = float(lower[header])
+                except (KeyError, ValueError):
+                    continue
+                peak = max(remaining, self._remaining.get(header, (0.0, 0.0, 0.0))[1])
+                self._remaining[header] = (remaining, peak, now)
+        return retry_after
+
+    def available(self) -> float:
+        """Fraction of budget left now: 0 during a Retry-After pause, 1 when no quota is known."""
+        with self._lock:
+            now = time.monotonic()
+            if self._pause_until > now:
+                return 0.0
+            fractions = []
+            for bucket in (self.tokens, self.requests):
+                if bucket is not None:
+                    bucket.refill(now)
+                    fractions.append(max(0.0, bucket.level) / bucket.capacity)
+            for remaining, peak, when in self._remaining.values():
+                if peak > 0 and now - when < _REMAINING_TTL_S:
+                    fractions.append(remaining / peak)
+            return min(fractions) if fractions else 1.0
+
+    def snapshot(self) -> dict[str,t.Any]:
+        with self._lock:
+            return {
+                "tpmBudget": round(self.tokens.capacity) if self.tokens else None,
+                "rpmBudget": round(self.requests.capacity) if self.requests else None,
+                **self.stats
+            }
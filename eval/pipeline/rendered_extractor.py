@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Deterministic step 4: derive the rendered UI interpretation from the MCP payload itself.
+
+The agent output is the normalized MCP composition (template + components with
+type / slot / props), so the schema asked of the LLM by interpret_rendered.prompt.txt
+can be filled by walking it:
+
+    {"summary": {"inferredComponents": [...], "lineCount": n},
+     "lines": [{"raw": "...", "keyPhrases": [...]}]}
+
+inferredComponents lists component types in order of first appearance; there is one
+line per rendered component. extract_rendered() returns None when the payload is not
+JSON or contains no components (e.g. the empty Container produced for plain-text MCP
+output), in which case the caller falls back to the LLM.
+
+Environment:
+    RENDERED_EXTRACTOR   (default: llm; local = use this extractor, LLM only as fallback)
+"""
+from __future__ import annotations
+import os
+import json
+import typing as t
+
+from .autoscore import flatten_components
+
+EXTRACTOR_MODES = ("llm", "local")
+RENDERED_EXTRACTOR = os.getenv("RENDERED_EXTRACTOR", "llm").lower()
+
+MAX_KEY_PHRASES = 5     # same limits the rendered prompt gives the LLM
+MAX_PHRASE_WORDS = 3
+# Props that name or label a component, in order of preference.
+_LABEL_PROPS = ("title", "label", "name", "placeholder", "text", "heading")
+_DETAIL_PROPS = ("type", "trend", "variant", "severity", "status")
+
+_mode = RENDERED_EXTRACTOR
+
+def configure_rendered_extractor(mode: str) -> str:
+    """Override RENDERED_EXTRACTOR for this process."""
+    global _mode
+    if mode not in EXTRACTOR_MODES:
+        raise ValueError(f"rendered extractor must be one of {EXTRACTOR_MODES}, got {mode!r}")
+    _mode = mode
+    return _mode
+
+def rendered_extractor_mode() -> str:
+    return _mode
+
+def _scalar(value: t.Any) -> bool:
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+def _phrase(value: t.Any) -> str | None:
+    if not _scalar(value):
+        return None
+    words = str(value).split()
+    return " ".join(words[:MAX_PHRASE_WORDS]) if words else None
+
+def _columns(props: dict) -> list[str]:
+    cols = props.get("columns")
+    if not isinstance(cols, list):
+        return []
+    out = []
+    for c in cols:
+        label = c if isinstance(c, str) else (c.get("header") or c.get("label") or c.get("key") if isinstance(c, dict) else None)
+        if isinstance(label, str):
+            out.append(label)
+    return out
+
+def _line(node) -> dict[str,t.Any]:
+    props = node.props
+    label = next((props[k] for k in _LABEL_PROPS if _scalar(props.get(k))), None)
+    details = [f"{k}={props[k]}" for k in _DETAIL_PROPS if _scalar(props.get(k))]
+    columns = _columns(props)
+    rows = props.get("data") if isinstance(props.get("data"), list) else None
+
+    raw = node.type
+    if label is not None:
+        raw += f" \"{label}\""
+    if node.slot:
+        raw += f" in {node.slot}"
+    extras = details[:]
+    if columns:
+        extras.append("columns: " + ", ".join(columns))
+    if rows is not None:
+        extras.append(f"{len(rows)} rows")
+    if extras:
+        raw += " (" + "; ".join(extras) + ")"
+
+    phrases: list[str] = []
+    for p in [node.type, _phrase(label), *(_phrase(c) for c in columns), _phrase(props.get("value"))]:
+        if p and p not in phrases:
+            phrases.append(p)
+    return {"raw": raw, "keyPhrases": phrases[:MAX_KEY_PHRASES]}
+
+def extract_rendered(agent_output: str | dict) -> dict[str,t.Any] | None:
+    """Rendered interpretation for ``agent_output``, or None if it cannot be derived locally."""
+    try:
+        payload = json.loads(agent_output) if isinstance(agent_output, str) else agent_output
+    except ValueError:
+        return None
+    nodes = flatten_components(payload)
+    # The non-JSON fallback shape ({"root": {"type": "Container", "children": []}}) carries no content.
+    if not nodes or all(n.type == "Container" and not n.props for n in nodes):
+        return None
+    inferred: list[str] = []
+    for n in nodes:
+        if n.type not in inferred:
+            inferred.append(n.type)
+    lines = [_line(n) for n in nodes]
+    return {"summary": {"inferredComponents": inferred, "lineCount": len(lines)}, "lines": lines}
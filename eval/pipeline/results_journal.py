@@ -0,0 +1,515 @@
+#!/usr/bin/env python
+"""
+Crash-safe, streaming results journal for multi-record runs.
+
+Every finished record is appended to ``<run_dir>/results.jsonl`` as soon as it
+completes (one JSON object per line, flushed immediately; fsync'd every
+``fsync_every`` records or ``fsync_interval_s`` seconds). Aggregates are maintained
+online (Welford mean/variance per dimension and overall), so memory stays constant
+no matter how many records a run has; only the first ``errors_kept`` errors (plus an
+error count) and the first ``preview_size`` entries (for summary.md) are retained.
+
+Every ``snapshot_every`` records or ``snapshot_interval_s`` seconds the
+``on_snapshot`` callback is invoked so the caller can refresh run_summary.json /
+summary.md, giving an always-valid partial summary if the run dies midway. It gets a
+``JournalState`` copied under the journal lock and runs outside it, so workers keep
+journaling while the summary is written; snapshots are serialized, oldest first.
+
+Per-step latency percentiles (log-bucketed histogram, ~5% resolution) and token /
+cost / prompt-compaction totals are accumulated the same way from each entry's
+``stepLatencyMs`` and ``usage`` blocks (see judge.record_totals), classic-vs-fused
+judge agreement from the ``calibration`` block written by --judge-mode calibrate,
+autoscore coverage / gate outcomes from the ``autoscore`` block, and per-step counts
+of artifacts linked by --incremental-from from ``reusedSteps``.
+
+Journal line:
+    {"idx": 12, "recordId": "...", "status": "ok"|"skipped"|"error", "finishedAt": "...",
+     "entry": {...} | "error": "..."}
+    {"idx": 12, "recordId": "...", "status": "invalidated", "finishedAt": "...", "reason": "..."}
+
+An "invalidated" line (see ``invalidate``) supersedes the record's earlier result, so a
+resumed run re-runs it even if it stops again before the record finishes.
+"""
+from __future__ import annotations
+import os
+import copy
+import json
+import math
+import time
+import heapq
+import datetime
+import threading
+import typing as t
+from pathlib import Path
+
+DIMENSIONS = ["correctness", "uiFidelity", "compositionality", "resilience", "clarity"]
+
+class _Welford:
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float) -> None:
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Sample (n - 1) variance."""
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+# Two-sided 95% Student t quantiles for 1..30 degrees of freedom; above that t_975() expands around 1.96.
+_T975 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+         2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+         2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+def t_975(df: int) -> float:
+    """0.975 quantile of Student's t with ``df`` degrees of freedom."""
+    if df <= len(_T975):
+        return _T975[max(1, df) - 1]
+    z = 1.959964
+    return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+
+class OnlineAggregate:
+    """Per-dimension and overall score means / variances, updated one entry at a time."""
+
+    def __init__(self, dimensions: list[str] | None = None):
+        self.dimensions = list(dimensions or DIMENSIONS)
+        self.count = 0
+        self._dims = {d: _Welford() for d in self.dimensions}
+        self._overall = _Welford()
+
+    def add(self, entry: dict[str,t.Any]) -> None:
+        self.count += 1
+        scores = entry.get("dimensionScores") or {}
+        for d, acc in self._dims.items():
+            v = scores.get(d)
+            if isinstance(v, (int, float)):
+                acc.add(float(v))
+        if isinstance(entry.get("overall"), (int, float)):
+            self._overall.add(float(entry["overall"]))
+
+    def ci95(self, dimension: str | None = None) -> float | None:
+        """Half-width of the 95% CI of the overall mean (or of one dimension); None below 2 samples.
+
+        Uses the sample variance and Student's t, so small samples get a wider interval.
+        """
+        acc = self._overall if dimension is None else self._dims[dimension]
+        if acc.n < 2:
+            return None
+        return t_975(acc.n - 1) * (acc.variance ** 0.5) / (acc.n ** 0.5)
+
+    def to_dict(self) -> dict[str,t.Any]:
+        if not self.count:
+            return {"count": 0}
+        out: dict[str,t.Any] = {"count": self.count}
+        for d, acc in self._dims.items():
+            if acc.n:
+                out[d] = round(acc.mean, 3)
+        if self._overall.n:
+            out["overallMean"] = round(self._overall.mean, 3)
+            ci = self.ci95()
+            if ci is not None:
+                out["overallCI95"] = round(ci, 3)
+        out["variance"] = {  # sample (n - 1) variance, the one overallCI95 is computed from
+            name: round(acc.variance, 4)
+            for name, acc in [*self._dims.items(), ("overall", self._overall)] if acc.n
+        }
+        return out
+
+class LatencyHistogram:
+    """Constant-memory latency distribution: bucket b holds values in (1.05^(b-1), 1.05^b] ms."""
+
+    GROWTH = 1.05
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets: dict[int, int] = {}
+
+    def add(self, ms: float) -> None:
+        b = 0 if ms <= 1 else int(math.ceil(math.log(ms) / math.log(self.GROWTH)))
+        self._buckets[b] = self._buckets.get(b, 0) + 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(pct / 100.0 * self.count))
+        seen = 0
+        for b in sorted(self._buckets):
+            seen += self._buckets[b]
+            if seen >= rank:
+                return round(min(self.GROWTH ** b, self.max), 1)
+        return round(self.max, 1)  # pragma: no cover
+
+    def to_dict(self) -> dict[str,t.Any]:
+        return {
+            "count": self.count,
+            "meanMs": round(self.total / self.count, 1) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "maxMs": round(self.max, 1),
+        }
+
+USAGE_FIELDS = ("promptTokens", "completionTokens", "cachedTokens", "totalTokens", "llmCalls", "attempts", "queueWaitMs",
+                "cacheHits", "cacheHitTokens", "originalInputTokens", "compactedInputTokens")
+
+class RunPerf:
+    """Per-step latency histograms plus token/cost totals over the finished records."""
+
+    def __init__(self):
+        self.steps: dict[str, LatencyHistogram] = {}
+        self.usage = {f: 0 for f in USAGE_FIELDS}
+        self.records_with_usage = 0
+        self.cost_usd: float | None = None
+        self.reused: dict[str, int] = {}
+
+    def add(self, entry: dict[str,t.Any]) -> None:
+        for name in entry.get("reusedSteps") or ():
+            self.reused[name] = self.reused.get(name, 0) + 1
+        for name, ms in (entry.get("stepLatencyMs") or {}).items():
+            if isinstance(ms, (int, float)):
+                self.steps.setdefault(name, LatencyHistogram()).add(float(ms))
+        usage = entry.get("usage")
+        if not usage:
+            return
+        self.records_with_usage += 1
+        for f in USAGE_FIELDS:
+            self.usage[f] += usage.get(f) or 0
+        if usage.get("costUsd") is not None:
+            self.cost_usd = (self.cost_usd or 0.0) + usage["costUsd"]
+
+    def to_dict(self) -> dict[str,t.Any]:
+        out: dict[str,t.Any] = {}
+        if self.steps:
+            out["stepLatencyMs"] = {name: h.to_dict() for name, h in self.steps.items()}
+        if self.reused:
+            out["stepsReused"] = dict(sorted(self.reused.items()))
+        if self.records_with_usage:
+            n = self.records_with_usage
+            original = self.usage["originalInputTokens"]
+            out["usage"] = {
+                **self.usage,
+                "compactionRatio": round(self.usage["compactedInputTokens"] / original, 3) if original else None,
+                "costUsd": round(self.cost_usd, 4) if self.cost_usd is not None else None,
+                "perRecord": {
+                    "records": n,
+                    "totalTokens": round(self.usage["totalTokens"] / n, 1),
+                    "costUsd": round(self.cost_usd / n, 6) if self.cost_usd is not None else None,
+                },
+            }
+        return out
+
+class AutoscoreStats:
+    """Mean component coverage / prop fidelity and LLM-judge gate outcomes over the finished records."""
+
+    def __init__(self):
+        self.count = 0
+        self._coverage = _Welford()
+        self._fidelity = _Welford()
+        self.gate: dict[str, int] = {}
+
+    def add(self, entry: dict[str,t.Any]) -> None:
+        auto = entry.get("autoscore")
+        if not auto:
+            return
+        self.count += 1
+        self._coverage.add(float(auto["componentCoverage"]))
+        if auto.get("propFidelity") is not None:
+            self._fidelity.add(float(auto["propFidelity"]))
+        reason = (auto.get("gate") or {}).get("reason", "unknown")
+        self.gate[reason] = self.gate.get(reason, 0) + 1
+
+    def to_dict(self) -> dict[str,t.Any]:
+        return {
+            "records": self.count,
+            "componentCoverage": round(self._coverage.mean, 4),
+            "propFidelity": round(self._fidelity.mean, 4) if self._fidelity.n else None,
+            "gate": dict(sorted(self.gate.items())),
+        }
+
+# Fused judging is considered safe when every dimension is within one point of the classic
+# score at least this often and the mean overall difference stays below the bias limit.
+AGREEMENT_WITHIN1_MIN = float(os.getenv("CALIBRATION_WITHIN1_MIN", "0.9"))
+AGREEMENT_MAX_BIAS = float(os.getenv("CALIBRATION_MAX_BIAS", "0.25"))
+
+class _Pair:
+    __slots__ = ("n", "exact", "within1", "abs_sum", "diff_sum", "sx", "sy", "sxx", "syy", "sxy")
+
+    def __init__(self):
+        self.n = self.exact = self.within1 = 0
+        self.abs_sum = self.diff_sum = self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+
+    def add(self, x: float, y: float) -> None:
+        d = y - x
+        self.n += 1
+        self.exact += d == 0
+        self.within1 += abs(d) <= 1
+        self.abs_sum += abs(d)
+        self.diff_sum += d
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.syy += y * y
+        self.sxy += x * y
+
+    def pearson(self) -> float | None:
+        vx = self.n * self.sxx - self.sx ** 2
+        vy = self.n * self.syy - self.sy ** 2
+        if self.n < 2 or vx <= 0 or vy <= 0:
+            return None
+        return (self.n * self.sxy - self.sx * self.sy) / math.sqrt(vx * vy)
+
+    def to_dict(self) -> dict[str,t.Any]:
+        r = self.pearson()
+        return {
+            "n": self.n,
+            "exactRate": round(self.exact / self.n, 3),
+            "within1Rate": round(self.within1 / self.n, 3),
+            "meanAbsDiff": round(self.abs_sum / self.n, 3),
+            "meanDiff": round(self.diff_sum / self.n, 3),  # fused - classic
+            "pearson": round(r, 3) if r is not None else None,
+        }
+
+class Agreement:
+    """Classic vs fused judge agreement over entries carrying a ``calibration`` block."""
+
+    def __init__(self, dimensions: list[str] | None = None):
+        self.dimensions = list(dimensions or DIMENSIONS)
+        self.count = 0
+        self._dims = {d: _Pair() for d in self.dimensions}
+        self._overall = _Pair()
+
+    def add(self, entry: dict[str,t.Any]) -> None:
+        fused = entry.get("calibration")
+        if not fused:
+            return
+        self.count += 1
+        classic = entry.get("dimensionScores") or {}
+        for d, acc in self._dims.items():
+            x, y = classic.get(d), (fused.get("dimensionScores") or {}).get(d)
+            if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+                acc.add(float(x), float(y))
+        if isinstance(entry.get("overall"), (int, float)) and isinstance(fused.get("overall"), (int, float)):
+            self._overall.add(float(entry["overall"]), float(fused["overall"]))
+
+    def to_dict(self) -> dict[str,t.Any]:
+        dims = {d: acc.to_dict() for d, acc in self._dims.items() if acc.n}
+        overall = self._overall.to_dict() if self._overall.n else None
+        safe = bool(dims) and overall is not None \
+            and all(v["within1Rate"] >= AGREEMENT_WITHIN1_MIN for v in dims.values()) \
+            and abs(overall["meanDiff"]) <= AGREEMENT_MAX_BIAS
+        return {
+            "records": self.count,
+            "dimensions": dims,
+            "overall": overall,
+            "thresholds": {"within1RateMin": AGREEMENT_WITHIN1_MIN, "maxOverallBias": AGREEMENT_MAX_BIAS},
+            "fusedSafe": safe,
+        }
+
+class ResultsJournal:
+    """Append-only results.jsonl writer + online aggregate + periodic snapshot trigger. Thread-safe."""
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        fsync_every: int = 20,
+        fsync_interval_s: float = 2.0,
+        snapshot_every: int = 25,
+        snapshot_interval_s: float = 30.0,
+        preview_size: int = 50,
+        errors_kept: int = 200,
+        on_snapshot: t.Callable[["JournalState"], None] | None = None
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval_s = fsync_interval_s
+        self.snapshot_every = max(0, snapshot_every)
+        self.snapshot_interval_s = snapshot_interval_s
+        self.preview_size = preview_size
+        self.errors_kept = max(0, errors_kept)
+        self.on_snapshot = on_snapshot
+        self.aggregate = OnlineAggregate()
+        self.perf = RunPerf()
+        self.agreement = Agreement()
+        self.autoscore = AutoscoreStats()
+        self.finished = 0
+        self.skipped = 0
+        self.error_count = 0
+        self._errors: list[tuple[int, dict[str,str]]] = []  # max-heap on idx via negation
+        self._preview: list[tuple[int, dict[str,t.Any]]] = []  # max-heap on idx via negation
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._file = self.path.open("a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+
+    def record(self, idx: int, rid: str, result: dict[str,t.Any]) -> None:
+        """Journal one ``_run_record`` result (``{"entry"}`` / ``{"error"}``, optionally ``skipped``)."""
+        line: dict[str,t.Any] = {"idx": idx, "recordId": rid, "finishedAt": _now_iso()}
+        if "error" in result:
+            line.update(status="error", error=result["error"].get("error"))
+        else:
+            line.update(status="skipped" if result.get("skipped") else "ok", entry=result["entry"])
+        with self._lock:
+            due = self._append(line, idx, result)
+        if due:
+            self._snapshot()
+
+    def _append(self, line: dict[str,t.Any], idx: int, result: dict[str,t.Any]) -> bool:
+        """Write and fold one line (journal lock held); True when a snapshot is due."""
+        self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        now = time.monotonic()
+        if self._unsynced >= self.fsync_every or now - self._last_sync >= self.fsync_interval_s:
+            self._sync(now)
+        self.finished += 1
+        if "error" in result:
+            self.error_count += 1
+            _keep_first(self._errors, self.errors_kept, idx, result["error"])
+        else:
+            self.skipped += 1 if result.get("skipped") else 0
+            self.aggregate.add(result["entry"])
+            self.perf.add(result["entry"])
+            self.agreement.add(result["entry"])
+            self.autoscore.add(result["entry"])
+            _keep_first(self._preview, self.preview_size, idx, result["entry"])
+        self._since_snapshot += 1
+        due = self.on_snapshot is not None and (
+            (self.snapshot_every and self._since_snapshot >= self.snapshot_every)
+            or now - self._last_snapshot >= self.snapshot_interval_s
+        )
+        if due:
+            self._since_snapshot = 0
+            self._last_snapshot = now
+        return bool(due)
+
+    def _snapshot(self) -> None:
+        # The snapshot lock keeps summaries in order: the state is copied only once the
+        # previous snapshot has been written, so an older copy never overwrites a newer one.
+        with self._snapshot_lock:
+            with self._lock:
+                state = JournalState(self)
+            self.on_snapshot(state)
+
+    def invalidate(self, idx: int, rid: str, reason: str) -> None:
+        """Journal (and fsync) that record ``idx``'s earlier result no longer counts."""
+        line = {"idx": idx, "recordId": rid, "status": "invalidated", "finishedAt": _now_iso(), "reason": reason}
+        with self._lock:
+            self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self._sync(time.monotonic())
+
+    def restore(self, exclude: t.Container[int] = ()) -> dict[int, dict[str,t.Any]]:
+        """Fold an existing journal (resumed run) into the aggregate.
+
+        Later lines for the same idx supersede earlier ones. Finished records ("ok" /
+        "skipped") are counted; errors are not, since the resumed run retries them, and
+        neither are indices in ``exclude`` (records that will be re-run from scratch).
+        Returns the last line per idx.
+        """
+        last: dict[int, dict[str,t.Any]] = {}
+        if self.path.exists() and self.path.stat().st_size:
+            for line in read_journal(self.path):
+                if "idx" in line:
+                    last[line["idx"]] = line
+        with self._lock:
+            for idx, line in last.items():
+                if idx not in exclude and line.get("status") in ("ok", "skipped") and "entry" in line:
+                    self.finished += 1
+                    self.aggregate.add(line["entry"])
+                    self.perf.add(line["entry"])
+                    self.agreement.add(line["entry"])
+                    self.autoscore.add(line["entry"])
+                    _keep_first(self._preview, self.preview_size, idx, line["entry"])
+        return last
+
+    def _sync(self, now: float) -> None:
+        try:
+            os.fsync(self._file.fileno())
+        except OSError:  # pragma: no cover
+            pass
+        self._unsynced = 0
+        self._last_sync = now
+
+    def ci95s(self, dimensions: bool = False) -> tuple[int, list[float | None]]:
+        """Aggregated record count and the overall CI95 (then each dimension's), read under the journal lock."""
+        with self._lock:
+            agg = self.aggregate
+            return agg.count, [agg.ci95()] + ([agg.ci95(d) for d in agg.dimensions] if dimensions else [])
+
+    def errors(self) -> list[dict[str,str]]:
+        """First ``errors_kept`` errors in dataset order (``error_count`` has them all)."""
+        return _in_order(self._errors)
+
+    def preview(self) -> list[dict[str,t.Any]]:
+        """First ``preview_size`` successful entries in dataset order."""
+        return _in_order(self._preview)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            self._sync(time.monotonic())
+            self._file.close()
+
+class JournalState:
+    """Copy of a journal's counters and aggregates, taken under its lock for ``on_snapshot``."""
+
+    def __init__(self, journal: ResultsJournal):
+        self.finished = journal.finished
+        self.skipped = journal.skipped
+        self.error_count = journal.error_count
+        self.aggregate = copy.deepcopy(journal.aggregate)
+        self.perf = copy.deepcopy(journal.perf)
+        self.agreement = copy.deepcopy(journal.agreement)
+        self.autoscore = copy.deepcopy(journal.autoscore)
+        self._errors = list(journal._errors)  # entries are never mutated once journaled
+        self._preview = list(journal._preview)
+
+    def errors(self) -> list[dict[str,str]]:
+        return _in_order(self._errors)
+
+    def preview(self) -> list[dict[str,t.Any]]:
+        return _in_order(self._preview)
+
+def _keep_first(heap: list[tuple[int, t.Any]], size: int, idx: int, item: t.Any) -> None:
+    """Keep the ``size`` lowest-idx items in ``heap`` (a max-heap on idx via negation)."""
+    if len(heap) < size:
+        heapq.heappush(heap, (-idx, item))
+    elif heap and -heap[0][0] > idx:
+        heapq.heapreplace(heap, (-idx, item))
+
+def _in_order(heap: list[tuple[int, t.Any]]) -> list[t.Any]:
+    return [item for _, item in sorted(heap, key=lambda p: -p[0])]
+
+def read_journal(path: str | os.PathLike) -> t.Iterator[dict[str,t.Any]]:
+    """Yield journal lines, ignoring a torn trailing line left by a crash."""
+    with Path(path).open("r", encoding="utf-8") as f:
+        for raw in f:
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                yield json.loads(raw)
+            except ValueError:
+                continue
+
+def _now_iso() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+"""
+Cross-run score history (SQLite) for trend and regression queries.
+
+Every run directory (results.jsonl + run_manifest.json / run_summary.json) is ingested
+into one database, by default ``<run_root>/history.sqlite``:
+
+    runs(run_id, run_dir, run_timestamp, model, prompt_hash, judge_mode, dataset_hash,
+         records, overall_mean, complete, journal_size, journal_mtime_ns, indexed_at)
+    scores(run_dir, record_id, run_timestamp, model, prompt_hash, status, overall,
+           correctness, ui_fidelity, compositionality, resilience, clarity, component_coverage)
+
+``scores`` carries the run's timestamp / model / prompt hash so per-record history is an
+index range scan: indexes on (record_id, run_timestamp), (run_timestamp), (model,
+run_timestamp) and (prompt_hash, run_timestamp). ``prompt_hash`` is a SHA-256 over the
+manifest's prompt-template hashes. Ingestion is incremental: a run whose results.jsonl
+size and mtime are unchanged is skipped, so re-ingesting a whole run root is cheap.
+run_judge_over_dataset.py ingests each run when it finishes (--history, RUN_HISTORY).
+
+CLI:
+    python -m eval.pipeline.run_history ingest eval/runs [more run roots / run dirs]
+    python -m eval.pipeline.run_history runs [--last 20]
+    python -m eval.pipeline.run_history trend <recordId> [--dimension correctness] [--last 30] [--model M]
+    python -m eval.pipeline.run_history regressions <runA> <runB> [--dimension overall] [--top 20]
+    python -m eval.pipeline.run_history deltas <runA> <runB>
+
+Runs are referred to by directory name (e.g. 20250101_120000), full path, ``latest`` or
+``latest~N``. Every query command accepts ``--db`` and ``--json``.
+
+Environment:
+    RUN_HISTORY        (default: on; off = do not ingest at the end of a run)
+    RUN_HISTORY_PATH   (default: <run_root>/history.sqlite)
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import datetime
+import threading
+import typing as t
+from pathlib import Path
+
+from .results_journal import read_journal
+
+HISTORY_FILE = "history.sqlite"
+RUN_HISTORY = os.getenv("RUN_HISTORY", "on").lower()
+RUN_HISTORY_PATH = os.getenv("RUN_HISTORY_PATH")
+
+# Journal dimension key -> column
+DIMENSION_COLUMNS = {
+    "correctness": "correctness",
+    "uiFidelity": "ui_fidelity",
+    "compositionality": "compositionality",
+    "resilience": "resilience",
+    "clarity": "clarity",
+}
+_SCORE_COLUMNS = {"overall": "overall", **DIMENSION_COLUMNS, "componentCoverage": "component_coverage"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id           TEXT NOT NULL,
+    run_dir          TEXT PRIMARY KEY,
+    run_timestamp    TEXT NOT NULL,
+    model            TEXT,
+    prompt_hash      TEXT,
+    judge_mode       TEXT,
+    dataset_hash     TEXT,
+    records          INTEGER NOT NULL,
+    overall_mean     REAL,
+    complete         INTEGER NOT NULL,
+    journal_size     INTEGER NOT NULL,
+    journal_mtime_ns INTEGER NOT NULL,
+    indexed_at       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON runs(run_timestamp);
+CREATE INDEX IF NOT EXISTS idx_runs_run_id ON runs(run_id);
+CREATE TABLE IF NOT EXISTS scores (
+    run_dir            TEXT NOT NULL REFERENCES runs(run_dir),
+    record_id          TEXT NOT NULL,
+    run_timestamp      TEXT NOT NULL,
+    model              TEXT,
+    prompt_hash        TEXT,
+    status             TEXT NOT NULL,
+    overall            REAL,
+    correctness        REAL,
+    ui_fidelity        REAL,
+    compositionality   REAL,
+    resilience         REAL,
+    clarity            REAL,
+    component_coverage REAL,
+    PRIMARY KEY (run_dir, record_id)
+);
+CREATE INDEX IF NOT EXISTS idx_scores_record ON scores(record_id, run_timestamp);
+CREATE INDEX IF NOT EXISTS idx_scores_timestamp ON scores(run_timestamp);
+CREATE INDEX IF NOT EXISTS idx_scores_model ON scores(model, run_timestamp);
+CREATE INDEX IF NOT EXISTS idx_scores_prompt ON scores(prompt_hash, run_timestamp);
+"""
+
+def history_enabled() -> bool:
+    return RUN_HISTORY not in ("off", "0", "false")
+
+def default_history_path(run_root: Path) -> Path:
+    return Path(RUN_HISTORY_PATH) if RUN_HISTORY_PATH else Path(run_root) / HISTORY_FILE
+
+def prompt_set_hash(prompt_hashes: dict[str,str] | None) -> str | None:
+    if not prompt_hashes:
+        return None
+    return hashlib.sha256(json.dumps(prompt_hashes, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _read_json(path: Path) -> dict[str,t.Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+class RunHistory:
+    """SQLite index of per-record scores across runs. Thread-safe."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    # -- ingestion ------------------------------------------------------------------
+
+    def ingest_run(self, run_dir: Path, *, force: bool = False) -> int | None:
+        """Index one run; returns the number of scores written, or None if it was already up to date."""
+        run_dir = Path(run_dir).resolve()
+        journal = run_dir / "results.jsonl"
+        if not journal.exists():
+            return None
+        st = journal.stat()
+        with self._lock:
+            row = self._conn.execute("SELECT journal_size, journal_mtime_ns FROM runs WHERE run_dir = ?", (str(run_dir),)).fetchone()
+        if row is not None and not force and (row[0], row[1]) == (st.st_size, st.st_mtime_ns):
+            return None
+
+        manifest = _read_json(run_dir / "run_manifest.json")
+        summary = _read_json(run_dir / "run_summary.json")
+        config = manifest.get("config") or {}
+        timestamp = manifest.get("createdAt") or summary.get("timestamp") or \
+            datetime.datetime.fromtimestamp(st.st_mtime, datetime.timezone.utc).isoformat(timespec="seconds")
+        model = config.get("model")
+        prompt_hash = prompt_set_hash(manifest.get("promptHashes"))
+
+        last: dict[str, dict[str,t.Any]] = {}
+        for line in read_journal(journal):
+            if "recordId" in line:
+                last[line["recordId"]] = line
+        rows = []
+        for rid, line in last.items():
+            if line.get("status") == "invalidated":
+                continue  # superseded result, the record has not re-run yet
+            entry = line.get("entry") or {}
+            dims = entry.get("dimensionScores") or {}
+            auto = entry.get("autoscore") or {}
+            values = {"overall": entry.get("overall"), **{k: dims.get(k) for k in DIMENSION_COLUMNS}, "componentCoverage": auto.get("componentCoverage")}
+            rows.append((str(run_dir), rid, timestamp, model, prompt_hash, line.get("status", "ok"),
+                         *[v if isinstance(v, (int, float)) and not isinstance(v, bool) else None for v in values.values()]))
+
+        aggregate = summary.get("aggregate") or {}
+        with self._lock:
+            self._conn.execute("DELETE FROM scores WHERE run_dir = ?", (str(run_dir),))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, run_dir, run_timestamp, model, prompt_hash, judge_mode, dataset_hash, records, overall_mean, complete, journal_size, journal_mtime_ns, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_dir.name, str(run_dir), timestamp, model, prompt_hash, config.get("judgeMode"), manifest.get("datasetHash"),
+                 len(rows), aggregate.get("overallMean"), 1 if summary.get("complete") else 0, st.st_size, st.st_mtime_ns, time.time())
+            )
+            self._conn.executemany(f"INSERT INTO scores VALUES ({', '.join('?' * 13)})", rows)
+            self._conn.commit()
+        return len(rows)
+
+    def ingest(self, paths: t.Iterable[Path], *, force: bool = False) -> dict[str,int]:
+        """Ingest run directories and/or run roots (every subdirectory with a results.jsonl)."""
+        counts = {"runs": 0, "upToDate": 0, "scores": 0}
+        for path in paths:
+            path = Path(path)
+            run_dirs = [path] if (path / "results.jsonl").exists() else sorted(d for d in path.iterdir() if (d / "results.jsonl").exists())
+            for run_dir in run_dirs:
+                written = self.ingest_run(run_dir, force=force)
+                if written is None:
+                    counts["upToDate"] += 1
+                else:
+                    counts["runs"] += 1
+                    counts["scores"] += written
+        return counts
+
+    # -- queries --------------------------------------------------------------------
+
+    def _query(self, sql: str, params: t.Sequence[t.Any] = ()) -> list[dict[str,t.Any]]:
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params)]
+
+    def resolve_run(self, ref: str) -> str:
+        """Run directory for a name, path, ``latest`` or ``latest~N``."""
+        if ref == "latest" or ref.startswith("latest~"):
+            offset = int(ref.split("~", 1)[1]) if "~" in ref else 0
+            rows = self._query("SELECT run_dir FROM runs ORDER BY run_timestamp DESC, run_dir DESC LIMIT 1 OFFSET ?", (offset,))
+        else:
+            path = Path(ref)
+            rows = self._query("SELECT run_dir FROM runs WHERE run_dir = ?", (str(path.resolve()),)) if path.exists() else []
+            rows = rows or self._query("SELECT run_dir FROM runs WHERE run_id = ? ORDER BY run_timestamp DESC", (ref,))
+            if len(rows) > 1:
+                raise ValueError(f"run {ref!r} is ambiguous ({len(rows)} run roots); pass the full path")
+        if not rows:
+            raise ValueError(f"run {ref!r} is not in the history index")
+        return rows[0]["run_dir"]
+
+    def runs(self, last: int = 20) -> list[dict[str,t.Any]]:
+        return self._query(
+            "SELECT run_id, run_timestamp, model, substr(prompt_hash, 1, 12) AS prompt_hash, judge_mode, records, overall_mean, complete "
+            "FROM runs ORDER BY run_timestamp DESC, run_dir DESC LIMIT ?", (last,))
+
+    def trend(self, record_id: str, *, dimension: str = "overall", last: int = 30, model: str | None = None) -> list[dict[str,t.Any]]:
+        """Score of one record over its most recent ``last`` runs, oldest first."""
+        col = _column(dimension)
+        where, params = "record_id = ?", [record_id]
+        if model:
+            where += " AND model = ?"
+            params.append(model)
+        rows = self._query(
+            f"SELECT s.run_timestamp, r.run_id, s.model, substr(s.prompt_hash, 1, 12) AS prompt_hash, s.status, s.{col} AS score "
+            f"FROM scores s JOIN runs r ON r.run_dir = s.run_dir WHERE {where} ORDER BY s.run_timestamp DESC LIMIT ?", (*params, last))
+        return rows[::-1]
+
+    def regressions(self, run_a: str, run_b: str, *, dimension: str = "overall", top: int = 20) -> list[dict[str,t.Any]]:
+        """Records whose score dropped most from run A to run B (worst first)."""
+        col = _column(dimension)
+        return self._query(
+            f"SELECT a.record_id, a.{col} AS before, b.{col} AS after, b.{col} - a.{col} AS delta "
+            f"FROM scores a JOIN scores b ON b.record_id = a.record_id "
+            f"WHERE a.run_dir = ? AND b.run_dir = ? AND a.{col} IS NOT NULL AND b.{col} IS NOT NULL AND b.{col} < a.{col} "
+            f"ORDER BY delta ASC, a.record_id LIMIT ?", (self.resolve_run(run_a), self.resolve_run(run_b), top))
+
+    def deltas(self, run_a: str, run_b: str) -> list[dict[str,t.Any]]:
+        """Per-dimension mean change from run A to run B over the records scored in both."""
+        a, b = self.resolve_run(run_a), self.resolve_run(run_b)
+        out = []
+        for name, col in _SCORE_COLUMNS.items():
+            row = self._query(
+                f"SELECT COUNT(*) AS records, AVG(a.{col}) AS before, AVG(b.{col}) AS after, "
+                f"SUM(b.{col} > a.{col}) AS improved, SUM(b.{col} < a.{col}) AS regressed "
+                f"FROM scores a JOIN scores b ON b.record_id = a.record_id "
+                f"WHERE a.run_dir = ? AND b.run_dir = ? AND a.{col} IS NOT NULL AND b.{col} IS NOT NULL", (a, b))[0]
+            if row["records"]:
+                out.append({"dimension": name, **row, "delta": row["after"] - row["before"]})
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def _column(dimension: str) -> str:
+    if dimension not in _SCORE_COLUMNS:
+        raise ValueError(f"dimension must be one of {list(_SCORE_COLUMNS)}, got {dimension!r}")
+    return _SCORE_COLUMNS[dimension]
+
+def index_run(run_dir: Path, db_path: Path | None = None) -> int | None:
+    """Ingest one finished run into the history index next to it (or at ``db_path``)."""
+    history = RunHistory(db_path or default_history_path(Path(run_dir).parent))
+    try:
+        return history.ingest_run(run_dir)
+    finally:
+        history.close()
+
+def _print_table(rows: list[dict[str,t.Any]]) -> None:
+    if not rows:
+        print("(no rows)")
+        return
+    cols = list(rows[0].keys())
+    cells = [[f"{r[c]:.3f}" if isinstance(r[c], float) else ("" if r[c] is None else str(r[c])) for c in cols] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(cols)]
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for row in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+def _cli():  # pragma: no cover
+    import argparse
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", help=f"History database (default: RUN_HISTORY_PATH or eval/runs/{HISTORY_FILE})")
+    common.add_argument("--json", action="store_true", help="Print JSON instead of a table.")
+    ap = argparse.ArgumentParser(description="Cross-run score history: ingest runs, query trends and regressions.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("ingest", parents=[common], help="Index run directories / run roots (incremental).")
+    p.add_argument("paths", nargs="*", default=["eval/runs"])
+    p.add_argument("--force", action="store_true", help="Re-index runs even if unchanged.")
+    p = sub.add_parser("runs", parents=[common], help="List indexed runs, newest first.")
+    p.add_argument("--last", type=int, default=20)
+    p = sub.add_parser("trend", parents=[common], help="One record's score across runs.")
+    p.add_argument("record_id")
+    p.add_argument("--dimension", default="overall", choices=list(_SCORE_COLUMNS))
+    p.add_argument("--last", type=int, default=30)
+    p.add_argument("--model")
+    p = sub.add_parser("regressions", parents=[common], help="Records with the largest drop from run A to run B.")
+    p.add_argument("run_a")
+    p.add_argument("run_b")
+    p.add_argument("--dimension", default="overall", choices=list(_SCORE_COLUMNS))
+    p.add_argument("--top", type=int, default=20)
+    p = sub.add_parser("deltas", parents=[common], help="Per-dimension mean change from run A to run B.")
+    p.add_argument("run_a")
+    p.add_argument("run_b")
+    args = ap.parse_args()
+
+    history = RunHistory(Path(args.db) if args.db else default_history_path(Path("eval/runs")))
+    started = time.perf_counter()
+    try:
+        if args.command == "ingest":
+            result: t.Any = history.ingest([Path(p) for p in args.paths], force=args.force)
+        elif args.command == "runs":
+            result = history.runs(args.last)
+        elif args.command == "trend":
+            result = history.trend(args.record_id, dimension=args.dimension, last=args.last, model=args.model)
+        elif args.command == "regressions":
+            result = history.regressions(args.run_a, args.run_b, dimension=args.dimension, top=args.top)
+        else:
+            result = history.deltas(args.run_a, args.run_b)
+    except ValueError as e:
+        raise SystemExit(f"ERROR: {e}")
+    finally:
+        history.close()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if args.json or isinstance(result, dict):
+        print(json.dumps(result, indent=2))
+    else:
+        _print_table(result)
+    print(f"({elapsed_ms:.1f} ms)", file=sys.stderr)
+
+if __name__ == "__main__":  # pragma: no cover
+    _cli()
@@ -3,22 +3,25 @@
 
 Loads the evaluation dataset (UI descriptions), runs the single-record judge pipeline
 from `eval/pipeline/judge.py` (steps 1–5) for each record, and writes an aggregated
-summary. This supersedes the older results.jsonl -> summary pipeline.
+summary. Results are journaled and aggregated online as records finish.
 
 Outputs layout:
   eval/runs/<timestamp>/
     <recordId>/ ... per-record artifacts (see judge.py)
-    run_summary.json  (machine readable aggregate)
+    results.jsonl     (one line per finished record, appended as records complete)
+    run_summary.json  (machine readable aggregate; refreshed while running, "complete": false)
     summary.md        (human readable aggregate)
+    artifacts.sqlite  (--artifact-store packed: finished records' artifacts, see artifact_store.py)
 
 Usage example:
   python eval/pipeline/run_judge_over_dataset.py \
-      --run-root eval/runs --limit 10 --mcp-mode stub
+      --run-root eval/runs --limit 10 --mcp-endpoint http://localhost:3001 --workers 8
 """
 from __future__ import annotations
-import argparse, json, re, statistics, datetime
+import argparse, json, os, re, random, shutil, datetime, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List
 
 # Allow running this script directly (python eval/pipeline/run_judge_over_dataset.py)
 # by ensuring the repository root is on sys.path for absolute-style imports.
@@ -28,8 +31,20 @@ REPO_ROOT = CURRENT_FILE.parent.parent.parent  # eval/pipeline/ -> eval/ -> repo
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
-from eval.dataset.load_dataset import load_dataset, resolve_dataset_dir  # type: ignore
-from eval.pipeline.judge import process_single_record  # type: ignore
+from eval.dataset.load_dataset import iter_dataset, parse_shard, resolve_dataset_dir  # type: ignore
+from eval.pipeline.judge import process_single_record, read_prompts, configure_mcp_cache, mcp_cache_stats, configure_mcp_client, mcp_client_stats, MCP_CACHE_MODES, JUDGE_MODES  # type: ignore
+from eval.pipeline.judge import configure_mcp_batch, prefetch_agent_outputs, mcp_batch_stats, mcp_call_needed  # type: ignore
+from eval.pipeline.mcp_client import MCP_BATCH_SIZE  # type: ignore
+from eval.pipeline.batch_mode import process_records_batch, make_backend, BATCH_BACKENDS, LOCAL_RUNNERS  # type: ignore
+from eval.pipeline.tool_aoai import configure_cache, cache_stats, scheduler_stats, configure_routes, router_stats, CACHE_MODES  # type: ignore
+from eval.pipeline.tool_aoai import configure_hedging, hedge_stats, HEDGE_MODES  # type: ignore
+from eval.pipeline.results_journal import JournalState, ResultsJournal  # type: ignore
+from eval.pipeline.prompt_compaction import configure_compaction, compaction_settings  # type: ignore
+from eval.pipeline.autoscore import configure_gate, gate_mode, GATE_MODES  # type: ignore
+from eval.pipeline.rendered_extractor import configure_rendered_extractor, rendered_extractor_mode, EXTRACTOR_MODES  # type: ignore
+from eval.pipeline.artifact_store import ArtifactStore, configure_artifact_store, artifact_store_mode, ARTIFACT_STORE_MODES  # type: ignore
+from eval.pipeline.run_history import index_run, history_enabled  # type: ignore
+from eval.pipeline.run_manifest import RunManifest, find_latest_run, text_hash, dataset_hash  # type: ignore
 
 
 def _now_iso() -> str:
@@ -56,28 +71,11 @@ def ensure_run_dir(root: Path) -> Path:
     return rd
 
 
-def aggregate_scores(per: List[Dict[str, Any]]) -> Dict[str, Any]:
-    if not per:
-        return {"count": 0}
-    dims = ["correctness", "uiFidelity", "compositionality", "resilience", "clarity"]
-    out: Dict[str, Any] = {"count": len(per)}
-    for d in dims:
-        vals = [p["dimensionScores"][d] for p in per if d in p.get("dimensionScores", {})]
-        if vals:
-            out[d] = round(sum(vals)/len(vals), 3)
-    over = [p.get("overall") for p in per if p.get("overall") is not None]
-    if over:
-        mean = sum(over)/len(over)
-        out["overallMean"] = round(mean, 3)
-        if len(over) > 1:
-            sd = statistics.pstdev(over)
-            ci95 = 1.96 * (sd / (len(over) ** 0.5))
-            out["overallCI95"] = round(ci95, 3)
-    return out
-
-
-def write_summary_md(run_dir: Path, agg: Dict[str, Any], per: List[Dict[str, Any]]):
+def write_summary_md(run_dir: Path, agg: Dict[str, Any], per: List[Dict[str, Any]], calibration: Dict[str, Any] | None = None,
+                     early_stop: Dict[str, Any] | None = None):
     lines = ["# Run Summary", "", f"Records: {agg.get('count',0)}"]
+    if early_stop and early_stop.get("stopped"):
+        lines.append(f"Early stop: CI95 reached {early_stop['targetCI']} after {early_stop['recordsNeeded']} records")
     if 'overallMean' in agg:
         if 'overallCI95' in agg:
             lines.append(f"Overall Mean: {agg['overallMean']:.3f} ± {agg['overallCI95']:.3f}")
@@ -87,6 +85,15 @@ def write_summary_md(run_dir: Path, agg: Dict[str, Any], per: List[Dict[str, Any
         if d in agg:
             lines.append(f"{d}: {agg[d]:.3f}")
     lines.append("")
+    if calibration:
+        lines.append(f"## Fused vs Classic Agreement ({calibration['records']} records)")
+        lines.append("| dimension | exact | within 1 | mean abs diff | mean diff (fused - classic) |")
+        lines.append("|-----------|-------|----------|---------------|-----------------------------|")
+        for name, a in [*calibration["dimensions"].items(), ("overall", calibration.get("overall"))]:
+            if a:
+                lines.append(f"| {name} | {a['exactRate']:.2f} | {a['within1Rate']:.2f} | {a['meanAbsDiff']:.2f} | {a['meanDiff']:+.2f} |")
+        lines.append(f"Fused judging within tolerance: {'yes' if calibration['fusedSafe'] else 'no'}")
+        lines.append("")
     lines.append("## Per Record (first 50)")
     lines.append("| id | overall | rendered_components | intended_inferred |")
     lines.append("|----|---------|---------------------|-------------------|")
@@ -94,91 +101,561 @@ def write_summary_md(run_dir: Path, agg: Dict[str, Any], per: List[Dict[str, Any
         rc = ",".join(r.get("componentTypes", [])[:6])
         ic = ",".join(r.get("intendedInferredComponents", [])[:6])
         lines.append(f"| {r['recordId']} | {r.get('overall','?')} | {rc} | {ic} |")
-    (run_dir / 'summary.md').write_text('\n'.join(lines) + '\n', encoding='utf-8')
-
-
-def run_dataset(run_root: Path, *, mcp_endpoint: str, limit: int | None, filter_sub: str | None, model: str, id_prefix: str | None, skip_existing: bool) -> Dict[str, Any]:
-    print(f"[dataset] Loading from: {resolve_dataset_dir()}")
-    data = load_dataset()
-    print(f"[dataset] Loaded {len(data)} entries")
-    titles = list(data.keys())
-    if filter_sub:
-        titles = [t for t in titles if filter_sub.lower() in t.lower()]
-        print(f"[dataset] Filtered to {len(titles)} entries matching '{filter_sub}'")
-    if limit is not None:
-        titles = titles[:limit]
-        print(f"[dataset] Limited to {len(titles)} entries")
-    run_dir = ensure_run_dir(run_root)
-    per: List[Dict[str, Any]] = []
-    errors: List[Dict[str, str]] = []
-    for idx, title in enumerate(titles, 1):
-        raw = data[title]
-        rid_base = sanitize_id(title)
-        rid = f"{id_prefix}{rid_base}" if id_prefix else rid_base
-        # Log start of record processing for responsiveness
-        print(f"[record {idx}/{len(titles)}] Starting: title='{title}' id='{rid}' at {_now_iso()}", flush=True)
-        out_dir = run_dir / rid
+    _write_text_atomic(run_dir / 'summary.md', '\n'.join(lines) + '\n')
+
+
+def _score_entry(record_id: str, score: Dict[str, Any], summary: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    summary = summary or {}
+    return {
+        "recordId": record_id,
+        "overall": score.get("overall"),
+        "dimensionScores": score.get("dimensionScores", {}),
+        "componentTypes": summary.get("componentTypes", score.get("rendered", {}).get("componentTypes", []) if 'rendered' in score else []),
+        "intendedInferredComponents": summary.get("intendedInferredComponents", score.get("intended", {}).get("summary", {}).get("inferredComponents", [])),
+        **{k: summary[k] for k in ("stepLatencyMs", "usage", "calibration", "reusedSteps") if k in summary},
+        **({"autoscore": score["autoscore"]} if "autoscore" in score else {}),
+    }
+
+
+def _write_record_stub(out_dir: Path, rid: str, raw: str, expected: List[Dict[str, Any]] | None = None) -> Path:
+    # Build synthetic record json for the single-record processor
+    out_dir.mkdir(parents=True, exist_ok=True)
+    record_path = out_dir / 'record.json'
+    record = {"id": rid, "ui_description": raw}
+    if expected:
+        record["expected_components"] = expected
+    record_path.write_text(json.dumps(record, indent=2), encoding='utf-8')
+    return record_path
+
+
+def _existing_score(out_dir: Path, rid: str) -> Dict[str, Any] | None:
+    try:
+        score = json.loads((out_dir / 'score.json').read_text(encoding='utf-8'))
+        return {"entry": _score_entry(rid, score), "skipped": True}
+    except Exception:
+        return None
+
+
+def _run_record(run_dir: Path, rid: str, raw: str, *, mcp_endpoint: str, model: str, skip_existing: bool, resume: bool = False, judge_mode: str = 'classic', load_expected: Callable[[], List[Dict[str, Any]] | None] | None = None, incremental_from: Path | None = None) -> Dict[str, Any]:
+    """Run steps 1–5 for one dataset entry.
+
+    Returns ``{"entry": ...}`` on success or ``{"error": ...}`` on failure so that a
+    failing record never affects its neighbours (same isolation as the sequential loop).
+    With ``resume`` the step artifacts already in the record directory are reused; with
+    ``incremental_from`` (the record's directory in a previous run) unchanged steps are linked from there.
+    ``load_expected`` (e.g. ``RecordHandle.read_expected``) is called inside the error handling,
+    so a malformed expected.json fails only this record.
+    """
+    out_dir = run_dir / rid
+    if skip_existing and (out_dir / 'score.json').exists():
+        existing = _existing_score(out_dir, rid)
+        if existing:
+            return existing
+    try:
+        record_path = _write_record_stub(out_dir, rid, raw, load_expected() if load_expected else None)
+        summary = process_single_record(
+            record_path=record_path,
+            out_dir=out_dir,
+            ui_key='ui_description',
+            mcp_endpoint=mcp_endpoint,
+            model=model,
+            resume=resume,
+            judge_mode=judge_mode,
+            incremental_from=incremental_from,
+        )
+        score_file = out_dir / 'score.json'
+        if score_file.exists():
+            score = json.loads(score_file.read_text(encoding='utf-8'))
+            return {"entry": _score_entry(summary["recordId"], score, summary)}
+        return {"error": {"recordId": rid, "error": "score.json missing"}}
+    except Exception as e:
+        return {"error": {"recordId": rid, "error": str(e)}}
+
+
+def _previous_record_dirs(prev_run: Path) -> Dict[str, Path]:
+    """Map dataset title -> record directory in a previous run (by its manifest; record id = sanitized title otherwise)."""
+    try:
+        manifest = RunManifest.load(prev_run)
+    except FileNotFoundError:
+        return {}
+    return {r["title"]: prev_run / r["recordId"] for r in manifest.records}
+
+
+class _OrderedProgress:
+    """Thread-safe progress printer.
+
+    "Starting" lines are printed as workers pick records up (FIFO, so already in order);
+    "Finished" lines are buffered and released strictly in dataset order.
+    """
+
+    def __init__(self, total: int, indices: List[int] | None = None):
+        self.total = total
+        self._lock = threading.Lock()
+        self._pending: Dict[int, str | None] = {}
+        self._order = list(indices) if indices is not None else list(range(1, total + 1))
+        self._pos = 0
+
+    def started(self, idx: int, title: str, rid: str):
+        with self._lock:
+            print(f"[record {idx}/{self.total}] Starting: title='{title}' id='{rid}' at {_now_iso()}", flush=True)
+
+    def dropped(self, idx: int):
+        """``idx`` will never finish (early stop); stop waiting for it."""
+        with self._lock:
+            self._pending[idx] = None
+            self._flush()
+
+    def finished(self, idx: int, rid: str, result: Dict[str, Any]):
+        if "error" in result:
+            status = f"ERROR: {result['error']['error']}"
+        elif result.get("skipped"):
+            status = "skipped (score.json present)"
+        else:
+            status = f"overall={result['entry'].get('overall')}"
+        with self._lock:
+            self._pending[idx] = f"[record {idx}/{self.total}] Finished: id='{rid}' {status}"
+            self._flush()
+
+    def _flush(self):
+        while self._pos < len(self._order) and self._order[self._pos] in self._pending:
+            line = self._pending.pop(self._order[self._pos])
+            if line is not None:
+                print(line, flush=True)
+            self._pos += 1
+
+
+def _run_batch_mode(run_dir: Path, todo: List[tuple[int, str, str, Callable[[], List[Dict[str, Any]] | None]]], *, mcp_endpoint: str, model: str, skip_existing: bool, workers: int, backend_kind: str, batch_root: str | None, poll_sec: float, judge_mode: str = 'classic', local_runner: str = 'inline') -> Dict[int, Dict[str, Any]]:
+    """Batch API mode: steps 3, 4 and 5 of every record are each submitted as one batch (one fused batch with judge_mode='fused')."""
+    results: Dict[int, Dict[str, Any]] = {}
+    items = []
+    for idx, rid, raw, load_expected in todo:
+        out_dir = run_dir / rid
         if skip_existing and (out_dir / 'score.json').exists():
-            try:
-                score = json.loads((out_dir / 'score.json').read_text(encoding='utf-8'))
-                per.append({
-                    "recordId": rid,
-                    "overall": score.get("overall"),
-                    "dimensionScores": score.get("dimensionScores", {}),
-                    "componentTypes": score.get("rendered", {}).get("componentTypes", []) if 'rendered' in score else [],
-                    "intendedInferredComponents": score.get("intended", {}).get("summary", {}).get("inferredComponents", [])
-                })
+            existing = _existing_score(out_dir, rid)
+            if existing:
+                results[idx] = existing
                 continue
-            except Exception:
-                pass
-        # Build synthetic record json for the single-record processor
-        out_dir.mkdir(parents=True, exist_ok=True)
-        record_path = out_dir / 'record.json'
-        record_path.write_text(json.dumps({"id": rid, "ui_description": raw}, indent=2), encoding='utf-8')
         try:
-            summary = process_single_record(
-                record_path=record_path,
-                out_dir=out_dir,
-                ui_key='ui_description',
-                mcp_endpoint=mcp_endpoint,
-                model=model,
-            )
-            score_file = out_dir / 'score.json'
-            if score_file.exists():
-                score = json.loads(score_file.read_text(encoding='utf-8'))
-                per.append({
-                    "recordId": summary["recordId"],
-                    "overall": score.get("overall"),
-                    "dimensionScores": score.get("dimensionScores", {}),
-                    "componentTypes": summary.get("componentTypes", []),
-                    "intendedInferredComponents": summary.get("intendedInferredComponents", [])
-                })
-            else:
-                errors.append({"recordId": rid, "error": "score.json missing"})
+            items.append((idx, _write_record_stub(out_dir, rid, raw, load_expected()), out_dir))
         except Exception as e:
-            errors.append({"recordId": rid, "error": str(e)})
-    agg = aggregate_scores(per)
+            results[idx] = {"error": {"recordId": rid, "error": str(e)}}
+    print(f"[batch] {len(items)} records via '{backend_kind}' backend", flush=True)
+    backend = make_backend(backend_kind, run_dir=run_dir, local_root=batch_root, workers=workers, local_runner=local_runner)
+    outcomes = process_records_batch(items, ui_key='ui_description', mcp_endpoint=mcp_endpoint, model=model,
+                                     backend=backend, work_dir=run_dir / 'batch', workers=workers, poll_interval=poll_sec,
+                                     judge_mode=judge_mode)
+    rids = {idx: rid for idx, rid, _, _ in todo}
+    for idx, outcome in outcomes.items():
+        if "error" in outcome:
+            results[idx] = {"error": {"recordId": rids[idx], "error": outcome["error"]}}
+            continue
+        try:
+            score = json.loads((run_dir / rids[idx] / 'score.json').read_text(encoding='utf-8'))
+            results[idx] = {"entry": _score_entry(outcome["summary"]["recordId"], score, outcome["summary"])}
+        except Exception as e:
+            results[idx] = {"error": {"recordId": rids[idx], "error": str(e)}}
+    return results
+
+
+def _write_text_atomic(path: Path, text: str):
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _stratified_order(todo: List[tuple[int, str, str]], sizes: Dict[str, int], *, seed: int = 0, strata: int = 4) -> List[tuple[int, str, str]]:
+    """Seeded random order in which every prefix is spread evenly over description-size strata.
+
+    Records are split into ``strata`` equal groups by description size (a proxy for UI
+    complexity), shuffled within each group, then taken round-robin across groups.
+    """
+    by_size = sorted(todo, key=lambda r: (sizes.get(r[1], 0), r[0]))
+    n = max(1, min(strata, len(by_size)))
+    groups = [by_size[i * len(by_size) // n:(i + 1) * len(by_size) // n] for i in range(n)]
+    rng = random.Random(seed)
+    for g in groups:
+        rng.shuffle(g)
+    order: List[tuple[int, str, str]] = []
+    for i in range(max((len(g) for g in groups), default=0)):
+        order.extend(g[i] for g in groups if i < len(g))
+    return order
+
+
+class _EarlyStop:
+    """Stops scheduling records once the online overall CI95 (and optionally every dimension's) is <= target.
+
+    A CI of 0 (every score so far identical) never stops the run: with a handful of
+    records that says more about the sample than about the dataset.
+    """
+
+    def __init__(self, target_ci: float, *, dimensions: bool = False, min_records: int = 10):
+        self.target_ci = target_ci
+        self.dimensions = dimensions
+        self.min_records = max(2, min_records)
+        self.stopped = threading.Event()
+        self.records_needed: int | None = None
+        self._lock = threading.Lock()
+
+    def check(self, journal: ResultsJournal) -> None:
+        with self._lock:
+            if self.stopped.is_set():
+                return
+            # Workers keep adding to the aggregate: read count and CIs in one go under the journal lock.
+            count, cis = journal.ci95s(self.dimensions)
+            if count < self.min_records:
+                return
+            if all(ci is not None and 0 < ci <= self.target_ci for ci in cis):
+                self.records_needed = count
+                self.stopped.set()
+                print(f"[early-stop] CI95 <= {self.target_ci} after {count} records; no new records will be scheduled", flush=True)
+
+    def to_dict(self, journal: ResultsJournal | JournalState) -> Dict[str, Any]:
+        agg = journal.aggregate
+        ci = agg.ci95()
+        return {
+            "targetCI": self.target_ci,
+            "dimensions": self.dimensions,
+            "minRecords": self.min_records,
+            "stopped": self.stopped.is_set(),
+            "recordsNeeded": self.records_needed,
+            "overallCI95": round(ci, 3) if ci is not None else None,
+            **({"dimensionCI95": {d: round(c, 3) if (c := agg.ci95(d)) is not None else None for d in agg.dimensions}} if self.dimensions else {}),
+        }
+
+
+def _write_run_summary(run_dir: Path, journal: ResultsJournal | JournalState, total: int, *, complete: bool, early_stop: _EarlyStop | None = None) -> Dict[str, Any]:
+    """Write run_summary.json + summary.md from the journal's online aggregate (partial while running)."""
+    agg = journal.aggregate.to_dict()
     run_summary = {
         "runDir": str(run_dir),
         "timestamp": _now_iso(),
-        "recordsProcessed": len(per),
-        "errors": errors,
+        "complete": complete,
+        "recordsTotal": total,
+        "recordsFinished": journal.finished,
+        "recordsProcessed": journal.aggregate.count,
+        "errorCount": journal.error_count,
+        "errors": journal.errors(),
         "aggregate": agg,
+        # stepLatencyMs (p50/p95/p99 per step) and usage (tokens, estimated cost) when known
+        **journal.perf.to_dict(),
     }
-    (run_dir / 'run_summary.json').write_text(json.dumps(run_summary, indent=2), encoding='utf-8')
-    write_summary_md(run_dir, agg, per)
+    early = early_stop.to_dict(journal) if early_stop is not None else None
+    if early:
+        run_summary["earlyStop"] = early
+    if journal.autoscore.count:
+        run_summary["autoscore"] = journal.autoscore.to_dict()
+    calibration = journal.agreement.to_dict() if journal.agreement.count else None
+    if calibration:
+        run_summary["calibration"] = calibration
+    stats = cache_stats()
+    if stats:
+        run_summary["aoaiCache"] = stats
+    stats = mcp_cache_stats()
+    if stats:
+        run_summary["mcpCache"] = stats
+    stats = mcp_client_stats()
+    if stats:
+        run_summary["mcpClient"] = stats
+    stats = mcp_batch_stats()
+    if stats:
+        run_summary["mcpBatch"] = stats
+    stats = scheduler_stats()
+    if stats:
+        run_summary["aoaiRate"] = stats
+    stats = router_stats()
+    if stats:
+        run_summary["aoaiRoutes"] = stats
+    stats = hedge_stats()
+    if stats:
+        run_summary["aoaiHedge"] = stats
+    _write_text_atomic(run_dir / 'run_summary.json', json.dumps(run_summary, indent=2))
+    write_summary_md(run_dir, agg, journal.preview(), calibration, early)
     return run_summary
 
 
+def _status(result: Dict[str, Any]) -> str:
+    if "error" in result:
+        return "error"
+    return "skipped" if result.get("skipped") else "ok"
+
+
+def _open_resumed_run(run_dir: Path, dataset_dir: Path | None, prompt_hashes: Dict[str, str]):
+    """Load the manifest of ``run_dir`` and the dataset it was started from; report drift."""
+    manifest = RunManifest.load(run_dir)
+    dataset_dir = dataset_dir or Path(manifest.data["datasetDir"])
+    print(f"[resume] Resuming {run_dir} (started {manifest.data['createdAt']}, {len(manifest.records)} records)")
+    print(f"[dataset] Loading from: {dataset_dir}")
+    handles = {h.title: h for h in iter_dataset(dataset_dir)}
+    changed = set()
+    for r in manifest.records:
+        h = handles.get(r["title"])
+        if h is not None and h.content_hash != r["descriptionHash"]:
+            changed.add(r["idx"])
+            r["descriptionHash"] = h.content_hash
+    if changed:
+        print(f"[resume] Dataset changed since the run started: {len(changed)} record(s) will be re-run from scratch")
+        manifest.data["datasetHash"] = dataset_hash((r["title"], r["descriptionHash"]) for r in manifest.records)
+    stale = [k for k, h in prompt_hashes.items() if manifest.data.get("promptHashes", {}).get(k) != h]
+    if stale:
+        print(f"[resume] Prompt template(s) changed: {', '.join(stale)}; steps built from the old templates will be re-run")
+        manifest.data["promptHashes"] = prompt_hashes
+    return manifest, handles, changed
+
+
+def run_dataset(run_root: Path, *, mcp_endpoint: str | None, limit: int | None, filter_sub: str | None, model: str, id_prefix: str | None, skip_existing: bool, workers: int = 1, llm_mode: str = 'online', batch_backend: str = 'azure', batch_root: str | None = None, batch_poll_sec: float = 10.0, batch_local_runner: str = 'inline', dataset_dir: Path | None = None, snapshot_every: int = 25, resume_dir: Path | None = None, shard: str | None = None, judge_mode: str = 'classic', calibration_sample: int = 20, target_ci: float | None = None, ci_dimensions: bool = False, min_records: int = 10, order_seed: int = 0, incremental_from: Path | None = None, history: bool | None = None, mcp_batch: int | None = None) -> Dict[str, Any]:
+    prompt_hashes = {name: text_hash(text) for name, text in read_prompts().items()}
+    changed: set = set()
+    if resume_dir is not None:
+        run_dir = Path(resume_dir)
+        manifest, handles, changed = _open_resumed_run(run_dir, dataset_dir, prompt_hashes)
+        config = manifest.data["config"]
+        mcp_endpoint = mcp_endpoint or config["mcpEndpoint"]
+        model = config["model"]
+        judge_mode = config.get("judgeMode", "classic")
+        calibration_sample = config.get("calibrationSample") or 0
+        early = config.get("earlyStop") or {}
+        target_ci, ci_dimensions = early.get("targetCI"), early.get("dimensions", False)
+        min_records, order_seed = early.get("minRecords", min_records), early.get("orderSeed", order_seed)
+        incremental_from = Path(config["incrementalFrom"]) if config.get("incrementalFrom") else None
+        configure_artifact_store(config.get("artifactStore") or "files")
+        if config.get("autoscoreGate"):
+            configure_gate(config["autoscoreGate"])
+        if config.get("renderedExtractor"):
+            configure_rendered_extractor(config["renderedExtractor"])
+        if config.get("llmMode") and config["llmMode"] != llm_mode:
+            print(f"[resume] Run was started with --llm-mode {config['llmMode']}; continuing in that mode")
+            llm_mode = config["llmMode"]
+        if config.get("compaction"):
+            configure_compaction(enabled=config["compaction"]["enabled"], budget=config["compaction"]["budget"])
+        skip_existing = True
+    else:
+        print(f"[dataset] Loading from: {dataset_dir or resolve_dataset_dir()}")
+        shard_spec = parse_shard(shard)
+        handles = {h.title: h for h in iter_dataset(dataset_dir, shard=shard_spec)}
+        if shard_spec:
+            print(f"[dataset] Shard {shard}: {len(handles)} entries")
+        else:
+            print(f"[dataset] Indexed {len(handles)} entries")
+        titles = list(handles.keys())
+        if filter_sub:
+            titles = [t for t in titles if filter_sub.lower() in t.lower()]
+            print(f"[dataset] Filtered to {len(titles)} entries matching '{filter_sub}'")
+        if limit is not None:
+            titles = titles[:limit]
+            print(f"[dataset] Limited to {len(titles)} entries")
+        run_dir = ensure_run_dir(run_root)
+        records = []
+        for idx, title in enumerate(titles, 1):
+            rid_base = sanitize_id(title)
+            records.append({"idx": idx, "title": title, "recordId": f"{id_prefix}{rid_base}" if id_prefix else rid_base,
+                            "descriptionHash": handles[title].content_hash})
+        manifest = RunManifest.create(
+            run_dir,
+            dataset_dir=dataset_dir or resolve_dataset_dir(),
+            records=records,
+            prompt_hashes=prompt_hashes,
+            config={"model": model, "mcpEndpoint": mcp_endpoint, "idPrefix": id_prefix, "filter": filter_sub, "limit": limit, "llmMode": llm_mode, "shard": shard,
+                    "compaction": compaction_settings(), "judgeMode": judge_mode, "autoscoreGate": gate_mode(), "renderedExtractor": rendered_extractor_mode(),
+                    "artifactStore": artifact_store_mode(),
+                    "calibrationSample": calibration_sample if judge_mode == 'calibrate' else None,
+                    "earlyStop": {"targetCI": target_ci, "dimensions": ci_dimensions, "minRecords": min_records, "orderSeed": order_seed} if target_ci else None,
+                    "incrementalFrom": str(incremental_from) if incremental_from else None},
+        )
+    workers = max(1, int(workers or 1))
+    configure_mcp_client(pool_size=workers)
+    if workers > 1:
+        print(f"[dataset] Running with {workers} workers")
+    total = len(manifest.records)
+    previous_dirs: Dict[str, Path] = {}
+    previous_store = None
+    if incremental_from is not None:
+        previous_dirs = _previous_record_dirs(incremental_from)
+        previous_store = ArtifactStore.open_run(incremental_from)
+        print(f"[incremental] Reusing unchanged step artifacts from {incremental_from}")
+    store = ArtifactStore.open_run(run_dir, create=True) if artifact_store_mode() == 'packed' else None
+    early_stop = _EarlyStop(target_ci, dimensions=ci_dimensions, min_records=min_records) if target_ci else None
+
+    def snapshot(j: JournalState):
+        manifest.save()
+        _write_run_summary(run_dir, j, total, complete=False, early_stop=early_stop)
+
+    journal = ResultsJournal(run_dir / 'results.jsonl', snapshot_every=snapshot_every, on_snapshot=snapshot)
+    todo = []
+    if resume_dir is not None:
+        previous = journal.restore(exclude=changed)
+        for r in manifest.records:
+            idx, title, rid = r["idx"], r["title"], r["recordId"]
+            if idx in changed:
+                if previous.get(idx, {}).get("status") in ("ok", "skipped"):
+                    journal.invalidate(idx, rid, "description changed")
+                (run_dir / rid / 'score.json').unlink(missing_ok=True)
+            elif previous.get(idx, {}).get("status") in ("ok", "skipped"):
+                manifest.set_status(idx, previous[idx]["status"])
+                continue
+            if title not in handles:
+                result = {"error": {"recordId": rid, "error": "record no longer in dataset"}}
+                journal.record(idx, rid, result)
+                manifest.set_status(idx, "error")
+                continue
+            todo.append((idx, title, rid))
+        print(f"[resume] {total - len(todo)} record(s) already finished, {len(todo)} to run")
+    else:
+        todo = [(r["idx"], r["title"], r["recordId"]) for r in manifest.records]
+
+    if early_stop is not None:
+        # Stratified random order so the records run before the CI is reached are representative.
+        todo = _stratified_order(todo, {title: h.size for title, h in handles.items()}, seed=order_seed)
+        print(f"[early-stop] Target CI95 {target_ci}{' (overall and every dimension)' if ci_dimensions else ''}; stratified random order (seed {order_seed})")
+        early_stop.check(journal)
+    progress = _OrderedProgress(total, [idx for idx, _, _ in todo])
+
+    # Calibration runs fused next to classic on a fixed random sample (seeded, so a resumed
+    # run picks the same records); the rest of the run is judged classic only.
+    calibrate: set = set()
+    if judge_mode == 'calibrate':
+        all_idx = [r["idx"] for r in manifest.records]
+        calibrate = set(all_idx) if not calibration_sample or calibration_sample >= total else set(random.Random(0).sample(all_idx, calibration_sample))
+        print(f"[calibrate] Running classic and fused judging side by side on {len(calibrate)} record(s)")
+
+    # --mcp-batch: step 2 of the records that will call MCP is fetched ahead of the workers,
+    # one /mcp/tools/call-batch request per chunk (in processing order).
+    mcp_batch = MCP_BATCH_SIZE if mcp_batch is None else mcp_batch
+    prefetcher = configure_mcp_batch(mcp_endpoint, mcp_batch) if mcp_batch > 0 and todo else None
+    if prefetcher is not None:
+        def needs_mcp(idx: int, title: str, rid: str) -> bool:
+            out_dir = run_dir / rid
+            if skip_existing and (out_dir / 'score.json').exists():
+                return False
+            previous = previous_dirs.get(title, incremental_from / rid) if incremental_from is not None else None
+            if previous is not None and not previous.is_dir():
+                return False  # packed previous run: unpacked (and possibly reused) only when the record runs
+            return mcp_call_needed(handles[title].read_text(), mcp_endpoint, out_dir=out_dir,
+                                   resume=resume_dir is not None and idx not in changed, incremental_from=previous)
+        queued = prefetch_agent_outputs([handles[title].read_text() for idx, title, rid in todo if needs_mcp(idx, title, rid)])
+        print(f"[mcp-batch] Prefetching step 2 for {queued} record(s), {mcp_batch} per /mcp/tools/call-batch request")
+
+    def record_mode(idx: int) -> str:
+        if judge_mode == 'calibrate':
+            return 'calibrate' if idx in calibrate else 'classic'
+        return judge_mode
+
+    def work(idx: int, title: str, rid: str) -> None:
+        if early_stop is not None and early_stop.stopped.is_set():
+            progress.dropped(idx)
+            return
+        progress.started(idx, title, rid)
+        previous = previous_dirs.get(title, incremental_from / rid) if incremental_from is not None else None
+        unpacked = None
+        if previous is not None and previous_store is not None and not previous.is_dir():
+            # Previous run is packed: unpack just this record next to the new one.
+            unpacked = run_dir / '.incremental'
+            previous_store.export(unpacked, [previous.name])
+            previous = unpacked / previous.name
+        try:
+            result = _run_record(run_dir, rid, handles[title].read_text(), mcp_endpoint=mcp_endpoint, model=model, skip_existing=skip_existing,
+                                 resume=resume_dir is not None and idx not in changed, judge_mode=record_mode(idx),
+                                 load_expected=handles[title].read_expected, incremental_from=previous)
+        finally:
+            if unpacked is not None:
+                shutil.rmtree(previous, ignore_errors=True)
+        if store is not None and "entry" in result:
+            store.pack_dir(rid, run_dir / rid)
+        journal.record(idx, rid, result)
+        manifest.set_status(idx, _status(result))
+        progress.finished(idx, rid, result)
+        if early_stop is not None:
+            early_stop.check(journal)
+            if prefetcher is not None and early_stop.stopped.is_set():
+                prefetcher.stop()  # no new records will be scheduled
+
+    try:
+        if llm_mode == 'batch':
+            results = _run_batch_mode(run_dir, [(idx, rid, handles[title].read_text(), handles[title].read_expected) for idx, title, rid in todo], mcp_endpoint=mcp_endpoint, model=model,
+                                      skip_existing=skip_existing, workers=workers, backend_kind=batch_backend, batch_root=batch_root, poll_sec=batch_poll_sec, local_runner=batch_local_runner,
+                                      judge_mode=judge_mode)
+            for idx, _, rid in todo:
+                if store is not None and "entry" in results[idx]:
+                    store.pack_dir(rid, run_dir / rid)
+                journal.record(idx, rid, results[idx])
+                manifest.set_status(idx, _status(results[idx]))
+                progress.finished(idx, rid, results[idx])
+        elif workers == 1:
+            for idx, title, rid in todo:
+                work(idx, title, rid)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="record")
+            try:
+                futures = [pool.submit(work, idx, title, rid) for idx, title, rid in todo]
+                for fut in as_completed(futures):
+                    # SystemExit from judge.py (e.g. MCP unreachable) still aborts the whole run.
+                    fut.result()
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()  # stays registered until the final summary has its stats
+        journal.close()
+        manifest.save()
+        for s in (store, previous_store):
+            if s is not None:
+                s.close()
+        shutil.rmtree(run_dir / '.incremental', ignore_errors=True)
+
+    # Aggregates come from the journal (online, dataset-order independent), so memory
+    # stays constant and a partial summary is already on disk if the run dies midway.
+    summary = _write_run_summary(run_dir, journal, total, complete=True, early_stop=early_stop)
+    configure_mcp_batch()
+    hedge = summary.get("aoaiHedge")
+    if hedge and hedge.get("calls"):
+        print(f"[hedge] {hedge.get('hedged', 0)} of {hedge['calls']} LLM call(s) hedged ({hedge['hedgeRate']:.1%}); "
+              f"copy won {hedge.get('hedgeWins', 0)}, primary won {hedge.get('primaryWins', 0)}; "
+              f"{hedge.get('skippedBudget', 0)} skipped at the spend cap, ~{hedge.get('extraTokens', 0)} extra token(s)")
+    if history_enabled() if history is None else history:
+        try:
+            written = index_run(run_dir)
+            print(f"[history] Indexed {written or 0} record score(s) into the run history")
+        except Exception as e:  # the run itself succeeded; the index can be rebuilt with run_history ingest
+            print(f"WARNING: run history indexing failed: {e}", file=sys.stderr)
+    return summary
+
+
 def build_parser():
     p = argparse.ArgumentParser(description='Run multi-record judge pipeline (HTTP MCP only).')
     p.add_argument('--run-root', default='eval/runs', help='Root directory for new run.')
-    p.add_argument('--mcp-endpoint', required=True, help='MCP server HTTP endpoint (e.g. http://localhost:3001).')
+    p.add_argument('--mcp-endpoint', help='MCP server HTTP endpoint (e.g. http://localhost:3001); required unless resuming.')
+    p.add_argument('--dataset-dir', help='Dataset directory (default: <workspace>/portal-uxagent-dataset/UI Descriptions).')
     p.add_argument('--limit', type=int, help='Limit number of records.')
+    p.add_argument('--shard', metavar='I/N', help='Process only shard I of N (0-based, stable title hash); combine shard runs with merge_shard_runs.py.')
     p.add_argument('--filter', help='Substring filter applied to titles.')
     p.add_argument('--model', default='stub-model', help='Model label recorded in metadata.')
     p.add_argument('--id-prefix', help='Optional prefix for record ids.')
-    p.add_argument('--skip-existing', action='store_true', help='Skip record if score.json already present.')
+    p.add_argument('--resume', metavar='RUN_DIR', help='Resume an interrupted run in place: run only unfinished/failed records, re-running only their missing steps (with the run\'s recorded model, LLM/judge mode, gate, extractor and compaction settings).')
+    p.add_argument('--skip-existing', action='store_true', help='Resume the latest run under --run-root (if any) instead of starting a new one.')
+    p.add_argument('--workers', type=int, default=1, help='Number of records processed concurrently (default: 1).')
+    p.add_argument('--cache-mode', choices=CACHE_MODES, help='AOAI response cache mode: off|read|readwrite|replay-only (default: AOAI_CACHE_MODE or off).')
+    p.add_argument('--llm-mode', choices=['online', 'batch'], default='online', help='online: per-record chat calls; batch: one Batch API job per LLM step for the whole run.')
+    p.add_argument('--batch-backend', choices=BATCH_BACKENDS, default='azure', help='Batch backend for --llm-mode batch (local = file-based offline stand-in).')
+    p.add_argument('--batch-root', help='Directory for the local batch backend (default: <run_dir>/batch/local-server).')
+    p.add_argument('--batch-local-runner', choices=LOCAL_RUNNERS, default='inline', help='Local batch backend: inline = execute batches in this process; serve = leave them to `python -m eval.pipeline.batch_mode serve --root <--batch-root>`.')
+    p.add_argument('--batch-poll-sec', type=float, default=10.0, help='Batch status polling interval in seconds.')
+    p.add_argument('--aoai-routes', metavar='JSON_OR_FILE', help='Spread LLM calls over several endpoints/deployments, weighted by remaining quota and latency (see aoai_router.py) (default: AOAI_ROUTES or AZURE_OPENAI_ENDPOINT only).')
+    p.add_argument('--aoai-hedge', choices=HEDGE_MODES, help='on: re-send an LLM call still unanswered after its step\'s recent p90 latency; the first response wins (see aoai_hedging.py) (default: AOAI_HEDGE or off).')
+    p.add_argument('--snapshot-every', type=int, default=25, help='Refresh run_summary.json/summary.md every N finished records (0: time-based only).')
+    p.add_argument('--mcp-batch', type=int, metavar='N', help='Fetch step 2 for N records per POST /mcp/tools/call-batch request, ahead of the workers; 0 = one request per record (default: MCP_BATCH_SIZE or 0).')
+    p.add_argument('--mcp-cache', choices=MCP_CACHE_MODES, help='MCP output cache: off|write|reuse; reuse skips step 2 for cached descriptions (default: MCP_CACHE_MODE or off).')
+    p.add_argument('--judge-mode', choices=JUDGE_MODES, default='classic', help='classic: steps 3-5 as three LLM calls; fused: one call per record; calibrate: classic plus fused on a sample, reporting agreement.')
+    p.add_argument('--calibration-sample', type=int, default=20, help='Records judged both ways with --judge-mode calibrate (0 = all).')
+    p.add_argument('--rendered-extractor', choices=EXTRACTOR_MODES, help='Step 4: llm, or local = derive the rendered interpretation from the MCP payload (LLM only if unparseable) (default: RENDERED_EXTRACTOR or llm).')
+    p.add_argument('--autoscore-gate', choices=GATE_MODES, help='Gate the LLM judge on autoscore (records with expected.json): off|cap|skip (default: AUTOSCORE_GATE or cap).')
+    p.add_argument('--artifact-store', choices=ARTIFACT_STORE_MODES, help='files: one directory per record; packed: pack finished records into <run>/artifacts.sqlite (default: ARTIFACT_STORE or files)')
+    p.add_argument('--history', choices=['on', 'off'], help='Index the finished run into <run-root>/history.sqlite for cross-run queries (default: RUN_HISTORY or on)')
+    p.add_argument('--incremental-from', metavar='RUN_DIR', help='Previous run to reuse from: every step whose input fingerprint (description, agent output, prompt template, deployment, api-version) is unchanged is linked instead of re-run.')
+    p.add_argument('--target-ci', type=float, help='Stop scheduling new records once the overall-score CI95 half-width is <= this (records run in stratified random order).')
+    p.add_argument('--ci-dimensions', action='store_true', help='With --target-ci, also require every dimension\'s CI95 to reach the target.')
+    p.add_argument('--min-records', type=int, default=10, help='With --target-ci, never stop before this many records have finished (default: 10).')
+    p.add_argument('--order-seed', type=int, default=0, help='Seed for the stratified random record order used with --target-ci.')
+    p.add_argument('--compaction', choices=['on', 'off'], help='Compact LLM step inputs: minify JSON, dedupe repeated props, trim to --prompt-budget (default: PROMPT_COMPACTION or on).')
+    p.add_argument('--prompt-budget', type=int, help='Max estimated tokens per prompt input; 0 = no trimming (default: PROMPT_TOKEN_BUDGET or 6000).')
     return p
 
 
@@ -187,6 +664,51 @@ def main(argv=None):
     args = ap.parse_args(argv)
     run_root = Path(args.run_root)
     run_root.mkdir(parents=True, exist_ok=True)
+    if args.cache_mode:
+        configure_cache(args.cache_mode)
+    if args.aoai_routes:
+        try:
+            configure_routes(args.aoai_routes)
+        except (OSError, ValueError) as e:
+            ap.error(f'--aoai-routes: {e}')
+    if args.aoai_hedge:
+        configure_hedging(args.aoai_hedge)
+    if args.mcp_cache:
+        configure_mcp_cache(args.mcp_cache)
+    configure_compaction(enabled=None if args.compaction is None else args.compaction == 'on', budget=args.prompt_budget)
+    if args.autoscore_gate:
+        configure_gate(args.autoscore_gate)
+    if args.rendered_extractor:
+        configure_rendered_extractor(args.rendered_extractor)
+    if args.artifact_store:
+        configure_artifact_store(args.artifact_store)
+    resume_dir = Path(args.resume) if args.resume else None
+    if resume_dir is None and args.skip_existing:
+        resume_dir = find_latest_run(run_root)
+        if resume_dir is not None:
+            print(f"[resume] --skip-existing: continuing latest run {resume_dir}")
+    if args.shard:
+        try:
+            parse_shard(args.shard)
+        except ValueError as e:
+            ap.error(str(e))
+    incremental_from = Path(args.incremental_from) if args.incremental_from else None
+    if incremental_from is not None and not incremental_from.is_dir():
+        ap.error(f'--incremental-from: {incremental_from} is not a directory')
+    if incremental_from is not None and args.llm_mode == 'batch':
+        ap.error('--incremental-from requires --llm-mode online')
+    if args.target_ci is not None and args.llm_mode == 'batch':
+        ap.error('--target-ci requires --llm-mode online (batch mode submits every record at once)')
+    if args.target_ci is not None and args.target_ci <= 0:
+        ap.error('--target-ci must be > 0')
+    if args.mcp_batch is not None and args.mcp_batch < 0:
+        ap.error('--mcp-batch must be >= 0')
+    if args.batch_local_runner == 'serve' and not args.batch_root:
+        ap.error('--batch-local-runner serve needs --batch-root (the root the serve process watches)')
+    if args.judge_mode == 'calibrate' and args.llm_mode == 'batch':
+        ap.error('--judge-mode calibrate requires --llm-mode online')
+    if resume_dir is None and not args.mcp_endpoint:
+        ap.error('--mcp-endpoint is required unless resuming a run')
     summary = run_dataset(
         run_root=run_root,
         mcp_endpoint=args.mcp_endpoint,
@@ -195,10 +717,29 @@ def main(argv=None):
         model=args.model,
         id_prefix=args.id_prefix,
         skip_existing=args.skip_existing,
+        workers=args.workers,
+        llm_mode=args.llm_mode,
+        batch_backend=args.batch_backend,
+        batch_root=args.batch_root,
+        batch_local_runner=args.batch_local_runner,
+        batch_poll_sec=args.batch_poll_sec,
+        dataset_dir=Path(args.dataset_dir) if args.dataset_dir else None,
+        snapshot_every=args.snapshot_every,
+        resume_dir=resume_dir,
+        shard=args.shard,
+        judge_mode=args.judge_mode,
+        calibration_sample=args.calibration_sample,
+        target_ci=args.target_ci,
+        ci_dimensions=args.ci_dimensions,
+        min_records=args.min_records,
+        order_seed=args.order_seed,
+        incremental_from=incremental_from,
+        history=None if args.history is None else args.history == 'on',
+        mcp_batch=args.mcp_batch,
     )
     print(json.dumps(summary, indent=2))
-    if summary.get('errors'):
-        print(f"Completed with {len(summary['errors'])} errors.")
+    if summary.get('errorCount'):
+        print(f"Completed with {summary['errorCount']} errors.")
     return 0
 
 
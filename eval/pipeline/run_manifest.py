@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Run manifest (``<run_dir>/run_manifest.json``) used to resume an interrupted run in place.
+
+Captures what the run was started with so a restart can verify it is continuing the
+same work:
+
+    {
+      "version": 1,
+      "createdAt": "...", "updatedAt": "...",
+      "datasetDir": "...", "datasetHash": "<sha256 over (title, description hash) pairs>",
+      "promptHashes": {"intended": "...", "rendered": "...", "judge": "..."},
+      "config": {"model": "...", "mcpEndpoint": "...", "idPrefix": null, "filter": null, "limit": null, "llmMode": "online"},
+      "records": [{"idx": 1, "title": "...", "recordId": "...", "descriptionHash": "...", "status": "pending|ok|skipped|error"}]
+    }
+
+Record status is authoritative in results.jsonl (crash-safe, appended per record); the
+manifest copy is refreshed with every summary snapshot and at the end of the run.
+"""
+from __future__ import annotations
+import os
+import json
+import hashlib
+import datetime
+import threading
+import typing as t
+from pathlib import Path
+
+MANIFEST_NAME = "run_manifest.json"
+MANIFEST_VERSION = 1
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def dataset_hash(description_hashes: t.Iterable[tuple[str, str]]) -> str:
+    """Order-independent snapshot hash of ``(title, description_hash)`` pairs."""
+    h = hashlib.sha256()
+    for title, dh in sorted(description_hashes):
+        h.update(title.encode("utf-8"))
+        h.update(b"\0")
+        h.update(dh.encode("ascii"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+class RunManifest:
+    """In-memory manifest with thread-safe status updates and atomic saves."""
+
+    def __init__(self, run_dir: Path, data: dict[str,t.Any]):
+        self.run_dir = Path(run_dir)
+        self.data = data
+        self._by_idx = {r["idx"]: r for r in data["records"]}
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self.run_dir / MANIFEST_NAME
+
+    @property
+    def records(self) -> list[dict[str,t.Any]]:
+        return self.data["records"]
+
+    @classmethod
+    def create(
+        cls,
+        run_dir: Path,
+        *,
+        dataset_dir: Path,
+        records: list[dict[str,t.Any]],
+        prompt_hashes: dict[str,str],
+        config: dict[str,t.Any]
+    ) -> "RunManifest":
+        now = _now_iso()
+        data = {
+            "version": MANIFEST_VERSION,
+            "createdAt": now,
+            "updatedAt": now,
+            "datasetDir": str(dataset_dir),
+            "datasetHash": dataset_hash((r["title"], r["descriptionHash"]) for r in records),
+            "promptHashes": prompt_hashes,
+            "config": config,
+            "records": [{**r, "status": r.get("status", "pending")} for r in records],
+        }
+        manifest = cls(run_dir, data)
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, run_dir: Path) -> "RunManifest":
+        path = Path(run_dir) / MANIFEST_NAME
+        if not path.exists():
+            raise FileNotFoundError(f"No {MANIFEST_NAME} in {run_dir} (runs started before manifests existed cannot be resumed)")
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported manifest version {data.get('version')} in {path}")
+        return cls(run_dir, data)
+
+    def set_status(self, idx: int, status: str) -> None:
+        with self._lock:
+            if idx in self._by_idx:
+                self._by_idx[idx]["status"] = status
+
+    def counts(self) -> dict[str,int]:
+        with self._lock:
+            out: dict[str,int] = {}
+            for r in self.records:
+                out[r["status"]] = out.get(r["status"], 0) + 1
+            return out
+
+    def save(self) -> None:
+        with self._lock:
+            self.data["updatedAt"] = _now_iso()
+            payload = json.dumps(self.data, indent=2)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, self.path)
+
+def find_latest_run(run_root: Path) -> Path | None:
+    """Most recent run directory under ``run_root`` that has a manifest."""
+    if not run_root.exists():
+        return None
+    runs = sorted((d for d in run_root.iterdir() if (d / MANIFEST_NAME).exists()), key=lambda d: d.name)
+    return runs[-1] if runs else None
+
+def _now_iso() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Per-step input fingerprints for incremental re-evaluation (--incremental-from).
+
+Every record directory gets a ``fingerprints.json`` mapping each step that produced an
+artifact to a SHA-256 over exactly the inputs that determine that artifact:
+
+    mcp       description hash, MCP endpoint, MCP build id
+    autoscore agent-output hash, expected components, autoscore gate mode
+    intended  description hash                      + LLM inputs
+    rendered  agent-output hash                     + LLM inputs
+    judge     description, agent-output, intended and rendered hashes + LLM inputs
+    fused     description hash, agent-output hash   + LLM inputs
+
+LLM inputs are the prompt-template hash, the AOAI deployment and api-version (of every
+route with AOAI_ROUTES, see aoai_router.model_identity), and the prompt-compaction
+settings (they change the prompt actually sent). The autoscore step is local and always
+re-run; its fingerprint only records the gate policy (off / cap / skip) that decided the
+record's judge step and overall.
+
+An incremental run links (hard link, copy across filesystems) a step's artifacts from
+the previous run's record directory when its fingerprint is unchanged and runs the step
+otherwise. Because the judge fingerprint covers the intended/rendered outputs, editing
+e.g. ``judge_scoring.prompt.txt`` re-runs step 5 only, while a new MCP output re-runs
+steps 4 and 5 (and 3 is still reused).
+"""
+from __future__ import annotations
+import os
+import json
+import shutil
+import hashlib
+import typing as t
+from pathlib import Path
+
+from .tool_aoai import llm_identity
+from .prompt_compaction import compaction_settings
+
+FINGERPRINTS_FILE = "fingerprints.json"
+FINGERPRINT_VERSION = 1
+
+def content_hash(value: t.Any) -> str:
+    """SHA-256 of a string, or of the canonical JSON of any other value."""
+    text = value if isinstance(value, str) else json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def llm_inputs(template: str) -> dict[str,t.Any]:
+    """Fingerprint inputs shared by every LLM step."""
+    deployment, api_version = llm_identity()
+    return {
+        "template": content_hash(template),
+        "deployment": deployment,
+        "apiVersion": api_version,
+        "compaction": compaction_settings(),
+    }
+
+def step_fingerprint(step: str, **inputs: t.Any) -> str:
+    return content_hash({"version": FINGERPRINT_VERSION, "step": step, **inputs})
+
+def load_fingerprints(record_dir: Path) -> dict[str,str]:
+    try:
+        data = json.loads((Path(record_dir) / FINGERPRINTS_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != FINGERPRINT_VERSION:
+        return {}
+    return data.get("steps") or {}
+
+def save_fingerprints(record_dir: Path, steps: dict[str,str]) -> None:
+    (Path(record_dir) / FINGERPRINTS_FILE).write_text(
+        json.dumps({"version": FINGERPRINT_VERSION, "steps": dict(sorted(steps.items()))}, indent=2), encoding="utf-8")
+
+def link_artifacts(src_dir: Path, dst_dir: Path, names: t.Iterable[str], optional: t.Iterable[str] = ()) -> bool:
+    """Hard-link (or copy) ``names`` from ``src_dir`` into ``dst_dir``; False if a required one is missing."""
+    names, optional = list(names), set(optional)
+    if any(not (Path(src_dir) / n).is_file() for n in names if n not in optional):
+        return False
+    for name in names:
+        src, dst = Path(src_dir) / name, Path(dst_dir) / name
+        if not src.is_file():
+            continue
+        dst.unlink(missing_ok=True)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+    return True
@@ -3,16 +3,28 @@
 Azure OpenAI (AOAI) chat client utility for evaluation workflows.
 
 Mirrors logic in src/ux-architect-agent/llm-intent.ts (TypeScript):
- - Supports API key or AAD (DefaultAzureCredential) auth
- - Structured log events (prompt, request, response, parsed, error)
+ - Supports API key or AAD (DefaultAzureCredential) auth; AAD tokens are cached and
+   refreshed ahead of expiry by a background thread (aoai_credentials.py)
+ - Optional routing over several endpoints / deployments weighted by remaining quota
+   and recent latency, with unhealthy routes taken out of rotation (aoai_router.py)
+ - Optional request hedging: a call still unanswered after its step's recent p90 latency
+   is sent again and the first response wins, under a cap on the extra spend (aoai_hedging.py)
+ - Structured log events (prompt, request, response, parsed, error), written in batches
+   by a background thread with size-based rotation (prompt_log.py)
  - Enforces JSON-only response via response_format={"type":"json_object"}
- - Simple exponential backoff retries for transient failures (429, 5xx)
+ - Simple exponential backoff retries for transient failures (429, 5xx, timeouts),
+   honoring Retry-After and pacing all callers under the deployment's TPM/RPM quota
  - Returns parsed JSON from first choice's message.content
+ - Pooled HTTP/1.1 keep-alive connections shared by all callers (AOAIClient)
 
 Usage (library):
     from tool_aoai import aoai_chat
     result = aoai_chat(messages=[{"role":"system","content":"You are test."},{"role":"user","content":"Hello"}])
 
+    # asyncio callers share the same connection pool
+    from tool_aoai import aoai_chat_async
+    result = await aoai_chat_async(messages=[...])
+
 CLI:
     python eval/pipeline/tool_aoai.py --message "Build a KPI dashboard with active users and revenue"
 
@@ -23,11 +35,34 @@ Environment variables:
     AZURE_OPENAI_API_VERSION       (default: 2025-01-01-preview)
     AZURE_OPENAI_USE_AAD           (set to 1 to use AAD instead of API key)
     AZURE_OPENAI_SCOPE             (default: https://cognitiveservices.azure.com/.default)
+    AOAI_ROUTES                    (default: unset; JSON list / file of endpoints+deployments, see aoai_router.py)
+    AOAI_ROUTE_FAIL_THRESHOLD      (default: 3; consecutive faults that take a route out of rotation)
+    AOAI_ROUTE_COOLDOWN_S          (default: 30; first out-of-rotation period, doubling per ejection)
+    AOAI_TOKEN_REFRESH_MARGIN_S    (default: 300; refresh AAD tokens this long before expiry)
+    AOAI_HEDGE                     (default: off; on = hedge slow calls, see aoai_hedging.py for AOAI_HEDGE_*)
     AOAI_TIMEOUT_MS                (default: 30000)
     AOAI_RETRIES                   (default: 3)
     AOAI_RETRY_BASE_MS             (default: 500)
     AOAI_LOG_PROMPT                (default: 1 -> enable logging)
     AOAI_PROMPT_LOG_PATH           (default: logs/aoai-prompts.log)
+    AOAI_LOG_MAX_MB                (default: 50; rotate the prompt log beyond this size)
+    AOAI_LOG_BACKUPS               (default: 5; rotated segments kept)
+    AOAI_LOG_GZIP                  (default: 0; set to 1 to gzip rotated segments)
+    AOAI_LOG_FLUSH_MS              (default: 1000; max time a record stays buffered)
+    AOAI_POOL_SIZE                 (default: 8; max keep-alive connections per endpoint)
+    AOAI_MAX_IN_FLIGHT             (default: 256; max concurrent aoai_chat_async calls)
+    AOAI_CACHE_MODE                (default: off; off|read|readwrite|replay-only, see aoai_cache.py)
+    AOAI_CACHE_PATH                (default: .cache/aoai-cache.sqlite)
+    AOAI_CACHE_MAX_MB              (default: 512)
+    AOAI_CACHE_MAX_AGE_DAYS        (default: 30)
+    AOAI_TPM                       (default: 0 -> no tokens-per-minute pacing)
+    AOAI_RPM                       (default: 0 -> no requests-per-minute pacing)
+    AOAI_RATE_HEADROOM             (default: 0.9; fraction of quota the process may use)
+    AOAI_COMPLETION_TOKEN_ESTIMATE (default: 400; completion tokens reserved per call)
+    AOAI_PRICE_PROMPT_PER_1M       (default: 0; USD per 1M prompt tokens, for cost estimates)
+    AOAI_PRICE_COMPLETION_PER_1M   (default: 0; USD per 1M completion tokens)
+    AOAI_PRICE_CACHED_PER_1M       (default: AOAI_PRICE_PROMPT_PER_1M; USD per 1M cached prompt tokens)
+    AOAI_BATCH_PRICE_FACTOR        (default: 0.5; price multiplier for Batch API calls)
 
 Return: Parsed JSON from model's first choice content.
 Raises: RuntimeError / AOAIError on failure.
@@ -38,16 +73,29 @@ import sys
 import json
 import time
 import uuid
+import asyncio
+import functools
+import threading
 import typing as t
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 import datetime
 
+import requests
+
 try:
-    from azure.identity import DefaultAzureCredential  # type: ignore
-    _HAS_AAD = True
-except Exception:  # pragma: no cover
-    DefaultAzureCredential = object  # type: ignore
-    _HAS_AAD = False
+    from .aoai_cache import ResponseCache, CacheMiss, CACHE_MODES, cache_key
+    from .rate_limiter import RateScheduler, estimate_tokens
+    from .prompt_log import PromptLogWriter
+    from .aoai_router import AOAIRouter, Route, parse_routes, model_identity, AOAI_ROUTES
+    from .aoai_credentials import get_token_manager
+    from .aoai_hedging import HedgePolicy, CancelTicket, CancellableAdapter, RequestCancelled, HEDGE_MODES, AOAI_HEDGE
+except ImportError:  # executed as a script: python eval/pipeline/tool_aoai.py
+    from prompt_log import PromptLogWriter  # type: ignore
+    from aoai_router import AOAIRouter, Route, parse_routes, model_identity, AOAI_ROUTES  # type: ignore
+    from aoai_credentials import get_token_manager  # type: ignore
+    from aoai_hedging import HedgePolicy, CancelTicket, CancellableAdapter, RequestCancelled, HEDGE_MODES, AOAI_HEDGE  # type: ignore
+    from aoai_cache import ResponseCache, CacheMiss, CACHE_MODES, cache_key  # type: ignore
+    from rate_limiter import RateScheduler, estimate_tokens  # type: ignore
 
 # ---------------------
 # Configuration helpers
@@ -71,6 +119,24 @@ AOAI_RETRIES               = int(_env("AOAI_RETRIES", "3"))
 AOAI_RETRY_BASE_MS         = int(_env("AOAI_RETRY_BASE_MS", "500"))
 AOAI_LOG_PROMPT            = _env("AOAI_LOG_PROMPT", "1") != "0"
 AOAI_PROMPT_LOG_PATH       = _env("AOAI_PROMPT_LOG_PATH", "logs/aoai-prompts.log")
+AOAI_LOG_MAX_MB            = float(_env("AOAI_LOG_MAX_MB", "50"))
+AOAI_LOG_BACKUPS           = int(_env("AOAI_LOG_BACKUPS", "5"))
+AOAI_LOG_GZIP              = _env("AOAI_LOG_GZIP", "0") == "1"
+AOAI_LOG_FLUSH_MS          = int(_env("AOAI_LOG_FLUSH_MS", "1000"))
+AOAI_POOL_SIZE             = int(_env("AOAI_POOL_SIZE", "8"))
+AOAI_MAX_IN_FLIGHT         = int(_env("AOAI_MAX_IN_FLIGHT", "256"))
+AOAI_CACHE_MODE            = _env("AOAI_CACHE_MODE", "off")
+AOAI_CACHE_PATH            = _env("AOAI_CACHE_PATH", ".cache/aoai-cache.sqlite")
+AOAI_CACHE_MAX_MB          = float(_env("AOAI_CACHE_MAX_MB", "512"))
+AOAI_CACHE_MAX_AGE_DAYS    = float(_env("AOAI_CACHE_MAX_AGE_DAYS", "30"))
+AOAI_TPM                   = int(_env("AOAI_TPM", "0"))
+AOAI_RPM                   = int(_env("AOAI_RPM", "0"))
+AOAI_RATE_HEADROOM         = float(_env("AOAI_RATE_HEADROOM", "0.9"))
+AOAI_COMPLETION_TOKEN_ESTIMATE = int(_env("AOAI_COMPLETION_TOKEN_ESTIMATE", "400"))
+AOAI_PRICE_PROMPT_PER_1M   = float(_env("AOAI_PRICE_PROMPT_PER_1M", "0"))
+AOAI_PRICE_COMPLETION_PER_1M = float(_env("AOAI_PRICE_COMPLETION_PER_1M", "0"))
+AOAI_PRICE_CACHED_PER_1M   = float(_env("AOAI_PRICE_CACHED_PER_1M", str(AOAI_PRICE_PROMPT_PER_1M)))
+AOAI_BATCH_PRICE_FACTOR    = float(_env("AOAI_BATCH_PRICE_FACTOR", "0.5"))
 
 # ---------------------
 # Logging
@@ -85,16 +151,32 @@ def _now_iso() -> str:
         return datetime.datetime.utcnow().isoformat() + "Z"
 
 
+_log_writer: PromptLogWriter | None = None
+_log_writer_lock = threading.Lock()
+
+def _get_log_writer() -> PromptLogWriter:
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = PromptLogWriter(
+                AOAI_PROMPT_LOG_PATH,
+                max_bytes=int(AOAI_LOG_MAX_MB * 1024 * 1024),
+                backups=AOAI_LOG_BACKUPS,
+                gzip_rotated=AOAI_LOG_GZIP,
+                flush_interval_s=AOAI_LOG_FLUSH_MS / 1000.0
+            )
+        return _log_writer
+
 def _append_log(record: dict) -> None:
+    """Enqueue a log record; the background writer persists it (never blocks on I/O)."""
     if not AOAI_LOG_PROMPT:
         return
-    try:
-        path = Path(AOAI_PROMPT_LOG_PATH)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=False) + "\n")
-    except Exception as e:  # pragma: no cover
-        print(f"[aoai.log] failed: {e}", file=sys.stderr)
+    _get_log_writer().write(record)
+
+def flush_log(timeout: float | None = 5.0) -> None:
+    """Wait until buffered prompt-log records are on disk."""
+    if _log_writer is not None:
+        _log_writer.flush(timeout)
 
 def _redact_headers(headers: dict[str,str]) -> dict[str,str]:
     sensitive = {"authorization","api-key"}
@@ -104,52 +186,639 @@ def _redact_headers(headers: dict[str,str]) -> dict[str,str]:
 # Authentication
 # ---------------------
 
-_cached_token: dict[str,t.Any] | None = None
-_credential: DefaultAzureCredential | None = None  # type: ignore
-
 def _get_aad_token(scope: str) -> str:
-    global _credential, _cached_token
-    if not _HAS_AAD:
-        raise RuntimeError("azure-identity not installed; cannot use AAD (pip install azure-identity)")
-    if _credential is None:
-        _credential = DefaultAzureCredential()
-    now = time.time()
-    if _cached_token and (_cached_token["expires"] - 60) > now:
-        return _cached_token["token"]
-    token = _credential.get_token(scope)
-    if not token or not getattr(token, "token", None):
-        raise RuntimeError("Failed to acquire AAD token for Azure OpenAI")
-    _cached_token = {
-        "token": token.token,
-        "expires": getattr(token, "expires_on", now + 300)
-    }
-    return _cached_token["token"]  # type: ignore
+    """Cached AAD token (refreshed in the background before expiry, see aoai_credentials.py)."""
+    return get_token_manager().get_token(scope)
 
-def _build_headers() -> dict[str,str]:
+def _build_headers(route: Route | None = None) -> dict[str,str]:
+    """Request headers for ``route`` (default: the AZURE_OPENAI_* settings)."""
     headers: dict[str,str] = {"Content-Type":"application/json"}
-    if AZURE_OPENAI_USE_AAD:
-        token = _get_aad_token(AZURE_OPENAI_SCOPE)
+    use_aad = route.use_aad if route is not None else AZURE_OPENAI_USE_AAD
+    if use_aad:
+        token = _get_aad_token((route.scope if route is not None else "") or AZURE_OPENAI_SCOPE)
         headers["Authorization"] = f"Bearer {token}"
     else:
-        if not AZURE_OPENAI_API_KEY:
+        api_key = (route.api_key if route is not None else "") or AZURE_OPENAI_API_KEY
+        if not api_key:
             raise RuntimeError("AZURE_OPENAI_API_KEY not set (and AAD not enabled)")
-        headers["api-key"] = AZURE_OPENAI_API_KEY
+        headers["api-key"] = api_key
     return headers
 
+# ---------------------
+# Routing
+# ---------------------
+
+_routes_spec: str = AOAI_ROUTES
+
+def configure_routes(spec: str | None) -> list[Route]:
+    """Route over ``spec`` (JSON list or file, see aoai_router.py; None/"" = AZURE_OPENAI_ENDPOINT only) from now on."""
+    global _routes_spec, _default_client
+    routes = _configured_routes(spec or "")
+    with _default_client_lock:
+        _routes_spec = spec or ""
+        if _default_client is not None:
+            _default_client.close()
+            _default_client = None
+    return routes
+
+def _configured_routes(spec: str | None = None) -> list[Route]:
+    spec = _routes_spec if spec is None else spec
+    if not spec:
+        return []
+    return parse_routes(spec, deployment=AZURE_OPENAI_DEPLOYMENT, api_version=AZURE_OPENAI_API_VERSION,
+                        api_key=AZURE_OPENAI_API_KEY, use_aad=AZURE_OPENAI_USE_AAD, scope=AZURE_OPENAI_SCOPE)
+
+def routes_configured() -> bool:
+    return bool(_routes_spec)
+
+def llm_identity() -> tuple[str, str]:
+    """``(deployment, api_version)`` the shared client's responses are keyed on (see aoai_router.model_identity)."""
+    return get_client().model_identity
+
+def router_stats() -> list[dict[str,t.Any]] | None:
+    """Per-route traffic and health of the shared client (None with a single endpoint)."""
+    client = _default_client
+    if client is None or len(client.router.routes) < 2:
+        return None
+    return client.router.stats()
+
+# ---------------------
+# Hedging
+# ---------------------
+
+_hedge_policy: HedgePolicy | None = HedgePolicy() if AOAI_HEDGE == "on" else None
+
+def configure_hedging(mode: str) -> HedgePolicy | None:
+    """Turn request hedging on or off for this process (overrides AOAI_HEDGE); statistics start over."""
+    global _hedge_policy
+    if mode not in HEDGE_MODES:
+        raise ValueError(f"hedge mode must be one of {HEDGE_MODES}, got {mode!r}")
+    _hedge_policy = HedgePolicy() if mode == "on" else None
+    return _hedge_policy
+
+def hedge_mode() -> str:
+    return "on" if _hedge_policy is not None else "off"
+
+def hedge_stats() -> dict[str,t.Any] | None:
+    """Hedge rate, wins and extra tokens per step (None while hedging is off)."""
+    return _hedge_policy.stats() if _hedge_policy is not None else None
+
+# ---------------------
+# Response cache
+# ---------------------
+
+if AOAI_CACHE_MODE not in CACHE_MODES:
+    raise ValueError(f"AOAI_CACHE_MODE must be one of {', '.join(CACHE_MODES)}, got {AOAI_CACHE_MODE!r}")
+
+_cache: ResponseCache | None = None
+_cache_mode: str = AOAI_CACHE_MODE
+_cache_lock = threading.Lock()
+
+def _open_cache(path: str | None = None) -> ResponseCache | None:
+    # Caller holds _cache_lock.
+    global _cache
+    if _cache_mode != "off":
+        _cache = ResponseCache(path or AOAI_CACHE_PATH, mode=_cache_mode, max_mb=AOAI_CACHE_MAX_MB, max_age_days=AOAI_CACHE_MAX_AGE_DAYS)
+    return _cache
+
+def configure_cache(mode: str | None = None, path: str | None = None) -> ResponseCache | None:
+    """Select the response cache mode for this process (overrides AOAI_CACHE_MODE)."""
+    global _cache, _cache_mode
+    with _cache_lock:
+        if mode is not None:
+            if mode not in CACHE_MODES:
+                raise ValueError(f"Unknown cache mode '{mode}' (expected one of {', '.join(CACHE_MODES)})")
+            _cache_mode = mode
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+        return _open_cache(path)
+
+def get_cache() -> ResponseCache | None:
+    cache = _cache
+    if cache is not None or _cache_mode == "off":
+        return cache
+    with _cache_lock:  # first caller opens it; the others get the same instance
+        return _cache if _cache is not None else _open_cache()
+
+def cache_mode() -> str:
+    return _cache_mode
+
+def cache_stats() -> dict[str,t.Any] | None:
+    return _cache.stats() if _cache is not None else None
+
+# ---------------------
+# Rate scheduling
+# ---------------------
+
+_schedulers: dict[tuple[str,str], RateScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(endpoint: str, deployment: str) -> RateScheduler:
+    """Process-wide scheduler shared by all callers of one deployment."""
+    key = (endpoint.rstrip("/"), deployment)
+    with _schedulers_lock:
+        sched = _schedulers.get(key)
+        if sched is None:
+            sched = RateScheduler(tpm=AOAI_TPM, rpm=AOAI_RPM, headroom=AOAI_RATE_HEADROOM, completion_estimate=AOAI_COMPLETION_TOKEN_ESTIMATE)
+            _schedulers[key] = sched
+        return sched
+
+def scheduler_stats() -> dict[str,t.Any] | None:
+    with _schedulers_lock:
+        items = list(_schedulers.items())
+    if not items:
+        return None
+    return {f"{ep}#{dep}": sched.snapshot() for (ep, dep), sched in items}
+
 # ---------------------
 # Core request
 # ---------------------
 
-def _build_url() -> str:
-    if not AZURE_OPENAI_ENDPOINT:
+def _build_url(endpoint: str | None = None, deployment: str | None = None, api_version: str | None = None) -> str:
+    endpoint = endpoint if endpoint is not None else AZURE_OPENAI_ENDPOINT
+    if not endpoint:
         raise RuntimeError("AZURE_OPENAI_ENDPOINT not configured")
-    endpoint = AZURE_OPENAI_ENDPOINT.rstrip("/")
-    return f"{endpoint}/openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+    endpoint = endpoint.rstrip("/")
+    deployment = deployment or AZURE_OPENAI_DEPLOYMENT
+    api_version = api_version or AZURE_OPENAI_API_VERSION
+    return f"{endpoint}/openai/deployments/{deployment}/chat/completions?api-version={api_version}"
 
 TransientStatusCodes = {429, 500, 502, 503, 504}
 
 class AOAIError(RuntimeError):
-    pass
+    def __init__(self, message: str, *, status: int | None = None, retry_after: float | None = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+def _parse_completion(raw: str) -> tuple[t.Any, dict[str,t.Any]]:
+    """Extract and parse the JSON object in the first choice's message content.
+
+    Returns ``(parsed, usage)`` where usage is the response's ``usage`` block (or {}).
+    """
+    try:
+        data = json.loads(raw) if raw else {}
+    except Exception as e:  # pragma: no cover
+        raise AOAIError(f"Failed to parse response JSON: {e}")
+
+    content = (
+        data.get("choices", [{}])[0]
+        .get("message", {})
+        .get("content")
+    )
+    if not content:
+        raise AOAIError("Missing content in AOAI response")
+    try:
+        parsed = json.loads(content)
+    except Exception as e:
+        raise AOAIError(f"Model content not valid JSON: {e}; raw content snippet={content[:120]}")
+    usage = data.get("usage") if isinstance(data.get("usage"), dict) else {}
+    return parsed, usage
+
+def _response_usage(raw: str) -> dict[str,t.Any]:
+    """The ``usage`` block of a response body, or {} when it has none or is not JSON."""
+    try:
+        data = json.loads(raw) if raw else {}
+    except ValueError:
+        return {}
+    usage = data.get("usage") if isinstance(data, dict) else None
+    return usage if isinstance(usage, dict) else {}
+
+# ---------------------
+# Usage / cost accounting
+# ---------------------
+
+def usage_fields(usage: dict[str,t.Any]) -> dict[str,t.Any]:
+    """Token counts of a response ``usage`` block in step-log form."""
+    details = usage.get("prompt_tokens_details") or {}
+    return {
+        "promptTokens": usage.get("prompt_tokens"),
+        "completionTokens": usage.get("completion_tokens"),
+        "cachedTokens": details.get("cached_tokens", 0) if usage else None,
+        "totalTokens": usage.get("total_tokens"),
+    }
+
+def estimate_cost(call: dict[str,t.Any]) -> float | None:
+    """USD estimate for one call from AOAI_PRICE_*; None when no prices are set or usage is unknown."""
+    if not (AOAI_PRICE_PROMPT_PER_1M or AOAI_PRICE_COMPLETION_PER_1M):
+        return None
+    if call.get("cacheHit"):
+        return 0.0  # answered from the local response cache, not billed
+    prompt, completion = call.get("promptTokens"), call.get("completionTokens")
+    if prompt is None and completion is None:
+        return None
+    cached = min(call.get("cachedTokens") or 0, prompt or 0)
+    cost = ((prompt or 0) - cached) * AOAI_PRICE_PROMPT_PER_1M + cached * AOAI_PRICE_CACHED_PER_1M + (completion or 0) * AOAI_PRICE_COMPLETION_PER_1M
+    if call.get("batch"):
+        cost *= AOAI_BATCH_PRICE_FACTOR
+    return round(cost / 1_000_000, 6)
+
+def _settle_loser(scheduler: RateScheduler, reserved: int, fut: Future) -> None:
+    """Settle the reservation of the request that lost a hedge race, once it has ended."""
+    err = fut.exception()
+    if isinstance(err, RequestCancelled):
+        actual: int | None = 0  # dropped before it was sent
+    elif err is not None:
+        actual = None  # aborted in flight: the service may have charged it, keep the estimate
+    else:
+        resp = fut.result()[0]
+        actual = 0
+        if 200 <= resp.status_code < 300:
+            actual = _response_usage(resp.content.decode("utf-8", errors="replace")).get("total_tokens")
+    scheduler.settle(reserved, actual)
+
+class AOAIClient:
+    """Chat client backed by a pooled HTTP/1.1 keep-alive session.
+
+    One client is meant to be shared by every caller in the process: at most
+    ``pool_size`` connections are opened per endpoint and callers beyond that wait
+    for a free connection instead of opening new TLS sessions. Each attempt is sent
+    to the route the client's AOAIRouter picks (AOAI_ROUTES, else the one endpoint);
+    ``endpoint`` / ``deployment`` / ``api_version`` describe the first route. ``chat`` is the
+    blocking call; ``chat_async`` runs it on a bounded executor so that hundreds of
+    coroutines can be in flight over the same few connections. With hedging on, each
+    attempt is sent from a helper thread so that a slow one can be raced by a copy.
+    """
+
+    def __init__(
+        self,
+        *,
+        endpoint: str | None = None,
+        deployment: str | None = None,
+        api_version: str | None = None,
+        pool_size: int | None = None,
+        max_in_flight: int | None = None,
+        routes: list[Route] | None = None
+    ):
+        if routes is None and endpoint is None and deployment is None and api_version is None:
+            routes = _configured_routes()
+        if not routes:
+            routes = [Route(endpoint=(endpoint if endpoint is not None else AZURE_OPENAI_ENDPOINT).rstrip("/"),
+                            deployment=deployment or AZURE_OPENAI_DEPLOYMENT, api_version=api_version or AZURE_OPENAI_API_VERSION,
+                            api_key=AZURE_OPENAI_API_KEY, use_aad=AZURE_OPENAI_USE_AAD, scope=AZURE_OPENAI_SCOPE, name="default")]
+        self.router = AOAIRouter(routes, available=lambda route: get_scheduler(route.endpoint, route.deployment).available())
+        self.endpoint = self.router.primary.endpoint
+        self.deployment = self.router.primary.deployment
+        self.api_version = self.router.primary.api_version
+        # Cache keys cover every route: any of them may answer a call.
+        self.model_identity = model_identity(self.router.routes)
+        self.pool_size = max(1, pool_size or AOAI_POOL_SIZE)
+        self.max_in_flight = max(1, max_in_flight or AOAI_MAX_IN_FLIGHT)
+        self._session = requests.Session()
+        # pool_block=True: never exceed pool_size sockets per host; max_retries=0: retries are ours.
+        hosts = len({route.endpoint for route in routes})
+        adapter = CancellableAdapter(pool_connections=hosts, pool_maxsize=self.pool_size, pool_block=True, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._adapter = adapter
+        self._executor: ThreadPoolExecutor | None = None
+        self._hedge_executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def url(self) -> str:
+        return _build_url(self.endpoint, self.deployment, self.api_version)
+
+    def close(self) -> None:
+        self._session.close()
+        with self._executor_lock:
+            for executor in (self._executor, self._hedge_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False)
+            self._executor = None
+            self._hedge_executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="aoai")
+            return self._executor
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        # Separate from _get_executor: chat_async callers occupy that one while they wait here.
+        with self._executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=2 * self.max_in_flight, thread_name_prefix="aoai-hedge")
+            return self._hedge_executor
+
+    def _send(self, url: str, data: bytes, headers: dict[str,str], timeout_s: float, ticket: CancelTicket) -> tuple[requests.Response, int]:
+        """POST under ``ticket``; the ms are counted from when the request held its connection."""
+        with ticket:
+            t0 = time.perf_counter()
+            resp = self._session.post(url, data=data, headers=headers, timeout=timeout_s)
+            return resp, int((time.perf_counter() - (ticket.sent_at or t0)) * 1000)
+
+    def _hedged_post(
+        self,
+        route: Route,
+        data: bytes,
+        headers: dict[str,str],
+        timeout_s: float,
+        delay_ms: float | None,
+        *,
+        reserved: int,
+        hedge_key: str,
+        estimated_tokens: int,
+        corr: str,
+        attempt: int
+    ) -> tuple[requests.Response, Route, int, dict[str,t.Any] | None]:
+        """POST ``data``, racing a copy of the request if no answer came within ``delay_ms``.
+
+        ``delay_ms`` None sends without a copy (the step has too few samples yet); either
+        way httpMs leaves out the wait for a pooled connection, like the hedge delay.
+        ``reserved``: the tokens the request holds on ``route``'s scheduler. Returns
+        ``(response, route, httpMs, hedge)`` of the winning request; ``hedge`` is None when
+        no copy was sent, else ``{"won", "reserved", "primaryMs"}`` (``reserved``: the tokens
+        the winner holds on its route's scheduler, for the caller to settle; the loser's
+        are settled here).
+        """
+        policy = _hedge_policy
+        if delay_ms is None or policy is None:
+            resp, http_ms = self._send(route.url, data, headers, timeout_s, CancelTicket())
+            return resp, route, http_ms, None
+        executor = self._get_hedge_executor()
+        started = time.perf_counter()
+        racers: dict[Future, tuple[str, Route, CancelTicket, int]] = {}
+        ticket = CancelTicket()
+        primary = executor.submit(self._send, route.url, data, headers, timeout_s, ticket)
+        racers[primary] = ("primary", route, ticket, reserved)
+        ticket.sending.wait()  # the delay starts once the request holds a connection
+        sent = time.perf_counter()
+        done, _ = wait([primary], timeout=delay_ms / 1000.0)
+        if done:
+            resp, http_ms = primary.result()
+            return resp, route, http_ms, None
+        hedge_route = self.router.pick(exclude=route)
+        hedge_scheduler = get_scheduler(hedge_route.endpoint, hedge_route.deployment)
+        hedge_reserved = None
+        if self._adapter.free_connections(hedge_route.url) <= 0:
+            policy.skipped_connection(hedge_key)  # the copy would only queue behind the primary's pool
+        else:
+            hedge_reserved = hedge_scheduler.try_acquire(estimated_tokens)
+            if hedge_reserved is None:
+                policy.skipped_quota(hedge_key)
+            elif not policy.allow(hedge_key, hedge_reserved):
+                hedge_scheduler.settle(hedge_reserved, 0)
+                hedge_reserved = None
+        if hedge_reserved is None:
+            resp, http_ms = primary.result()
+            return resp, route, http_ms, None
+        ticket = CancelTicket()
+        hedge_headers = headers if hedge_route == route else _build_headers(hedge_route)
+        racers[executor.submit(self._send, hedge_route.url, data, hedge_headers, timeout_s, ticket)] = ("hedge", hedge_route, ticket, hedge_reserved)
+
+        # First response that settles the call wins: a success or a non-transient error
+        # (that one would repeat on the copy); timeouts, connection errors and 429/5xx
+        # leave the race to the other request.
+        winner: Future | None = None
+        pending = set(racers)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in sorted(done, key=lambda f: racers[f][0] != "primary"):
+                err = fut.exception()
+                if err is None and fut.result()[0].status_code not in TransientStatusCodes:
+                    winner = fut
+                    break
+        if winner is None:
+            winner = primary  # both failed: the primary's outcome goes through the usual retry path
+        for fut in pending:
+            racers[fut][2].cancel()
+        primary_ms = primary.result()[1] if primary.done() and primary.exception() is None else int((time.perf_counter() - sent) * 1000)
+        name, win_route, _, win_reserved = racers[winner]
+        policy.record(hedge_key, hedge_won=name == "hedge", cancelled=bool(pending))
+        loser = next(f for f in racers if f is not winner)
+        _, lose_route, _, lose_reserved = racers[loser]
+        loser.add_done_callback(functools.partial(_settle_loser, get_scheduler(lose_route.endpoint, lose_route.deployment), lose_reserved))
+        _append_log({
+            "kind": "hedge",
+            "timestamp": _now_iso(),
+            "correlationId": corr,
+            "attempt": attempt,
+            "hedgeKey": hedge_key,
+            "delayMs": int(delay_ms),
+            "route": route.name,
+            "hedgeRoute": hedge_route.name,
+            "winner": name,
+            "cancelled": bool(pending),
+            "primaryMs": primary_ms,
+            "elapsedMs": int((time.perf_counter() - started) * 1000)
+        })
+        resp, http_ms = winner.result()
+        return resp, win_route, http_ms, {"won": name == "hedge", "reserved": win_reserved, "primaryMs": primary_ms}
+
+    async def chat_async(self, messages: list[dict[str,str]], **kwargs: t.Any) -> t.Any:
+        """Awaitable variant of :meth:`chat` (same arguments, same result)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(self.chat, messages, **kwargs))
+
+    def chat(
+        self,
+        messages: list[dict[str,str]],
+        *,
+        response_format: str = "json_object",
+        correlation_id: str | None = None,
+        timeout_ms: int | None = None,
+        max_retries: int | None = None,
+        retry_base_ms: int | None = None,
+        call_info: dict[str,t.Any] | None = None,
+        hedge_key: str | None = None
+    ) -> t.Any:
+        """Perform a chat completion and return parsed JSON from the message content.
+
+        :param messages: OpenAI-style chat messages
+        :param response_format: only 'json_object' tested here
+        :param correlation_id: optional; autogenerated if None
+        :param timeout_ms: override global AOAI_TIMEOUT_MS
+        :param max_retries: override global AOAI_RETRIES
+        :param retry_base_ms: override global AOAI_RETRY_BASE_MS
+        :param call_info: optional dict filled with tokens, attempts, queue wait and latency
+        :param hedge_key: step whose latencies set the hedge delay (default: the deployment)
+        """
+        call_t0 = time.perf_counter()
+        info = call_info if call_info is not None else {}
+        corr = correlation_id or uuid.uuid4().hex[:8]
+        info.update({"correlationId": corr, "deployment": self.deployment, "cacheHit": False, "attempts": 0, "queueWaitMs": 0})
+        tmo = timeout_ms or AOAI_TIMEOUT_MS
+        retries = max_retries if max_retries is not None else AOAI_RETRIES
+        backoff_base = retry_base_ms if retry_base_ms is not None else AOAI_RETRY_BASE_MS
+
+        _append_log({
+            "kind": "prompt",
+            "timestamp": _now_iso(),
+            "correlationId": corr,
+            "messages": messages
+        })
+
+        cache = get_cache()
+        key = None
+        if cache is not None:
+            deployment, api_version = self.model_identity
+            key = cache_key(deployment=deployment, api_version=api_version, response_format=response_format, messages=messages)
+            cached_raw = cache.get(key)
+            _append_log({
+                "kind": "cache",
+                "timestamp": _now_iso(),
+                "correlationId": corr,
+                "mode": cache.mode,
+                "key": key,
+                "hit": cached_raw is not None
+            })
+            if cached_raw is not None:
+                parsed, usage = _parse_completion(cached_raw)
+                info.update(cacheHit=True, latencyMs=int((time.perf_counter() - call_t0) * 1000), **usage_fields(usage))
+                _append_log({
+                    "kind": "parsed",
+                    "timestamp": _now_iso(),
+                    "correlationId": corr,
+                    "parsed": parsed,
+                    "cached": True
+                })
+                return parsed
+            if cache.replay_only:
+                raise CacheMiss(f"AOAI cache miss in replay-only mode (key={key[:16]})")
+
+        self.url()  # fails fast when no endpoint is configured
+        body = {
+            "messages": messages,
+            "response_format": {"type": response_format}
+        }
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        estimated_tokens = estimate_tokens(messages)
+        routed = len(self.router.routes) > 1
+        policy = _hedge_policy
+        hedge_key = hedge_key or self.deployment
+        hedge_delay = policy.begin(hedge_key) if policy is not None else None
+
+        attempt = 0
+        avoid: Route | None = None
+        while True:
+            attempt += 1
+            route = self.router.pick(exclude=avoid)
+            url = route.url
+            scheduler = get_scheduler(route.endpoint, route.deployment)
+            # Waits out shared Retry-After pauses and TPM/RPM budgets before sending.
+            reserved, waited = scheduler.acquire(estimated_tokens)
+            info["attempts"] = attempt
+            info["queueWaitMs"] += int(waited * 1000)
+            info["deployment"] = route.deployment
+            if routed:
+                info["route"] = route.name
+            started = time.time()
+            try:
+                headers = _build_headers(route)
+                _append_log({
+                    "kind": "request",
+                    "timestamp": _now_iso(),
+                    "correlationId": corr,
+                    "url": url,
+                    "method": "POST",
+                    "route": route.name,
+                    "headers": _redact_headers(headers),
+                    # messages are in the "prompt" event with the same correlationId
+                    "bodyRef": corr,
+                    "bodyBytes": len(data),
+                    "responseFormat": response_format,
+                    "attempt": attempt,
+                    "estimatedPromptTokens": estimated_tokens,
+                    "queueWaitMs": int(waited * 1000)
+                })
+
+                # socket-level timeout; the connection is returned to the pool afterwards
+                hedge = None
+                if policy is None:
+                    resp = self._session.post(url, data=data, headers=headers, timeout=tmo / 1000.0)
+                    http_ms = int((time.time() - started) * 1000)
+                else:
+                    resp, route, http_ms, hedge = self._hedged_post(route, data, headers, tmo / 1000.0, hedge_delay, reserved=reserved, hedge_key=hedge_key,
+                                                                    estimated_tokens=estimated_tokens, corr=corr, attempt=attempt)
+                if hedge is not None:
+                    info.update(hedged=True, hedgeWon=hedge["won"])
+                    # the winner's route and reservation stand for this attempt; the loser's are settled
+                    scheduler = get_scheduler(route.endpoint, route.deployment)
+                    reserved = hedge["reserved"]
+                    if hedge["won"]:
+                        info["deployment"] = route.deployment
+                        if routed:
+                            info["route"] = route.name
+                raw = resp.content.decode("utf-8", errors="replace")
+                status = resp.status_code
+                elapsed = int((time.time() - started) * 1000)
+                retry_after = scheduler.observe(status, resp.headers)
+
+                _append_log({
+                    "kind": "response",
+                    "timestamp": _now_iso(),
+                    "correlationId": corr,
+                    "status": status,
+                    "ok": 200 <= status < 300,
+                    "elapsedMs": elapsed,
+                    "body": raw,
+                    "attempt": attempt
+                })
+
+                if not (200 <= status < 300):
+                    scheduler.settle(reserved, 0)  # rejected calls do not consume quota
+                    raise AOAIError(f"Azure OpenAI error {status}: {raw[:500]}", status=status, retry_after=retry_after)
+
+                self.router.record_success(route, http_ms)
+                if policy is not None:
+                    policy.observe(hedge_key, hedge["primaryMs"] if hedge is not None else http_ms)
+                # Settled before parsing: a 200 whose content is unusable still spent its tokens.
+                scheduler.settle(reserved, _response_usage(raw).get("total_tokens"))
+                parsed, usage = _parse_completion(raw)
+                info.update(httpMs=elapsed, latencyMs=int((time.perf_counter() - call_t0) * 1000), **usage_fields(usage))
+                if cache is not None and key is not None:
+                    cache.put(key, raw, deployment=self.model_identity[0], api_version=self.model_identity[1], response_format=response_format, messages=messages)
+
+                _append_log({
+                    "kind": "parsed",
+                    "timestamp": _now_iso(),
+                    "correlationId": corr,
+                    "parsed": parsed
+                })
+                return parsed
+
+            except Exception as e:  # pragma: no cover (network variability)
+                status = getattr(e, "status", None)
+                transient = status in TransientStatusCodes or isinstance(e, (requests.Timeout, requests.ConnectionError))
+                retry_after = getattr(e, "retry_after", None)
+                # Faults of the route itself count towards taking it out of rotation; 429 only lowers its quota share.
+                route_fault = isinstance(e, (requests.Timeout, requests.ConnectionError)) or (status is not None and (status >= 500 or status in (401, 403, 404)))
+                ejected = self.router.record_failure(route) if route_fault else False
+                avoid = route if route_fault or status == 429 else None
+                _append_log({
+                    "kind": "error",
+                    "timestamp": _now_iso(),
+                    "correlationId": corr,
+                    "error": str(e),
+                    "status": status,
+                    "attempt": attempt,
+                    "transient": transient,
+                    "retryAfterMs": int(retry_after * 1000) if retry_after is not None else None,
+                    "route": route.name,
+                    "routeEjected": ejected
+                })
+                if (transient or (routed and route_fault)) and attempt <= retries:
+                    if routed and avoid is not None and self.router.has_alternative(route):
+                        continue  # another route takes the retry right away
+                    if retry_after is None:
+                        delay = backoff_base * (2 ** (attempt - 1))
+                        time.sleep(delay / 1000.0)
+                    # else: the scheduler pause (shared by all callers) is honored by acquire()
+                    continue
+                info.update(latencyMs=int((time.perf_counter() - call_t0) * 1000), error=str(e)[:200])
+                raise
+
+_default_client: AOAIClient | None = None
+_default_client_lock = threading.Lock()
+
+def get_client() -> AOAIClient:
+    """Process-wide shared client (created lazily from environment configuration)."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = AOAIClient()
+        return _default_client
 
 def aoai_chat(
     messages: list[dict[str,str]],
@@ -158,125 +827,44 @@ def aoai_chat(
     correlation_id: str | None = None,
     timeout_ms: int | None = None,
     max_retries: int | None = None,
-    retry_base_ms: int | None = None
+    retry_base_ms: int | None = None,
+    call_info: dict[str,t.Any] | None = None,
+    hedge_key: str | None = None
 ) -> t.Any:
-    """Perform a chat completion and return parsed JSON from the message content.
-
-    :param messages: OpenAI-style chat messages
-    :param response_format: only 'json_object' tested here
-    :param correlation_id: optional; autogenerated if None
-    :param timeout_ms: override global AOAI_TIMEOUT_MS
-    :param max_retries: override global AOAI_RETRIES
-    :param retry_base_ms: override global AOAI_RETRY_BASE_MS
-    """
-    corr = correlation_id or uuid.uuid4().hex[:8]
-    tmo = timeout_ms or AOAI_TIMEOUT_MS
-    retries = max_retries if max_retries is not None else AOAI_RETRIES
-    backoff_base = retry_base_ms if retry_base_ms is not None else AOAI_RETRY_BASE_MS
-
-    url = _build_url()
-    body = {
-        "messages": messages,
-        "response_format": {"type": response_format}
-    }
-    request_body_json = json.dumps(body, ensure_ascii=False)
-
-    _append_log({
-        "kind": "prompt",
-        "timestamp": _now_iso(),
-        "correlationId": corr,
-        "messages": messages
-    })
-
-    attempt = 0
-    while True:
-        attempt += 1
-        started = time.time()
-        try:
-            headers = _build_headers()
-            _append_log({
-                "kind": "request",
-                "timestamp": _now_iso(),
-                "correlationId": corr,
-                "url": url,
-                "method": "POST",
-                "headers": _redact_headers(headers),
-                "body": request_body_json,
-                "attempt": attempt
-            })
-
-            import urllib.request
-            req = urllib.request.Request(url, data=request_body_json.encode("utf-8"), headers=headers, method="POST")
-            # socket-level timeout
-            with urllib.request.urlopen(req, timeout=tmo / 1000.0) as resp:
-                raw = resp.read().decode("utf-8", errors="replace")
-                status = resp.status
-            elapsed = int((time.time() - started) * 1000)
-
-            _append_log({
-                "kind": "response",
-                "timestamp": _now_iso(),
-                "correlationId": corr,
-                "status": status,
-                "ok": 200 <= status < 300,
-                "elapsedMs": elapsed,
-                "body": raw,
-                "attempt": attempt
-            })
-
-            if not (200 <= status < 300):
-                if status in TransientStatusCodes and attempt <= retries:
-                    delay = backoff_base * (2 ** (attempt - 1))
-                    time.sleep(delay / 1000.0)
-                    continue
-                raise AOAIError(f"Azure OpenAI error {status}: {raw[:500]}")
-
-            try:
-                data = json.loads(raw) if raw else {}
-            except Exception as e:  # pragma: no cover
-                raise AOAIError(f"Failed to parse response JSON: {e}")
-
-            content = (
-                data.get("choices", [{}])[0]
-                .get("message", {})
-                .get("content")
-            )
-            if not content:
-                raise AOAIError("Missing content in AOAI response")
-            try:
-                parsed = json.loads(content)
-            except Exception as e:
-                raise AOAIError(f"Model content not valid JSON: {e}; raw content snippet={content[:120]}")
-
-            _append_log({
-                "kind": "parsed",
-                "timestamp": _now_iso(),
-                "correlationId": corr,
-                "parsed": parsed
-            })
-            return parsed
-
-        except Exception as e:  # pragma: no cover (network variability)
-            msg = str(e)
-            transient = False
-            if isinstance(e, AOAIError):
-                if any(code in msg for code in ["429", "500", "502", "503", "504"]):
-                    transient = True
-            if any(tok in msg.lower() for tok in ["timeout","temporarily","connection reset"]):
-                transient = True
-            _append_log({
-                "kind": "error",
-                "timestamp": _now_iso(),
-                "correlationId": corr,
-                "error": msg,
-                "attempt": attempt,
-                "transient": transient
-            })
-            if transient and attempt <= retries:
-                delay = backoff_base * (2 ** (attempt - 1))
-                time.sleep(delay / 1000.0)
-                continue
-            raise
+    """Perform a chat completion on the shared pooled client (see AOAIClient.chat)."""
+    return get_client().chat(
+        messages,
+        response_format=response_format,
+        correlation_id=correlation_id,
+        timeout_ms=timeout_ms,
+        max_retries=max_retries,
+        retry_base_ms=retry_base_ms,
+        call_info=call_info,
+        hedge_key=hedge_key
+    )
+
+async def aoai_chat_async(
+    messages: list[dict[str,str]],
+    *,
+    response_format: str = "json_object",
+    correlation_id: str | None = None,
+    timeout_ms: int | None = None,
+    max_retries: int | None = None,
+    retry_base_ms: int | None = None,
+    call_info: dict[str,t.Any] | None = None,
+    hedge_key: str | None = None
+) -> t.Any:
+    """Awaitable aoai_chat sharing the same connection pool."""
+    return await get_client().chat_async(
+        messages,
+        response_format=response_format,
+        correlation_id=correlation_id,
+        timeout_ms=timeout_ms,
+        max_retries=max_retries,
+        retry_base_ms=retry_base_ms,
+        call_info=call_info,
+        hedge_key=hedge_key
+    )
 
 INTENT_SYSTEM_PROMPT = """You are an intent-to-UI planner for a Portal UI generator.\nReturn ONLY one compact JSON object (no prose, no markdown) that the renderer can use directly.\n\nSchema:\n{\n  \"template\": string,\n  \"styles\"?: string[],\n  \"scripts\"?: string[],\n  \"components\": [\n    {\n      \"id\"?: string,\n      \"type\": string,\n      \"slot\": string,\n      \"library\"?: \"shadcn\",\n      \"props\": object\n    }\n  ]\n}\n\nGuidelines:\n- Populate required slots implied by the user message.\n- Provide non-empty arrays where appropriate.\n- Keep JSON minimal, strictly valid. No comments.\n"""
 
@@ -297,8 +885,11 @@ def _cli():  # pragma: no cover
     ap.add_argument("--message", help="User prompt (if provided, uses high-level intent mode).")
     ap.add_argument("--raw", action="store_true", help="If set, expect raw JSON array of messages via stdin instead of --message.")
     ap.add_argument("--print", action="store_true", help="Print parsed JSON result.")
+    ap.add_argument("--cache-mode", choices=CACHE_MODES, help="Response cache mode (default: AOAI_CACHE_MODE or off).")
     args = ap.parse_args()
     try:
+        if args.cache_mode:
+            configure_cache(args.cache_mode)
         if args.raw:
             stdin_txt = sys.stdin.read()
             msgs = json.loads(stdin_txt)
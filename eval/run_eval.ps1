@@ -32,7 +32,16 @@ Substring filter applied to dataset record identifiers or titles.
 Optional prefix for generated record IDs.
 
 .PARAMETER SkipExisting
-Skip records whose output directory already contains score.json
+Resume the latest run under RunRoot (if any): finished records are skipped, failed ones re-run
+
+.PARAMETER Resume
+Run directory to resume in place (only unfinished/failed records and their missing steps are run)
+
+.PARAMETER Shard
+Process only shard I of N ("I/N", 0-based); merge shard runs with eval/pipeline/merge_shard_runs.py
+
+.PARAMETER Workers
+Number of records processed concurrently (default: 1).
 
 .EXAMPLE
 pwsh ./eval/run_eval.ps1 -Limit 5 -Filter dashboard
@@ -45,7 +54,10 @@ param(
   [int]$Limit,
   [string]$Filter,
   [string]$IdPrefix,
-  [switch]$SkipExisting
+  [switch]$SkipExisting,
+  [string]$Resume,
+  [string]$Shard,
+  [int]$Workers
 )
 
 function Import-RepoRootDotEnv {
@@ -167,6 +179,9 @@ if ($Limit)        { $ArgsList += @("--limit", $Limit) }
 if ($Filter)       { $ArgsList += @("--filter", $Filter) }
 if ($IdPrefix)     { $ArgsList += @("--id-prefix", $IdPrefix) }
 if ($SkipExisting) { $ArgsList += @("--skip-existing") }
+if ($Resume)       { $ArgsList += @("--resume", $Resume) }
+if ($Shard)        { $ArgsList += @("--shard", $Shard) }
+if ($Workers)      { $ArgsList += @("--workers", $Workers) }
 
 Write-Host "----------------------------------------------" -ForegroundColor DarkGray
 Write-Host "Multi-record Evaluation Run" -ForegroundColor Green
@@ -180,6 +195,9 @@ if ($Limit)    { Write-Host " Limit       : $Limit" }
 if ($Filter)   { Write-Host " Filter      : $Filter" }
 if ($IdPrefix) { Write-Host " IdPrefix    : $IdPrefix" }
 if ($SkipExisting) { Write-Host " SkipExisting: True" }
+if ($Resume)   { Write-Host " Resume      : $Resume" }
+if ($Shard)    { Write-Host " Shard       : $Shard" }
+if ($Workers)  { Write-Host " Workers     : $Workers" }
 if ($env:AZURE_OPENAI_ENDPOINT) { Write-Host " Azure OpenAI Endpoint: $($env:AZURE_OPENAI_ENDPOINT)" } else { Write-Host " Azure OpenAI Endpoint: (not set)" }
 Write-Host "----------------------------------------------" -ForegroundColor DarkGray
 
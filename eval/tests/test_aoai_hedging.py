@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""
+Unit tests for eval/pipeline/aoai_hedging.py (no network).
+
+    python -m unittest discover -s eval/tests
+"""
+from __future__ import annotations
+import sys
+import socket
+import unittest
+from pathlib import Path
+
+CURRENT_FILE = Path(__file__).resolve()
+REPO_ROOT = CURRENT_FILE.parent.parent.parent  # eval/tests/ -> eval/ -> repo root
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from eval.pipeline.aoai_hedging import HedgePolicy, CancelTicket, RequestCancelled, _CancellableMixin  # type: ignore  # noqa: E402
+
+class _FakeSock:
+    def __init__(self) -> None:
+        self.shutdowns: list[int] = []
+
+    def shutdown(self, how: int) -> None:
+        self.shutdowns.append(how)
+
+class _FakeConn:
+    def __init__(self) -> None:
+        self.sock = _FakeSock()
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+class _BasePool:
+    def __init__(self, conn: _FakeConn) -> None:
+        self.conn = conn
+        self.returned: list[object] = []
+
+    def _get_conn(self, timeout=None):
+        return self.conn
+
+    def _put_conn(self, conn):
+        self.returned.append(conn)
+
+class _Pool(_CancellableMixin, _BasePool):
+    pass
+
+def _policy(**kwargs) -> HedgePolicy:
+    options = dict(quantile=0.9, min_samples=5, window=100, min_delay_ms=0, max_rate=1.0, max_extra_tokens=0)
+    options.update(kwargs)
+    return HedgePolicy(**options)
+
+class HedgePolicyTest(unittest.TestCase):
+    def test_no_delay_below_min_samples(self):
+        policy = _policy()
+        for ms in (100, 200, 300, 400):
+            policy.observe("step", ms)
+        self.assertIsNone(policy.begin("step"))
+        policy.observe("step", 500)
+        self.assertEqual(policy.begin("step"), 500)
+
+    def test_quantile_of_samples(self):
+        policy = _policy()
+        for ms in range(1, 101):
+            policy.observe("step", ms * 10)
+        self.assertEqual(policy.begin("step"), 900)
+        policy.observe("step", 5000)  # a new sample recomputes the delay
+        self.assertEqual(policy.begin("step"), 910)
+
+    def test_min_delay_floor(self):
+        policy = _policy(min_delay_ms=1000)
+        for _ in range(10):
+            policy.observe("step", 50)
+        self.assertEqual(policy.begin("step"), 1000)
+
+    def test_steps_are_separate(self):
+        policy = _policy()
+        for _ in range(5):
+            policy.observe("fast", 10)
+        self.assertEqual(policy.begin("fast"), 10)
+        self.assertIsNone(policy.begin("slow"))
+
+    def test_rate_cap(self):
+        policy = _policy(max_rate=0.2)
+        for _ in range(4):
+            policy.begin("step")
+        self.assertFalse(policy.allow("step", 100))  # 1 hedge > 0.2 * 4 calls
+        policy.begin("step")
+        self.assertTrue(policy.allow("step", 100))  # 1 hedge <= 0.2 * 5 calls
+        self.assertFalse(policy.allow("step", 100))
+        counters = policy.stats()["steps"]["step"]
+        self.assertEqual(counters["calls"], 5)
+        self.assertEqual(counters["hedged"], 1)
+        self.assertEqual(counters["skippedBudget"], 2)
+        self.assertEqual(counters["extraTokens"], 100)
+        self.assertEqual(counters["hedgeRate"], 0.2)
+
+    def test_rate_cap_is_process_wide(self):
+        policy = _policy(max_rate=0.5)
+        policy.begin("a")
+        policy.begin("b")
+        self.assertTrue(policy.allow("a", 10))
+        self.assertFalse(policy.allow("b", 10))
+        stats = policy.stats()
+        self.assertEqual(stats["hedged"], 1)
+        self.assertEqual(stats["skippedBudget"], 1)
+
+    def test_token_cap(self):
+        policy = _policy(max_extra_tokens=250)
+        for _ in range(10):
+            policy.begin("step")
+        self.assertTrue(policy.allow("step", 100))
+        self.assertTrue(policy.allow("step", 100))
+        self.assertFalse(policy.allow("step", 100))  # 300 > 250
+        self.assertTrue(policy.allow("step", 50))
+        stats = policy.stats()
+        self.assertEqual(stats["extraTokens"], 250)
+        self.assertEqual(stats["skippedBudget"], 1)
+        self.assertEqual(stats["maxExtraTokens"], 250)
+
+    def test_record_and_skips(self):
+        policy = _policy()
+        for _ in range(4):
+            policy.begin("step")
+        policy.allow("step", 10)
+        policy.allow("step", 10)
+        policy.record("step", hedge_won=True, cancelled=True)
+        policy.record("step", hedge_won=False, cancelled=False)
+        policy.skipped_quota("step")
+        policy.skipped_connection("step")
+        stats = policy.stats()
+        self.assertEqual((stats["hedgeWins"], stats["primaryWins"], stats["cancelled"]), (1, 1, 1))
+        self.assertEqual((stats["skippedQuota"], stats["skippedNoConnection"]), (1, 1))
+        self.assertEqual(stats["hedgeWinRate"], 0.5)
+        self.assertEqual(stats["hedgeRate"], 0.5)
+
+class CancelTicketTest(unittest.TestCase):
+    def test_cancel_bound_connection(self):
+        ticket = CancelTicket()
+        conn = _FakeConn()
+        self.assertTrue(ticket.bind(conn))
+        self.assertTrue(ticket.sending.is_set())
+        ticket.cancel()
+        self.assertEqual(conn.sock.shutdowns, [socket.SHUT_RDWR])
+
+    def test_cancel_before_bind(self):
+        ticket = CancelTicket()
+        ticket.cancel()
+        conn = _FakeConn()
+        self.assertFalse(ticket.bind(conn))
+        self.assertEqual(conn.sock.shutdowns, [])
+        self.assertFalse(ticket.sending.is_set())
+
+    def test_release_unbinds(self):
+        ticket = CancelTicket()
+        conn = _FakeConn()
+        ticket.bind(conn)
+        ticket.release(conn)
+        ticket.cancel()
+        self.assertEqual(conn.sock.shutdowns, [])
+
+    def test_release_of_other_connection_keeps_binding(self):
+        ticket = CancelTicket()
+        conn = _FakeConn()
+        ticket.bind(conn)
+        ticket.release(_FakeConn())
+        ticket.cancel()
+        self.assertEqual(conn.sock.shutdowns, [socket.SHUT_RDWR])
+
+    def test_exit_unbinds_and_sets_sending(self):
+        ticket = CancelTicket()
+        with ticket:
+            pass
+        self.assertTrue(ticket.sending.is_set())
+        ticket.cancel()  # nothing bound any more
+
+    def test_pool_binds_to_active_ticket(self):
+        conn = _FakeConn()
+        pool = _Pool(conn)
+        ticket = CancelTicket()
+        with ticket:
+            self.assertIs(pool._get_conn(), conn)
+            ticket.cancel()
+            self.assertEqual(conn.sock.shutdowns, [socket.SHUT_RDWR])
+            pool._put_conn(conn)
+        self.assertEqual(pool.returned, [conn])
+
+    def test_pool_drops_request_of_cancelled_ticket(self):
+        conn = _FakeConn()
+        pool = _Pool(conn)
+        ticket = CancelTicket()
+        ticket.cancel()
+        with ticket:
+            with self.assertRaises(RequestCancelled):
+                pool._get_conn()
+        self.assertTrue(conn.closed)
+        self.assertEqual(conn.sock.shutdowns, [])
+
+    def test_pool_without_ticket(self):
+        conn = _FakeConn()
+        pool = _Pool(conn)
+        self.assertIs(pool._get_conn(), conn)
+        pool._put_conn(conn)
+        self.assertEqual(pool.returned, [conn])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Tests for results.jsonl readers: ResultsJournal.restore, merge_shard_runs and run_history.
+
+    python -m unittest discover -s eval/tests
+"""
+from __future__ import annotations
+import io
+import sys
+import tempfile
+import unittest
+import contextlib
+from pathlib import Path
+
+CURRENT_FILE = Path(__file__).resolve()
+REPO_ROOT = CURRENT_FILE.parent.parent.parent  # eval/tests/ -> eval/ -> repo root
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from eval.pipeline.results_journal import ResultsJournal  # type: ignore  # noqa: E402
+from eval.pipeline.run_manifest import RunManifest  # type: ignore  # noqa: E402
+from eval.pipeline.merge_shard_runs import merge_runs  # type: ignore  # noqa: E402
+from eval.pipeline.run_history import RunHistory  # type: ignore  # noqa: E402
+
+def _entry(rid: str, overall: float) -> dict:
+    return {"recordId": rid, "overall": overall, "dimensionScores": {"correctness": overall}}
+
+def _run(run_dir: Path, titles: list[str], shard: str | None = None) -> RunManifest:
+    run_dir.mkdir(parents=True)
+    records = [{"idx": i, "title": title, "recordId": f"rid-{title}", "descriptionHash": title} for i, title in enumerate(titles, 1)]
+    return RunManifest.create(run_dir, dataset_dir=Path("ds"), records=records, prompt_hashes={}, config={"shard": shard})
+
+class InvalidatedLineTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.run_dir = self.root / "run"
+        _run(self.run_dir, ["a", "b"])
+        journal = ResultsJournal(self.run_dir / "results.jsonl", snapshot_every=0)
+        journal.record(1, "rid-a", {"entry": _entry("rid-a", 4.0)})
+        journal.record(2, "rid-b", {"entry": _entry("rid-b", 2.0)})
+        journal.invalidate(2, "rid-b", "description changed")  # resumed run stopped before b re-ran
+        journal.close()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _merge(self, run_dirs: list[Path]) -> dict:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return merge_runs(run_dirs, self.root / "merged")
+
+    def test_restore_skips_invalidated(self):
+        journal = ResultsJournal(self.run_dir / "results.jsonl", snapshot_every=0)
+        try:
+            last = journal.restore()
+        finally:
+            journal.close()
+        self.assertEqual(last[2]["status"], "invalidated")
+        self.assertEqual(journal.finished, 1)
+        self.assertEqual(journal.aggregate.to_dict()["overallMean"], 4.0)
+
+    def test_merge_counts_invalidated_as_pending(self):
+        summary = self._merge([self.run_dir])
+        self.assertFalse(summary["complete"])
+        self.assertEqual(summary["recordsTotal"], 2)
+        self.assertEqual(summary["recordsProcessed"], 1)
+        self.assertEqual(summary["aggregate"]["overallMean"], 4.0)
+
+    def test_merge_prefers_finished_copy_over_invalidated(self):
+        other = self.root / "copy"
+        _run(other, ["a", "b"])
+        journal = ResultsJournal(other / "results.jsonl", snapshot_every=0)
+        journal.record(2, "rid-b", {"entry": _entry("rid-b", 3.0)})
+        journal.close()
+        summary = self._merge([self.run_dir, other])
+        self.assertTrue(summary["complete"])
+        self.assertEqual(summary["recordsTotal"], 2)
+        self.assertEqual(summary["aggregate"]["overallMean"], 3.5)
+
+    def test_history_ingest_skips_invalidated(self):
+        history = RunHistory(self.root / "history.sqlite")
+        try:
+            self.assertEqual(history.ingest_run(self.run_dir), 1)
+            rows = history._query("SELECT record_id, status, overall FROM scores")
+            runs = history.runs()
+        finally:
+            history.close()
+        self.assertEqual(rows, [{"record_id": "rid-a", "status": "ok", "overall": 4.0}])
+        self.assertEqual(runs[0]["records"], 1)
+
+class JournalCITest(unittest.TestCase):
+    def test_ci95s(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = ResultsJournal(Path(tmp) / "results.jsonl", snapshot_every=0)
+            try:
+                self.assertEqual(journal.ci95s(dimensions=True), (0, [None] + [None] * 5))
+                for i, overall in enumerate((3.0, 4.0, 5.0), 1):
+                    journal.record(i, f"rid-{i}", {"entry": _entry(f"rid-{i}", overall)})
+                count, cis = journal.ci95s(dimensions=True)
+            finally:
+                journal.close()
+        self.assertEqual(count, 3)
+        self.assertAlmostEqual(cis[0], 4.303 * 1.0 / 3 ** 0.5, places=6)  # sample sd 1, t(2)
+        self.assertAlmostEqual(cis[1], cis[0])  # correctness carries the same scores
+        self.assertEqual(cis[2:], [None] * 4)
+        self.assertEqual(len(journal.ci95s()[1]), 1)
+        self.assertEqual(journal.aggregate.to_dict()["variance"]["overall"], 1.0)  # the variance the CI uses
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,50 @@
 import { processUserIntent } from '../../ux-architect-agent/intent-processor.js';
 import { renderUI } from '../../ui-builder-agent/ui-renderer.js';
 import { DEFAULT_USER_ID } from '../../shared/config.js';
+import { createHash } from 'crypto';
+import { readdirSync, readFileSync } from 'fs';
+import { dirname, join, relative } from 'path';
+import { fileURLToPath } from 'url';
+
+export const SERVER_VERSION = '1.0.0';
+
+// Hash of every file of the code tree this server runs from (src/ under ts-node, dist/ when built),
+// so the build id changes with any edit to the agents, templates or data.
+function codeHash(): string | undefined {
+  try {
+    const root = join(dirname(fileURLToPath(import.meta.url)), '..', '..');
+    const hash = createHash('sha256');
+    const walk = (dir: string) => {
+      const entries = readdirSync(dir, { withFileTypes: true }).sort((a, b) => (a.name < b.name ? -1 : a.name > b.name ? 1 : 0));
+      for (const entry of entries) {
+        const path = join(dir, entry.name);
+        if (entry.isDirectory()) {
+          walk(path);
+        } else if (entry.isFile() && !entry.name.endsWith('.map')) {
+          hash.update(relative(root, path).split('\\').join('/')).update('\0').update(readFileSync(path)).update('\0');
+        }
+      }
+    };
+    walk(root);
+    return `code-${hash.digest('hex').slice(0, 16)}`;
+  } catch {
+    return undefined;
+  }
+}
+
+// Identifies the agent build behind an endpoint (reported by /mcp/health) so clients can key caches on it.
+// buildIdSource 'version' means the id does not follow code changes; clients then do not reuse cached outputs.
+const CODE_HASH = process.env.MCP_BUILD_ID ? undefined : codeHash();
+export const BUILD_ID_SOURCE: 'env' | 'content' | 'version' = process.env.MCP_BUILD_ID ? 'env' : CODE_HASH ? 'content' : 'version';
+export const BUILD_ID = process.env.MCP_BUILD_ID || CODE_HASH || process.env.npm_package_version || SERVER_VERSION;
+
+export const healthDescriptor = {
+  status: 'ok',
+  service: 'portal-ux-agent-mcp-http',
+  version: SERVER_VERSION,
+  buildId: BUILD_ID,
+  buildIdSource: BUILD_ID_SOURCE
+};
 
 export interface CreatePortalUiArgs {
   message: string;
@@ -46,3 +90,109 @@ export async function handleCreatePortalUi(args: CreatePortalUiArgs): Promise<Cr
     composition
   };
 }
+
+// Batch tool calls (POST /mcp/tools/call-batch): many create_portal_ui calls per request,
+// run with bounded concurrency and streamed back as NDJSON in completion order.
+export const BATCH_CONCURRENCY = Number(process.env.MCP_BATCH_CONCURRENCY) || 4;
+export const BATCH_MAX_CONCURRENCY = Number(process.env.MCP_BATCH_MAX_CONCURRENCY) || 16;
+export const BATCH_MAX_CALLS = Number(process.env.MCP_BATCH_MAX_CALLS) || 200;
+
+export interface BatchToolCall {
+  id?: string;
+  name?: string;
+  arguments?: any;
+}
+
+export interface BatchRequest {
+  calls: BatchToolCall[];
+  concurrency: number;
+}
+
+export interface BatchToolResult {
+  index: number;
+  id: string;
+  status: number;
+  elapsedMs: number;
+  result?: CreatePortalUiResult;
+  error?: string;
+}
+
+export interface BatchSummary {
+  done: true;
+  count: number;
+  succeeded: number;
+  failed: number;
+  cancelled: number;
+  concurrency: number;
+  elapsedMs: number;
+}
+
+export class BatchRequestError extends Error {
+  constructor(message: string, public status = 400) {
+    super(message);
+  }
+}
+
+// Validate { calls: [{ id?, name?, arguments }], concurrency? }; throws BatchRequestError.
+export function parseBatchRequest(body: any): BatchRequest {
+  if (!body || typeof body !== 'object' || !Array.isArray(body.calls)) {
+    throw new BatchRequestError('Expected { calls: [...] }');
+  }
+  if (!body.calls.length) throw new BatchRequestError('calls is empty');
+  if (body.calls.length > BATCH_MAX_CALLS) {
+    throw new BatchRequestError(`Too many calls: ${body.calls.length} (max ${BATCH_MAX_CALLS})`, 413);
+  }
+  const requested = Number(body.concurrency) || BATCH_CONCURRENCY;
+  return { calls: body.calls, concurrency: Math.max(1, Math.min(requested, BATCH_MAX_CONCURRENCY)) };
+}
+
+async function runBatchCall(call: BatchToolCall, index: number): Promise<BatchToolResult> {
+  const started = Date.now();
+  const id = call?.id !== undefined ? String(call.id) : String(index);
+  const done = (status: number, extra: { result?: CreatePortalUiResult; error?: string }): BatchToolResult =>
+    ({ index, id, status, elapsedMs: Date.now() - started, ...extra });
+  const name = call?.name ?? 'create_portal_ui';
+  if (name !== 'create_portal_ui') return done(404, { error: `Unknown tool: ${name}` });
+  const args = call?.arguments;
+  if (!args || typeof args.message !== 'string' || !args.message.trim()) {
+    return done(400, { error: 'Missing arguments.message' });
+  }
+  try {
+    return done(200, { result: await handleCreatePortalUi(args) });
+  } catch (e: any) {
+    return done(500, { error: e?.message || 'Unknown error' });
+  }
+}
+
+// Run every call with at most `concurrency` in flight; `onResult` sees each one as it completes.
+// Once `isCancelled()` (client went away) no further calls are started.
+export async function runToolCallBatch(
+  calls: BatchToolCall[],
+  concurrency: number,
+  onResult: (result: BatchToolResult) => void,
+  isCancelled: () => boolean = () => false
+): Promise<BatchSummary> {
+  const started = Date.now();
+  let next = 0;
+  let succeeded = 0;
+  let failed = 0;
+  const worker = async () => {
+    while (next < calls.length && !isCancelled()) {
+      const index = next++;
+      const result = await runBatchCall(calls[index], index);
+      if (result.status === 200) succeeded++; else failed++;
+      onResult(result);
+    }
+  };
+  const width = Math.max(1, Math.min(concurrency, calls.length));
+  await Promise.all(Array.from({ length: width }, worker));
+  return {
+    done: true,
+    count: calls.length,
+    succeeded,
+    failed,
+    cancelled: calls.length - succeeded - failed,
+    concurrency: width,
+    elapsedMs: Date.now() - started
+  };
+}
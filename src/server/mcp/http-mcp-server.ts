@@ -4,6 +4,7 @@ import { parse } from 'url';
 import { processUserIntent } from '../../ux-architect-agent/intent-processor.js';
 import { renderUI } from '../../ui-builder-agent/ui-renderer.js';
 import { DEFAULT_USER_ID } from '../../shared/config.js';
+import { healthDescriptor, parseBatchRequest, runToolCallBatch, BatchRequestError, BatchRequest } from './core.js';
 // SSE removed; no event bus needed
 
 function sendJson(res: ServerResponse, status: number, body: any) {
@@ -46,7 +47,7 @@ export function startHttpMcpServer(port = Number(process.env.MCP_PORT) || 3001)
 
     try {
       if (req.method === 'GET' && pathname === '/mcp/health') {
-        return sendJson(res, 200, { status: 'ok', service: 'portal-ux-agent-mcp-http' });
+        return sendJson(res, 200, healthDescriptor);
       }
 
       if (req.method === 'GET' && pathname === '/mcp/tools') {
@@ -98,6 +99,24 @@ export function startHttpMcpServer(port = Number(process.env.MCP_PORT) || 3001)
         }
       }
 
+      if (req.method === 'POST' && pathname === '/mcp/tools/call-batch') {
+        let batch: BatchRequest;
+        try {
+          batch = parseBatchRequest(await parseBody(req));
+        } catch (e: any) {
+          return sendJson(res, e instanceof BatchRequestError ? e.status : 400, { error: e?.message || 'Invalid request body' });
+        }
+        // One NDJSON line per call as it completes, then a { done: true, ... } summary line.
+        res.writeHead(200, { 'Content-Type': 'application/x-ndjson', 'Access-Control-Allow-Origin': '*', 'Cache-Control': 'no-cache' });
+        let closed = false;
+        res.on('close', () => { closed = true; });
+        const summary = await runToolCallBatch(batch.calls, batch.concurrency, result => {
+          if (!closed) res.write(JSON.stringify(result) + '\n');
+        }, () => closed);
+        if (!closed) res.end(JSON.stringify(summary) + '\n');
+        return;
+      }
+
       // SSE endpoint removed; use WebSocket MCP for streaming
 
       return sendJson(res, 404, { error: 'Not Found' });
@@ -1,6 +1,6 @@
 import { createServer, IncomingMessage, ServerResponse } from 'http';
 import { parse } from 'url';
-import { toolsDescriptor, handleCreatePortalUi } from './core.js';
+import { toolsDescriptor, handleCreatePortalUi, healthDescriptor, parseBatchRequest, runToolCallBatch, BatchRequestError, BatchRequest } from './core.js';
 
 function send(res: ServerResponse, status: number, body: any) {
   res.writeHead(status, {
@@ -39,7 +39,7 @@ export function startUnifiedHttpMcp(port = Number(process.env.MCP_PORT) || 3001)
 
     try {
       if (req.method === 'GET' && pathname === '/mcp/health') {
-        return send(res, 200, { status: 'ok', service: 'portal-ux-agent-mcp-http' });
+        return send(res, 200, healthDescriptor);
       }
 
       if (req.method === 'GET' && pathname === '/mcp/tools') {
@@ -59,6 +59,28 @@ export function startUnifiedHttpMcp(port = Number(process.env.MCP_PORT) || 3001)
         }
       }
 
+      if (req.method === 'POST' && pathname === '/mcp/tools/call-batch') {
+        let batch: BatchRequest;
+        try {
+          batch = parseBatchRequest(await readBody(req));
+        } catch (e: any) {
+          return send(res, e instanceof BatchRequestError ? e.status : 400, { error: e?.message || 'Invalid body' });
+        }
+        // NDJSON: one line per call in completion order, then the batch summary line.
+        res.writeHead(200, {
+          'Content-Type': 'application/x-ndjson',
+          'Access-Control-Allow-Origin': '*',
+          'Cache-Control': 'no-cache'
+        });
+        let closed = false;
+        res.on('close', () => { closed = true; });
+        const summary = await runToolCallBatch(batch.calls, batch.concurrency, result => {
+          if (!closed) res.write(JSON.stringify(result) + '\n');
+        }, () => closed);
+        if (!closed) res.end(JSON.stringify(summary) + '\n');
+        return;
+      }
+
       return send(res, 404, { error: 'Not Found' });
     } catch (e: any) {
       return send(res, 500, { error: e?.message || 'Internal Server Error' });